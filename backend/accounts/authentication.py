@@ -0,0 +1,226 @@
+"""
+Stateless JWT authentication.
+
+get_tokens_for_user puts the user's email, name and role in every token,
+and the API views only need request.user.id and request.user.role, so
+ClaimsJWTAuthentication builds the request user from the token claims
+instead of loading the accounts.User row on every call.
+
+Two small cache entries (Django's cache framework, like healthiq.cache)
+keep that safe:
+    auth:user:<id>     {'is_active', 'role'} of the user, kept for
+                       AUTH_USER_CACHE_TTL seconds and dropped whenever the
+                       user is saved or deleted (see accounts.signals)
+    auth:revoked:<jti> set by revoke_token until the token expires
+
+A deactivated user, or one whose role no longer matches the token, is
+rejected within AUTH_USER_CACHE_TTL seconds at the latest. With the
+per-process 'locmem' cache that bound holds for each worker on its own.
+
+Revocations must reach every worker, so they need a shared 'file' or
+'redis' cache (settings.AUTH_SHARED_CACHE). Without one, revoke_token
+records the token in a list kept by the current process only: the worker
+that served the logout rejects the token at once, and the other workers
+accept it until it expires (ACCESS_TOKEN_LIFETIME, REFRESH_TOKEN_LIFETIME).
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+
+
+def _user_key(user_id) -> str:
+    return f'auth:user:{user_id}'
+
+
+def _revoked_key(jti: str) -> str:
+    return f'auth:revoked:{jti}'
+
+
+# Revocations of this process without a shared cache: jti -> expiry (epoch seconds)
+_local_revocations: Dict[str, float] = {}
+_local_revocations_lock = threading.Lock()
+
+
+def get_user_status(user_id) -> Optional[Dict]:
+    """
+    The user's is_active and role, from the cache or else the database.
+    
+    Returns:
+        {'is_active': bool, 'role': str}, or None if the user does not exist
+    """
+    key = _user_key(user_id)
+    status = cache.get(key)
+    if status is None:
+        row = User.objects.filter(id=user_id).values('is_active', 'role').first()
+        # Missing users are cached too, so a deleted user's tokens cost no queries
+        status = row or {'is_active': False, 'role': None, 'missing': True}
+        cache.set(key, status, timeout=settings.AUTH_USER_CACHE_TTL)
+    return None if status.get('missing') else status
+
+
+async def aget_user_status(user_id) -> Optional[Dict]:
+    """Async get_user_status, for the async views."""
+    key = _user_key(user_id)
+    status = await cache.aget(key)
+    if status is None:
+        row = await User.objects.filter(id=user_id).values('is_active', 'role').afirst()
+        status = row or {'is_active': False, 'role': None, 'missing': True}
+        await cache.aset(key, status, timeout=settings.AUTH_USER_CACHE_TTL)
+    return None if status.get('missing') else status
+
+
+def invalidate_user_status(user_id):
+    """Drop the cached status of a user after it changed."""
+    cache.delete(_user_key(user_id))
+
+
+def revoke_token(token):
+    """
+    Reject a token (access or refresh) from now until it expires.
+    
+    Without a shared cache only the current process rejects it (see the
+    module docstring).
+    """
+    jti = token.get(api_settings.JTI_CLAIM)
+    if not jti:
+        return
+    expires = token['exp']
+    timeout = int(expires - time.time()) + 1
+    if timeout <= 0:
+        return
+    
+    if settings.AUTH_SHARED_CACHE:
+        cache.set(_revoked_key(jti), True, timeout=timeout)
+        return
+    with _local_revocations_lock:
+        now = time.time()
+        for expired in [k for k, v in _local_revocations.items() if v <= now]:
+            del _local_revocations[expired]
+        _local_revocations[jti] = expires
+
+
+def _locally_revoked(jti: str) -> bool:
+    expires = _local_revocations.get(jti)
+    return expires is not None and expires > time.time()
+
+
+def is_revoked(token) -> bool:
+    """Whether revoke_token was called for a token."""
+    jti = token.get(api_settings.JTI_CLAIM)
+    if not jti:
+        return False
+    if not settings.AUTH_SHARED_CACHE:
+        return _locally_revoked(jti)
+    return cache.get(_revoked_key(jti)) is not None
+
+
+async def ais_revoked(token) -> bool:
+    """Async is_revoked."""
+    jti = token.get(api_settings.JTI_CLAIM)
+    if not jti:
+        return False
+    if not settings.AUTH_SHARED_CACHE:
+        return _locally_revoked(jti)
+    return await cache.aget(_revoked_key(jti)) is not None
+
+
+class ClaimsUser(TokenUser):
+    """Request user backed by the claims of get_tokens_for_user."""
+    
+    @cached_property
+    def id(self) -> int:
+        # SimpleJWT stores the id claim as a string; MongoDB documents hold the int
+        return int(self.token[api_settings.USER_ID_CLAIM])
+    
+    @cached_property
+    def pk(self) -> int:
+        return self.id
+    
+    @cached_property
+    def role(self) -> str:
+        return self.token['role']
+    
+    @cached_property
+    def email(self) -> str:
+        return self.token.get('email', '')
+    
+    @cached_property
+    def name(self) -> str:
+        return self.token.get('name', '')
+    
+    def get_full_name(self) -> str:
+        return self.name
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication without a per-request user query.
+    
+    Tokens lacking the role claim (not issued by get_tokens_for_user) fall
+    back to SimpleJWT's database lookup.
+    """
+    
+    def _validated_token(self, request):
+        """Validated token of the request's Authorization header, or None without one."""
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        return super().get_validated_token(raw_token)
+    
+    def _check_status(self, user, status):
+        if status is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not status['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if status['role'] != user.role:
+            raise AuthenticationFailed('User role has changed', code='role_changed')
+    
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views (healthiq.async_api).
+        
+        Returns:
+            (user, token), or None if the request carries no bearer token
+        """
+        validated_token = self._validated_token(request)
+        if validated_token is None:
+            return None
+        if await ais_revoked(validated_token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        if 'role' not in validated_token:
+            user = await sync_to_async(JWTAuthentication().get_user)(validated_token)
+            return user, validated_token
+        
+        user = ClaimsUser(validated_token)
+        self._check_status(user, await aget_user_status(user.id))
+        return user, validated_token
+    
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return validated_token
+    
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        if 'role' not in validated_token:
+            return JWTAuthentication().get_user(validated_token)
+        
+        user = ClaimsUser(validated_token)
+        self._check_status(user, get_user_status(user.id))
+        return user
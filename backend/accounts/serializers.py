@@ -75,6 +75,8 @@ class RegisterSerializer(serializers.Serializer):
                 'region': validated_data.get('region', ''),
                 'available_dates': [],
             })
+            from doctors.routing import invalidate_doctor_routing
+            invalidate_doctor_routing()
         
         return user
 
@@ -0,0 +1,13 @@
+"""Keep the stateless authentication cache in step with the users table."""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import invalidate_user_status
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user_status(sender, instance, **kwargs):
+    """A saved or deleted user's is_active/role is reloaded on the next request."""
+    invalidate_user_status(instance.id)
@@ -1,3 +1,88 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .authentication import ClaimsJWTAuthentication, ClaimsUser, is_revoked, revoke_token
+from .models import User
+from .serializers import get_tokens_for_user
+from .views import logout
 
-# Create your tests here.
+
+class ClaimsJWTAuthenticationTests(TestCase):
+    """The request user comes from the token claims, checked against the user's status."""
+    
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(
+            username='priya', email='priya@example.com', password='s3cret-pass',
+            first_name='Priya', role='doctor'
+        )
+    
+    def authenticate(self, token):
+        request = self.factory.get('/records', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return ClaimsJWTAuthentication().authenticate(request)
+    
+    def test_user_from_claims(self):
+        user, _ = self.authenticate(get_tokens_for_user(self.user)['access'])
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.id, user.role, user.email, user.name), (self.user.id, 'doctor', 'priya@example.com', 'Priya'))
+    
+    def test_without_header(self):
+        self.assertIsNone(ClaimsJWTAuthentication().authenticate(self.factory.get('/records')))
+    
+    def test_inactive_user_is_rejected(self):
+        token = get_tokens_for_user(self.user)['access']
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaisesMessage(AuthenticationFailed, 'User is inactive'):
+            self.authenticate(token)
+    
+    def test_changed_role_is_rejected(self):
+        token = get_tokens_for_user(self.user)['access']
+        self.user.role = 'patient'
+        self.user.save()
+        with self.assertRaisesMessage(AuthenticationFailed, 'User role has changed'):
+            self.authenticate(token)
+    
+    def test_deleted_user_is_rejected(self):
+        token = get_tokens_for_user(self.user)['access']
+        self.user.delete()
+        with self.assertRaisesMessage(AuthenticationFailed, 'User not found'):
+            self.authenticate(token)
+    
+    def test_status_is_cached(self):
+        token = get_tokens_for_user(self.user)['access']
+        self.authenticate(token)
+        with self.assertNumQueries(0):
+            self.authenticate(token)
+    
+    def test_revoked_token_is_rejected(self):
+        token = get_tokens_for_user(self.user)['access']
+        revoke_token(AccessToken(token))
+        with self.assertRaisesMessage(AuthenticationFailed, 'Token has been revoked'):
+            self.authenticate(token)
+    
+    @override_settings(AUTH_SHARED_CACHE=True)
+    def test_revoked_token_is_rejected_with_a_shared_cache(self):
+        token = get_tokens_for_user(self.user)['access']
+        revoke_token(AccessToken(token))
+        with self.assertRaisesMessage(AuthenticationFailed, 'Token has been revoked'):
+            self.authenticate(token)
+    
+    def test_logout(self):
+        tokens = get_tokens_for_user(self.user)
+        request = self.factory.post(
+            '/auth/logout', {'refresh': tokens['refresh']}, format='json',
+            HTTP_AUTHORIZATION=f"Bearer {tokens['access']}"
+        )
+        self.assertEqual(logout(request).status_code, 200)
+        self.assertTrue(is_revoked(RefreshToken(tokens['refresh'])))
+        with self.assertRaisesMessage(AuthenticationFailed, 'Token has been revoked'):
+            self.authenticate(tokens['access'])
+    
+    def test_token_without_role_claim_loads_the_user(self):
+        user, _ = self.authenticate(str(AccessToken.for_user(self.user)))
+        self.assertIsInstance(user, User)
+        self.assertEqual(user.pk, self.user.pk)
@@ -5,5 +5,6 @@ urlpatterns = [
     path('register', views.register, name='register'),
     path('login', views.login, name='login'),
     path('refresh', views.refresh_token, name='refresh'),
+    path('logout', views.logout, name='logout'),
     path('me', views.get_current_user, name='current_user'),
 ]
@@ -2,7 +2,10 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import is_revoked, revoke_token
+from .models import User
 from .serializers import (
     RegisterSerializer, 
     LoginSerializer, 
@@ -66,6 +69,8 @@ def refresh_token(request):
     
     try:
         refresh = RefreshToken(refresh_token)
+        if is_revoked(refresh):
+            raise ValueError('revoked')
         access_token = str(refresh.access_token)
         
         return Response({
@@ -80,4 +85,39 @@ def refresh_token(request):
 @api_view(['GET'])
 def get_current_user(request):
     """Get current authenticated user."""
-    return Response(UserSerializer(request.user).data)
+    # request.user only carries the token claims; the profile needs the row
+    try:
+        user = User.objects.get(id=request.user.id)
+    except User.DoesNotExist:
+        return Response({
+            'message': 'User not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(UserSerializer(user).data)
+
+
+@api_view(['POST'])
+def logout(request):
+    """
+    Revoke the access token of the request and, if given, the refresh token.
+    
+    Without a shared cache (CACHE_BACKEND=locmem) the other workers accept
+    the tokens until they expire; see accounts.authentication.
+    """
+    tokens = [request.auth]
+    
+    refresh_token = request.data.get('refresh')
+    if refresh_token:
+        try:
+            tokens.append(RefreshToken(refresh_token))
+        except TokenError:
+            return Response({
+                'message': 'Invalid refresh token'
+            }, status=status.HTTP_400_BAD_REQUEST)
+    
+    for token in tokens:
+        revoke_token(token)
+    
+    return Response({
+        'message': 'Logged out'
+    })
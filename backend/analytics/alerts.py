@@ -2,11 +2,46 @@
 Alert System - Create and manage health alerts.
 """
 
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
+from typing import Optional
+from django.conf import settings
 from healthiq.mongodb import get_collection, Collections
+from notifications.services import create_notifications
 
 
-def create_risk_alert(region: str, risk_score: int, risk_level: str, is_anomaly: bool):
+# Notifications written per insert_many call
+FANOUT_BATCH_SIZE = 1000
+
+_executor = None
+
+logger = logging.getLogger(__name__)
+
+
+def _get_executor():
+    """Single background worker so alert fan-out never runs concurrently with itself."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='risk-alerts')
+    return _executor
+
+
+def _log_fan_out_failure(future: Future):
+    """Done-callback of background fan-outs, whose caller never waits for the result."""
+    exc = future.exception()
+    if exc is not None:
+        logger.error('Background risk alert fan-out failed', exc_info=exc)
+
+
+def create_risk_alert(
+    region: str,
+    risk_score: int,
+    risk_level: str,
+    is_anomaly: bool,
+    background: Optional[bool] = None
+):
     """
     Create risk alerts for users in a region.
     
@@ -15,43 +50,96 @@ def create_risk_alert(region: str, risk_score: int, risk_level: str, is_anomaly:
         risk_score: The calculated risk score
         risk_level: The risk level (low/medium/high/critical)
         is_anomaly: Whether an anomaly was detected
-    """
-    notifications = get_collection(Collections.NOTIFICATIONS)
-    patients = get_collection(Collections.PATIENTS)
+        background: Fan out on the background worker and return immediately.
+            Defaults to settings.RISK_ALERTS_IN_BACKGROUND. Broadcast delivery
+            (settings.RISK_ALERT_DELIVERY) is a single write and ignores it.
     
-    # Get all patients in the region
-    region_patients = list(patients.find({'region': region}))
+    Returns:
+        Number of notifications written, or a Future of it when run in the background
+    """
+    if settings.RISK_ALERT_DELIVERY == 'broadcast':
+        # A single write, cheap enough to never need the background worker
+        return _broadcast_risk_alert(region, risk_score, risk_level, is_anomaly)
     
-    # Create alert message
+    if background is None:
+        background = settings.RISK_ALERTS_IN_BACKGROUND
+    if background:
+        future = _get_executor().submit(
+            _fan_out_risk_alert, region, risk_score, risk_level, is_anomaly
+        )
+        future.add_done_callback(_log_fan_out_failure)
+        return future
+    return _fan_out_risk_alert(region, risk_score, risk_level, is_anomaly)
+
+
+def _risk_alert_content(region: str, risk_score: int, risk_level: str, is_anomaly: bool):
+    """Title and message of a risk alert."""
     if is_anomaly:
         title = f'Disease outbreak alert in {region}'
         message = f'An unusual increase in disease cases has been detected in your region. Risk score: {risk_score}. Please take precautions.'
     else:
         title = f'High health risk alert for {region}'
         message = f'The health risk level in your region is {risk_level}. Risk score: {risk_score}. Stay informed and take necessary precautions.'
+    return title, message
+
+
+def _broadcast_risk_alert(region: str, risk_score: int, risk_level: str, is_anomaly: bool) -> int:
+    """Store the alert once for the whole region."""
+    from notifications.broadcasts import create_region_broadcast
     
-    # Create notification for each patient
-    for patient in region_patients:
-        notifications.insert_one({
+    title, message = _risk_alert_content(region, risk_score, risk_level, is_anomaly)
+    create_region_broadcast(region, {
+        'type': 'risk',
+        'title': title,
+        'message': message,
+        'created_at': datetime.utcnow(),
+        'level': risk_level
+    })
+    return 1
+
+
+def _fan_out_risk_alert(region: str, risk_score: int, risk_level: str, is_anomaly: bool) -> int:
+    """Stream the region's patients and write their alerts in unordered batches."""
+    patients = get_collection(Collections.PATIENTS)
+    
+    # Only user_id is needed, so the (region, user_id) index covers the query
+    region_patients = patients.find(
+        {'region': region}, {'user_id': 1, '_id': 0}
+    ).batch_size(FANOUT_BATCH_SIZE)
+    
+    title, message = _risk_alert_content(region, risk_score, risk_level, is_anomaly)
+    
+    created_at = datetime.utcnow()
+    alerts = (
+        {
             'user_id': patient['user_id'],
             'type': 'risk',
             'title': title,
             'message': message,
             'is_read': False,
-            'created_at': datetime.utcnow(),
+            'created_at': created_at,
             'level': risk_level
-        })
+        }
+        for patient in region_patients
+    )
+    
+    written = 0
+    while True:
+        batch = list(islice(alerts, FANOUT_BATCH_SIZE))
+        if not batch:
+            break
+        written += create_notifications(batch)
+    return written
 
 
 def create_system_alert(title: str, message: str, level: str = 'medium'):
     """Create a system-wide alert for admins."""
-    notifications = get_collection(Collections.NOTIFICATIONS)
     from accounts.models import User
     
     admins = User.objects.filter(role='admin')
     
-    for admin in admins:
-        notifications.insert_one({
+    create_notifications([
+        {
             'user_id': admin.id,
             'type': 'info',
             'title': title,
@@ -59,4 +147,6 @@ def create_system_alert(title: str, message: str, level: str = 'medium'):
             'is_read': False,
             'created_at': datetime.utcnow(),
             'level': level
-        })
+        }
+        for admin in admins
+    ])
@@ -0,0 +1,113 @@
+"""
+Async ports of the analytics views, served under ASGI (settings.ASYNC_VIEWS).
+
+Same endpoints, payloads, caching and conditional GETs as analytics.views,
+with the MongoDB reads awaited on the async client; the queries and the
+shaping of their results are shared through analytics.queries.
+"""
+
+from rest_framework import status
+from healthiq.async_api import AsyncResponse, async_api_view
+from healthiq.cache import CacheNamespaces, cached_response
+from healthiq.conditional import conditional_response
+from healthiq.mongodb import get_async_collection, Collections
+from .snapshots import DASHBOARD_REGIONS, LATEST_STATS_SORT, aget_admin_snapshot, aget_region_snapshots
+from .queries import (
+    DISEASE_DISTRIBUTION_PIPELINE,
+    LAST_REVIEW_PROJECTION,
+    LAST_REVIEW_QUERY,
+    LAST_REVIEW_SORT,
+    LATEST_TREND_LIMIT,
+    LATEST_TREND_QUERY,
+    build_disease_distribution,
+    build_environmental_data,
+    build_region_risk,
+    build_region_trend,
+    latest_stats_watermark,
+    region_stats_watermark,
+    requested_regions,
+    review_watermark
+)
+
+
+async def region_risk_watermark(request):
+    return region_stats_watermark(DASHBOARD_REGIONS, await aget_region_snapshots(DASHBOARD_REGIONS))
+
+
+async def region_trend_watermark(request):
+    regions = requested_regions(request)
+    if regions:
+        return region_stats_watermark(regions, await aget_region_snapshots(regions))
+    
+    stats = await (
+        get_async_collection(Collections.REGIONAL_STATS)
+        .find(LATEST_TREND_QUERY, {'updated_at': 1})
+        .sort(LATEST_STATS_SORT)
+        .limit(LATEST_TREND_LIMIT)
+        .to_list()
+    )
+    return latest_stats_watermark(stats)
+
+
+async def disease_distribution_watermark(request):
+    return review_watermark(await get_async_collection(Collections.MEDICAL_RECORDS).find_one(
+        LAST_REVIEW_QUERY, LAST_REVIEW_PROJECTION, sort=LAST_REVIEW_SORT
+    ))
+
+
+@async_api_view(['GET'])
+@conditional_response(region_risk_watermark)
+@cached_response(CacheNamespaces.ANALYTICS)
+async def region_risk(request):
+    """Get risk data for all regions."""
+    regions = DASHBOARD_REGIONS
+    return AsyncResponse(build_region_risk(regions, await aget_region_snapshots(regions)))
+
+
+@async_api_view(['GET'])
+@conditional_response(region_trend_watermark)
+@cached_response(CacheNamespaces.ANALYTICS)
+async def region_trend(request):
+    """Get risk trend data."""
+    regions = requested_regions(request)
+    
+    if regions:
+        # A single region's recent trend is part of its dashboard snapshot
+        stats = (await aget_region_snapshots(regions))[regions[0]]['trend']
+    else:
+        stats = await (
+            get_async_collection(Collections.REGIONAL_STATS)
+            .find(LATEST_TREND_QUERY)
+            .sort(LATEST_STATS_SORT)
+            .limit(LATEST_TREND_LIMIT)
+            .to_list()
+        )
+    
+    return AsyncResponse(build_region_trend(stats))
+
+
+@async_api_view(['GET'])
+@cached_response(CacheNamespaces.ANALYTICS)
+async def admin_risk_overview(request):
+    """Get admin dashboard data."""
+    if request.user.role != 'admin':
+        return AsyncResponse({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    return AsyncResponse(await aget_admin_snapshot())
+
+
+@async_api_view(['GET'])
+@conditional_response(disease_distribution_watermark)
+@cached_response(CacheNamespaces.ANALYTICS)
+async def disease_distribution(request):
+    """Get disease distribution data."""
+    cursor = await get_async_collection(Collections.MEDICAL_RECORDS).aggregate(DISEASE_DISTRIBUTION_PIPELINE)
+    return AsyncResponse(build_disease_distribution(await cursor.to_list()))
+
+
+@async_api_view(['GET'])
+@cached_response(CacheNamespaces.ANALYTICS)
+async def environmental_data(request):
+    """Get environmental data."""
+    regions = requested_regions(request, DASHBOARD_REGIONS)
+    return AsyncResponse(build_environmental_data(regions, await aget_region_snapshots(regions)))
@@ -0,0 +1,108 @@
+"""
+Backfill helpers - split date ranges and fan the work out to a process pool.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+from django.core.management.base import CommandError
+from healthiq.mongodb import reset_after_fork
+
+
+def date_range(date_from: str, date_to: str) -> List[str]:
+    """All dates from date_from to date_to inclusive (YYYY-MM-DD)."""
+    start = datetime.strptime(date_from, '%Y-%m-%d')
+    end = datetime.strptime(date_to, '%Y-%m-%d')
+    return [
+        (start + timedelta(days=i)).strftime('%Y-%m-%d')
+        for i in range((end - start).days + 1)
+    ]
+
+
+def split_date_range(date_from: str, date_to: str, parts: int) -> List[Tuple[str, str]]:
+    """Split an inclusive date range into at most `parts` contiguous sub-ranges."""
+    dates = date_range(date_from, date_to)
+    parts = max(1, min(parts, len(dates)))
+    size, extra = divmod(len(dates), parts)
+    
+    chunks = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append((dates[start], dates[end - 1]))
+        start = end
+    return chunks
+
+
+def map_date_range(func: Callable, date_from: str, date_to: str, workers: int = 1) -> List:
+    """
+    Call func(chunk_from, chunk_to) over the range, optionally in a process pool.
+    
+    func must be a module-level function so it can be sent to the workers.
+    Each worker opens its own MongoDB connection after the fork.
+    """
+    if workers <= 1:
+        return [func(date_from, date_to)]
+    
+    chunks = split_date_range(date_from, date_to, workers)
+    with ProcessPoolExecutor(
+        max_workers=len(chunks),
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=reset_after_fork
+    ) as executor:
+        return list(executor.map(func, *zip(*chunks)))
+
+
+def add_date_range_arguments(parser, date_help: str):
+    """Add the --date, --from/--to and --workers options shared by batch commands."""
+    parser.add_argument(
+        '--date',
+        type=str,
+        help=date_help,
+    )
+    parser.add_argument(
+        '--from',
+        dest='date_from',
+        type=str,
+        help='First date of a range to backfill (YYYY-MM-DD).',
+    )
+    parser.add_argument(
+        '--to',
+        dest='date_to',
+        type=str,
+        help='Last date of a range to backfill (YYYY-MM-DD). Defaults to today.',
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Split the range across this many processes.',
+    )
+
+
+def parse_date_options(options):
+    """Resolve --date or --from/--to into an inclusive (date_from, date_to) range."""
+    today = datetime.utcnow().strftime('%Y-%m-%d')
+    
+    if options.get('date') and (options.get('date_from') or options.get('date_to')):
+        raise CommandError('Use either --date or --from/--to, not both.')
+    if options.get('date_to') and not options.get('date_from'):
+        raise CommandError('--to requires --from.')
+    if options.get('workers', 1) < 1:
+        raise CommandError('--workers must be at least 1.')
+    
+    if options.get('date_from'):
+        date_from, date_to = options['date_from'], options.get('date_to') or today
+    else:
+        date_from = date_to = options.get('date') or today
+    
+    try:
+        start = datetime.strptime(date_from, '%Y-%m-%d')
+        end = datetime.strptime(date_to, '%Y-%m-%d')
+    except ValueError:
+        raise CommandError('Dates must be in YYYY-MM-DD format.')
+    if start > end:
+        raise CommandError('--from must not be after --to.')
+    
+    return date_from, date_to
@@ -1,138 +1,206 @@
 """
 Management command to aggregate approved medical records into regional statistics.
 
-Usage: python manage.py aggregate_cases
+Usage: python manage.py aggregate_cases [--date YYYY-MM-DD] [--merge]
+       python manage.py aggregate_cases --from YYYY-MM-DD [--to YYYY-MM-DD] [--workers N] [--merge]
 """
 
 from django.core.management.base import BaseCommand
-from datetime import datetime, timedelta
-from healthiq.mongodb import get_collection, Collections
+from datetime import datetime
+from pymongo import UpdateOne
+from healthiq.mongodb import get_collection, ensure_indexes, Collections
+from analytics.backfill import add_date_range_arguments, map_date_range, parse_date_options
+from analytics.risk_engine import STAT_DEFAULTS
+from analytics.snapshots import invalidate_snapshots
 
 
-class Command(BaseCommand):
-    help = 'Aggregate approved medical records into regional statistics'
-
-    def add_arguments(self, parser):
-        parser.add_argument(
-            '--date',
-            type=str,
-            help='Date to aggregate (YYYY-MM-DD). Defaults to today.',
-        )
-
-    def handle(self, *args, **options):
-        target_date = options.get('date') or datetime.utcnow().strftime('%Y-%m-%d')
-        self.stdout.write(f'Starting aggregation for {target_date}...')
-        
-        medical_records = get_collection(Collections.MEDICAL_RECORDS)
-        regional_stats = get_collection(Collections.REGIONAL_STATS)
-        
-        # Get all approved records
-        pipeline = [
-            {
-                '$match': {
-                    'status': 'approved',
-                    'date': target_date
-                }
-            },
-            {
-                '$group': {
-                    '_id': {
-                        'region': '$patient_region',
-                        'disease': '$diagnosis'
-                    },
-                    'total_cases': {'$sum': 1}
+def build_merge_pipeline(date_from: str, date_to: str):
+    """
+    Build a pipeline that aggregates approved records server-side and
+    merges per-disease and ALL totals for every day of the range into
+    regional_stats.
+    
+    Existing stats only get total_cases and updated_at refreshed; new stats
+    are inserted with the same defaults the upsert path sets on insert.
+    """
+    return [
+        {
+            '$match': {
+                'status': 'approved',
+                'date': {'$gte': date_from, '$lte': date_to},
+                'patient_region': {'$nin': [None, '']}
+            }
+        },
+        # One row per stat a record counts towards: its disease (outside the
+        # 'Unknown' region) and the region's ALL total. Grouping the stream
+        # directly keeps every output document small, whatever the range.
+        {
+            '$project': {
+                'region': '$patient_region',
+                'date': 1,
+                'disease': {
+                    '$cond': [{'$eq': ['$patient_region', 'Unknown']}, ['ALL'], ['$diagnosis', 'ALL']]
                 }
             }
-        ]
-        
-        aggregated = list(medical_records.aggregate(pipeline))
-        
-        # Process each region-disease combination
-        regions_updated = set()
-        for item in aggregated:
-            region = item['_id'].get('region', 'Unknown')
-            disease = item['_id'].get('disease', 'Unknown')
-            total_cases = item['total_cases']
-            
-            if not region or region == 'Unknown':
-                continue
-            
-            # Update or insert regional stat
-            regional_stats.update_one(
-                {
-                    'region': region,
-                    'disease': disease,
-                    'date': target_date
-                },
-                {
-                    '$set': {
-                        'total_cases': total_cases,
-                        'updated_at': datetime.utcnow()
-                    },
-                    '$setOnInsert': {
-                        'created_at': datetime.utcnow(),
-                        'risk_score': 50,
-                        'rainfall': 0,
-                        'humidity': 50,
-                        'ph': 7.0,
-                        'tds': 300
+        },
+        {'$unwind': '$disease'},
+        {
+            '$group': {
+                '_id': {'region': '$region', 'disease': '$disease', 'date': '$date'},
+                'total_cases': {'$sum': 1}
+            }
+        },
+        {
+            '$replaceWith': {
+                'region': '$_id.region',
+                'disease': '$_id.disease',
+                'date': '$_id.date',
+                'total_cases': '$total_cases',
+                'updated_at': '$$NOW',
+                'created_at': '$$NOW',
+                **{field: {'$literal': value} for field, value in STAT_DEFAULTS.items()}
+            }
+        },
+        {
+            '$merge': {
+                'into': Collections.REGIONAL_STATS,
+                'on': ['region', 'disease', 'date'],
+                'whenMatched': [
+                    {
+                        '$set': {
+                            'total_cases': '$$new.total_cases',
+                            'updated_at': '$$new.updated_at'
+                        }
                     }
+                ],
+                'whenNotMatched': 'insert'
+            }
+        }
+    ]
+
+
+def merge_date_range(date_from: str, date_to: str):
+    """Aggregate a date range into regional_stats entirely server-side."""
+    medical_records = get_collection(Collections.MEDICAL_RECORDS)
+    medical_records.aggregate(build_merge_pipeline(date_from, date_to))
+
+
+def aggregate_date_range(date_from: str, date_to: str):
+    """
+    Aggregate a date range in one pass over medical_records and upsert the
+    per-disease and ALL totals with a single bulk_write.
+    
+    Returns:
+        (region, disease, date, total_cases) for every stat written
+    """
+    medical_records = get_collection(Collections.MEDICAL_RECORDS)
+    regional_stats = get_collection(Collections.REGIONAL_STATS)
+    
+    # Get all approved records
+    pipeline = [
+        {
+            '$match': {
+                'status': 'approved',
+                'date': {'$gte': date_from, '$lte': date_to}
+            }
+        },
+        {
+            '$group': {
+                '_id': {
+                    'region': '$patient_region',
+                    'disease': '$diagnosis',
+                    'date': '$date'
                 },
-                upsert=True
-            )
-            
-            regions_updated.add(region)
-            self.stdout.write(f'  Updated: {region} - {disease}: {total_cases} cases')
+                'total_cases': {'$sum': 1}
+            }
+        }
+    ]
+    
+    stats = []
+    region_totals = {}
+    for item in medical_records.aggregate(pipeline):
+        region = item['_id'].get('region', 'Unknown')
+        disease = item['_id'].get('disease', 'Unknown')
+        date = item['_id'].get('date')
+        total_cases = item['total_cases']
         
         # Also create aggregate totals per region
-        region_pipeline = [
+        if region:
+            region_totals[(region, date)] = region_totals.get((region, date), 0) + total_cases
+        
+        if not region or region == 'Unknown':
+            continue
+        stats.append((region, disease, date, total_cases))
+    
+    stats.extend(
+        (region, 'ALL', date, total_cases)
+        for (region, date), total_cases in region_totals.items()
+    )
+    
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
             {
-                '$match': {
-                    'status': 'approved',
-                    'date': target_date
-                }
+                'region': region,
+                'disease': disease,
+                'date': date
             },
             {
-                '$group': {
-                    '_id': '$patient_region',
-                    'total_cases': {'$sum': 1}
+                '$set': {
+                    'total_cases': total_cases,
+                    'updated_at': now
+                },
+                '$setOnInsert': {
+                    'created_at': now,
+                    **STAT_DEFAULTS
                 }
-            }
-        ]
+            },
+            upsert=True
+        )
+        for region, disease, date, total_cases in stats
+    ]
+    if operations:
+        regional_stats.bulk_write(operations, ordered=False)
+    
+    return stats
+
+
+class Command(BaseCommand):
+    help = 'Aggregate approved medical records into regional statistics'
+
+    def add_arguments(self, parser):
+        add_date_range_arguments(parser, 'Date to aggregate (YYYY-MM-DD). Defaults to today.')
+        parser.add_argument(
+            '--merge',
+            action='store_true',
+            help='Aggregate and write entirely server-side with $group and $merge.',
+        )
+
+    def handle(self, *args, **options):
+        date_from, date_to = parse_date_options(options)
+        label = date_from if date_from == date_to else f'{date_from} to {date_to}'
+        self.stdout.write(f'Starting aggregation for {label}...')
         
-        region_totals = list(medical_records.aggregate(region_pipeline))
+        if options.get('merge'):
+            # $merge on fields other than _id requires a matching unique index
+            ensure_indexes(collections=[Collections.REGIONAL_STATS])
+            map_date_range(merge_date_range, date_from, date_to, options['workers'])
+            invalidate_snapshots()
+            self.stdout.write(self.style.SUCCESS(
+                f'Aggregation complete. Merged stats for {label} server-side.'
+            ))
+            return
         
-        for item in region_totals:
-            region = item['_id']
-            if not region:
-                continue
-                
-            total_cases = item['total_cases']
-            
-            # Update region total
-            regional_stats.update_one(
-                {
-                    'region': region,
-                    'disease': 'ALL',
-                    'date': target_date
-                },
-                {
-                    '$set': {
-                        'total_cases': total_cases,
-                        'updated_at': datetime.utcnow()
-                    },
-                    '$setOnInsert': {
-                        'created_at': datetime.utcnow(),
-                        'risk_score': 50,
-                        'rainfall': 0,
-                        'humidity': 50,
-                        'ph': 7.0,
-                        'tds': 300
-                    }
-                },
-                upsert=True
-            )
+        regions_updated = set()
+        for stats in map_date_range(aggregate_date_range, date_from, date_to, options['workers']):
+            for region, disease, date, total_cases in stats:
+                if disease == 'ALL':
+                    continue
+                regions_updated.add(region)
+                self.stdout.write(f'  Updated: {region} - {disease} ({date}): {total_cases} cases')
+        invalidate_snapshots()
         
         self.stdout.write(self.style.SUCCESS(
             f'Aggregation complete. Updated {len(regions_updated)} regions.'
         ))
+
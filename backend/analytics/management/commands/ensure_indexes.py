@@ -0,0 +1,46 @@
+"""
+Management command to build the MongoDB indexes registered in healthiq.mongodb.
+
+Usage: python manage.py ensure_indexes [--collection NAME ...]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from healthiq.mongodb import ensure_indexes, IndexBuildError, INDEXES
+
+
+class Command(BaseCommand):
+    help = 'Create the registered MongoDB indexes (safe to run repeatedly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--collection',
+            action='append',
+            dest='collections',
+            help='Only index this collection. May be given more than once.',
+        )
+
+    def handle(self, *args, **options):
+        collections = options.get('collections')
+        unknown = set(collections or []) - set(INDEXES)
+        if unknown:
+            raise CommandError(f'No indexes registered for: {", ".join(sorted(unknown))}')
+        
+        self.stdout.write('Ensuring MongoDB indexes...')
+        
+        try:
+            created = ensure_indexes(collections=collections)
+        except IndexBuildError as e:
+            self.report(e.created)
+            for name, errors in e.failures.items():
+                for index_name, error in errors:
+                    self.stderr.write(f'  {name}.{index_name}: {error}')
+            raise CommandError(f'{sum(len(errors) for errors in e.failures.values())} indexes could not be built.')
+        
+        self.report(created)
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexes ensured for {len(created)} collections.'
+        ))
+
+    def report(self, created):
+        for name, index_names in created.items():
+            self.stdout.write(f'  {name}: {", ".join(index_names)}')
@@ -1,27 +1,43 @@
 """
 Management command to run the risk engine.
 
-Usage: python manage.py run_risk_engine
+Usage: python manage.py run_risk_engine [--date YYYY-MM-DD]
+       python manage.py run_risk_engine --from YYYY-MM-DD [--to YYYY-MM-DD] [--workers N]
 """
 
 from django.core.management.base import BaseCommand
-from analytics.risk_engine import run_risk_engine
+from analytics.backfill import add_date_range_arguments, map_date_range, parse_date_options
+from analytics.risk_engine import run_risk_engine, score_date_range
+from analytics.snapshots import invalidate_snapshots
 
 
 class Command(BaseCommand):
     help = 'Run the risk engine to calculate regional risk scores'
 
+    def add_arguments(self, parser):
+        add_date_range_arguments(parser, 'Date to score (YYYY-MM-DD). Defaults to today.')
+
     def handle(self, *args, **options):
+        date_from, date_to = parse_date_options(options)
         self.stdout.write('Starting risk engine...')
-        
-        results = run_risk_engine()
-        
+
+        if date_from == date_to:
+            results = run_risk_engine(date=date_from)
+        else:
+            # Backfills rewrite history, so they never raise alerts
+            results = [
+                result
+                for chunk in map_date_range(score_date_range, date_from, date_to, options['workers'])
+                for result in chunk
+            ]
+            invalidate_snapshots()
+
         for result in results:
             self.stdout.write(
-                f'  {result["region"]}: Score={result["risk_score"]} '
+                f'  {result["region"]} ({result["date"]}): Score={result["risk_score"]} '
                 f'Level={result["risk_level"]} Anomaly={result["is_anomaly"]}'
             )
-        
+
         self.stdout.write(self.style.SUCCESS(
-            f'Risk engine complete. Processed {len(results)} regions.'
+            f'Risk engine complete. Processed {len(results)} region-days.'
         ))
@@ -0,0 +1,165 @@
+"""
+Queries and payload shaping shared by the analytics views and their async ports.
+
+analytics.views and analytics.async_views only differ in how they read
+MongoDB (awaited on the async client or not); the filters they send and
+what they make of the documents they get back live here.
+"""
+
+from healthiq.conditional import latest
+
+
+def get_risk_level(score):
+    """Convert risk score to risk level."""
+    if score >= 76:
+        return 'critical'
+    elif score >= 51:
+        return 'high'
+    elif score >= 26:
+        return 'medium'
+    return 'low'
+
+
+def normalize_region(region):
+    """Handle both underscore and space formats."""
+    return region.replace(' ', '_') if ' ' in region else region
+
+
+# Top diagnoses of approved records
+DISEASE_DISTRIBUTION_PIPELINE = [
+    {'$match': {'status': 'approved'}},
+    {'$group': {'_id': '$diagnosis', 'count': {'$sum': 1}}},
+    {'$sort': {'count': -1}},
+    {'$limit': 10}
+]
+
+
+# The latest ALL stats, shown by region_trend without a region
+LATEST_TREND_QUERY = {'disease': 'ALL'}
+LATEST_TREND_LIMIT = 7
+
+# The most recent review of a medical record
+LAST_REVIEW_QUERY = {'reviewed_at': {'$exists': True}}
+LAST_REVIEW_PROJECTION = {'reviewed_at': 1}
+LAST_REVIEW_SORT = [('reviewed_at', -1)]
+
+
+def requested_regions(request, default=None):
+    """The region param as a one-region list, else default."""
+    region = request.GET.get('region')
+    return [normalize_region(region)] if region else default
+
+
+def region_stats_watermark(regions, snapshots):
+    """Dates and update times of the ALL stats in the regions' snapshots."""
+    stats = {r: [(s.get('date'), s.get('updated_at')) for s in snapshots[r]['trend']] for r in regions}
+    last_modified = latest(*(updated_at for trend in stats.values() for _, updated_at in trend))
+    return last_modified, sorted(stats.items())
+
+
+def latest_stats_watermark(stats):
+    """Update times of the latest ALL stats (region_trend without a region)."""
+    return latest(*(s.get('updated_at') for s in stats)), [(s['_id'], s.get('updated_at')) for s in stats]
+
+
+def review_watermark(last_review):
+    """
+    The latest review, which versions the disease distribution.
+    
+    Records only become approved (or stop being approved) through a
+    review, and are never deleted, so one read of the reviewed_at index is
+    enough; counting the approved records on every poll is not needed.
+    """
+    last_reviewed_at = last_review['reviewed_at'] if last_review else None
+    return last_reviewed_at, last_reviewed_at
+
+
+def build_region_risk(regions, snapshots):
+    """Risk entries of the regions from their snapshots."""
+    result = []
+    
+    for region in regions:
+        stat = snapshots[region]['stat']
+        if stat:
+            result.append({
+                'region_id': region,
+                'region': region.replace('_', ' '),
+                'risk_score': stat.get('risk_score', 50),
+                'risk_level': get_risk_level(stat.get('risk_score', 50)),
+                'total_cases': stat.get('total_cases', 0),
+                'growth_rate': stat.get('growth_rate', 0),
+                'is_anomaly': stat.get('is_anomaly', False)
+            })
+        else:
+            # Default data if no stats exist
+            result.append({
+                'region_id': region,
+                'region': region.replace('_', ' '),
+                'risk_score': 50,
+                'risk_level': 'medium',
+                'total_cases': 0,
+                'growth_rate': 0,
+                'is_anomaly': False
+            })
+    
+    return result
+
+
+def build_region_trend(stats):
+    """Daily average risk score and total cases of ALL stats."""
+    # Aggregate by date
+    trend_map = {}
+    for stat in stats:
+        date = stat.get('date', '')
+        if date not in trend_map:
+            trend_map[date] = {'date': date, 'score': 0, 'cases': 0, 'count': 0}
+        trend_map[date]['score'] += stat.get('risk_score', 0)
+        trend_map[date]['cases'] += stat.get('total_cases', 0)
+        trend_map[date]['count'] += 1
+    
+    # Calculate averages
+    result = []
+    for date, data in sorted(trend_map.items()):
+        result.append({
+            'date': date,
+            'score': int(data['score'] / data['count']) if data['count'] > 0 else 0,
+            'cases': data['cases']
+        })
+    
+    return result
+
+
+def build_disease_distribution(disease_counts):
+    """Share of each diagnosis among the top diagnoses."""
+    total = sum(d['count'] for d in disease_counts)
+    
+    return [
+        {
+            'disease': d['_id'],
+            'count': d['count'],
+            'percentage': round((d['count'] / total) * 100, 1) if total > 0 else 0
+        }
+        for d in disease_counts
+    ]
+
+
+def build_environmental_data(regions, snapshots):
+    """Weather and water readings of the regions from their snapshots."""
+    result = []
+    
+    for r in regions:
+        weather_data = snapshots[r]['weather']
+        water_data = snapshots[r]['water']
+        
+        result.append({
+            'region_id': r,
+            'region': r.replace('_', ' '),
+            'rainfall': weather_data.get('rainfall', 0) if weather_data else 0,
+            'humidity': weather_data.get('humidity', 0) if weather_data else 0,
+            'temperature': weather_data.get('temperature', 0) if weather_data else 0,
+            'water_ph': water_data.get('ph', 7.0) if water_data else 7.0,
+            'tds': water_data.get('tds', 0) if water_data else 0,
+            'air_quality': weather_data.get('air_quality', 'Good') if weather_data else 'Good'
+        })
+    
+    return result
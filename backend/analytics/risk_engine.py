@@ -6,12 +6,48 @@ This module provides functions for:
 2. Detecting anomalies using statistical methods
 3. Computing overall risk scores
 4. Updating regional statistics
+
+The scalar helpers score a single region; the batch engine scores every
+region at once over NumPy arrays so a nightly run costs a handful of
+round trips regardless of how many regions exist.
 """
 
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import statistics
+import threading
+import time
+import numpy as np
+from pymongo import ReturnDocument, UpdateOne
 from healthiq.mongodb import get_collection, Collections
+from analytics.backfill import date_range
+from analytics.snapshots import invalidate_snapshots, refresh_region_snapshots
+
+
+# Number of prior days used as the anomaly baseline
+WINDOW_DAYS = 7
+
+# Seconds a cached baseline window or environment reading stays valid
+WINDOW_CACHE_TTL = 300
+# Entries each of those caches holds before the oldest are evicted
+WINDOW_CACHE_MAX_ENTRIES = 1024
+
+# Defaults for regional stat documents created by a counter upsert
+STAT_DEFAULTS = {
+    'risk_score': 50,
+    'rainfall': 0,
+    'humidity': 50,
+    'ph': 7.0,
+    'tds': 300
+}
+
+# Per-process caches of refresh_region_risk, oldest entry first.
+# (region, date) -> (expires_at, counts, present) for the WINDOW_DAYS before date
+_window_cache: Dict[Tuple[str, str], Tuple[float, np.ndarray, np.ndarray]] = {}
+# (region, date) -> (expires_at, environment current on date)
+_environment_cache: Dict[Tuple[str, str], Tuple[float, Dict]] = {}
+_cache_lock = threading.Lock()
 
 
 def get_risk_level(score: int) -> str:
@@ -114,105 +150,588 @@ def calculate_risk_score(
     return int(max(0, min(100, score)))
 
 
-def update_regional_risk(region: str) -> Dict:
+def calculate_growth_rates(today_cases: np.ndarray, yesterday_cases: np.ndarray) -> np.ndarray:
+    """Vectorized counterpart of calculate_growth_rate."""
+    today_cases = today_cases.astype(float)
+    yesterday_cases = yesterday_cases.astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = (today_cases - yesterday_cases) / yesterday_cases * 100
+    no_baseline = np.where(today_cases == 0, 0.0, 100.0)
+    return np.where(yesterday_cases == 0, no_baseline, rates)
+
+
+def detect_anomalies(
+    current_values: np.ndarray,
+    historical_values: np.ndarray,
+    present: np.ndarray,
+    std_multiplier: float = 2.0
+) -> np.ndarray:
     """
-    Update risk score for a specific region.
+    Vectorized counterpart of detect_anomaly.
     
     Args:
-        region: The region name
+        current_values: Shape (..., ) current value per row
+        historical_values: Shape (..., N) history per row
+        present: Boolean mask of the same shape marking history values that exist
+        std_multiplier: Number of standard deviations for threshold
     
     Returns:
-        Updated regional statistics
+        Boolean array, True where the current value is an anomaly
+    """
+    values = np.where(present, historical_values, 0).astype(float)
+    counts = present.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = values.sum(axis=-1) / counts
+        squared = np.where(present, (values - mean[..., None]) ** 2, 0.0)
+        std = np.sqrt(squared.sum(axis=-1) / (counts - 1))
+    threshold = mean + (std_multiplier * std)
+    return (counts >= 2) & (current_values > threshold)
+
+
+def normalize_values(values: np.ndarray, min_val: float, max_val: float) -> np.ndarray:
+    """Vectorized counterpart of normalize_value."""
+    if max_val == min_val:
+        return np.full(np.shape(values), 50.0)
+    normalized = ((values - min_val) / (max_val - min_val)) * 100
+    return np.clip(normalized, 0, 100)
+
+
+def calculate_risk_scores(
+    growth_rates: np.ndarray,
+    rainfall: np.ndarray,
+    humidity: np.ndarray,
+    water_quality_anomaly: np.ndarray,
+    is_disease_anomaly: np.ndarray
+) -> np.ndarray:
+    """Vectorized counterpart of calculate_risk_score, same formula and bounds."""
+    score = (
+        0.5 * normalize_values(growth_rates, -50, 100) +
+        0.2 * normalize_values(rainfall, 0, 200) +
+        0.2 * humidity +
+        0.1 * np.where(water_quality_anomaly, 100, 0)
+    )
+    score = np.where(is_disease_anomaly, np.minimum(100, score + 20), score)
+    return np.clip(score, 0, 100).astype(int)
+
+
+def is_water_quality_anomaly(water_data: Optional[Dict]) -> bool:
+    """Check water quality anomaly (pH outside 6.5-8.5 or TDS > 500)."""
+    if not water_data:
+        return False
+    ph = water_data.get('ph')
+    tds = water_data.get('tds')
+    ph = 7.0 if ph is None else ph
+    tds = 0 if tds is None else tds
+    return ph < 6.5 or ph > 8.5 or tds > 500
+
+
+def window_dates(target_date: str, days: int = WINDOW_DAYS) -> List[str]:
+    """Dates from `days` before target_date up to target_date, oldest first."""
+    target = datetime.strptime(target_date, '%Y-%m-%d')
+    return [(target - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days, -1, -1)]
+
+
+def fetch_case_series(
+    date_from: str,
+    date_to: str,
+    regions: Optional[List[str]] = None
+) -> Tuple[List[str], List[str], np.ndarray, np.ndarray]:
+    """
+    Load the daily ALL case series of every region in one aggregation.
+    
+    The series starts WINDOW_DAYS before date_from so every day in the
+    range has a full trailing window.
+    
+    Returns:
+        (regions, dates, counts, present) where counts and present have
+        shape (len(regions), len(dates)), oldest day first.
     """
     regional_stats = get_collection(Collections.REGIONAL_STATS)
+    dates = window_dates(date_from)[:-1] + date_range(date_from, date_to)
+    date_index = {date: i for i, date in enumerate(dates)}
+    
+    match = {'disease': 'ALL', 'date': {'$gte': dates[0], '$lte': dates[-1]}}
+    if regions is not None:
+        match['region'] = {'$in': list(regions)}
+    
+    pipeline = [
+        {'$match': match},
+        {
+            '$group': {
+                '_id': '$region',
+                'days': {'$push': {'date': '$date', 'total_cases': '$total_cases'}}
+            }
+        }
+    ]
+    
+    series = [s for s in regional_stats.aggregate(pipeline) if s['_id']]
+    
+    counts = np.zeros((len(series), len(dates)), dtype=float)
+    present = np.zeros((len(series), len(dates)), dtype=bool)
+    for row, region_series in enumerate(series):
+        for day in region_series['days']:
+            col = date_index.get(day['date'])
+            if col is None:
+                continue
+            counts[row, col] = day.get('total_cases') or 0
+            present[row, col] = True
+    
+    return [s['_id'] for s in series], dates, counts, present
+
+
+def _environment(weather_data: Optional[Dict], water_data: Optional[Dict]) -> Dict:
+    """Risk inputs of a weather and a water reading, with defaults for missing ones."""
+    weather_data = weather_data or {}
+    rainfall = weather_data.get('rainfall')
+    humidity = weather_data.get('humidity')
+    return {
+        'rainfall': 0 if rainfall is None else rainfall,
+        'humidity': 50 if humidity is None else humidity,
+        'water_quality_anomaly': is_water_quality_anomaly(water_data),
+    }
+
+
+def fetch_environment(regions: List[str], dates: List[str]) -> Dict[str, List[Dict]]:
+    """
+    Load the weather and water reading current on each date for every region.
+    
+    A date gets the region's latest reading on or before it, so past days
+    are scored with the environment they had rather than today's.
+    
+    Args:
+        regions: Regions to load
+        dates: Dates to resolve (YYYY-MM-DD), oldest first
+    
+    Returns:
+        Mapping of region to one entry per date with rainfall, humidity and
+        water_quality_anomaly.
+    """
     weather = get_collection(Collections.WEATHER_DATA)
     water = get_collection(Collections.WATER_QUALITY)
     
-    today = datetime.utcnow().strftime('%Y-%m-%d')
+    def readings(collection, fields):
+        """Readings of the range, oldest first, after the last one before it."""
+        match = {'region': {'$in': list(regions)}}
+        projection = {'_id': 0, 'region': 1, 'date': 1, **{f: 1 for f in fields}}
+        by_region = defaultdict(list)
+        for doc in collection.aggregate([
+            {'$match': {**match, 'date': {'$lt': dates[0]}}},
+            {'$sort': {'region': 1, 'date': -1}},
+            {'$group': {'_id': '$region', 'latest': {'$first': '$$ROOT'}}}
+        ]):
+            by_region[doc['_id']].append(doc['latest'])
+        for doc in collection.find(
+            {**match, 'date': {'$gte': dates[0], '$lte': dates[-1]}}, projection
+        ).sort('date', 1):
+            by_region[doc['region']].append(doc)
+        return by_region
     
-    # Get today's stats
-    today_stat = regional_stats.find_one({'region': region, 'date': today})
-    if not today_stat:
-        return None
+    def as_of(series):
+        """The reading current on each date."""
+        current, k, result = None, 0, []
+        for date in dates:
+            while k < len(series) and series[k]['date'] <= date:
+                current = series[k]
+                k += 1
+            result.append(current)
+        return result
     
-    today_cases = today_stat.get('total_cases', 0)
+    weather_by_region = readings(weather, ['rainfall', 'humidity'])
+    water_by_region = readings(water, ['ph', 'tds'])
     
-    # Get yesterday's cases
-    yesterday = (datetime.utcnow() - timedelta(days=1)).strftime('%Y-%m-%d')
-    yesterday_stat = regional_stats.find_one({'region': region, 'date': yesterday})
-    yesterday_cases = yesterday_stat.get('total_cases', 0) if yesterday_stat else 0
+    return {
+        region: [
+            _environment(weather_data, water_data)
+            for weather_data, water_data in zip(
+                as_of(weather_by_region.get(region, [])), as_of(water_by_region.get(region, []))
+            )
+        ]
+        for region in regions
+    }
+
+
+def compute_region_risks(
+    counts: np.ndarray,
+    present: np.ndarray,
+    rainfall: np.ndarray,
+    humidity: np.ndarray,
+    water_quality_anomaly: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Score case windows shaped (..., WINDOW_DAYS + 1), oldest day first.
     
-    # Get last 7 days for anomaly detection
-    last_7_days = [(datetime.utcnow() - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(1, 8)]
-    historical_cases = []
-    for date in last_7_days:
-        stat = regional_stats.find_one({'region': region, 'date': date})
-        if stat:
-            historical_cases.append(stat.get('total_cases', 0))
+    Any leading shape is allowed, so one call can score every region for
+    a single day or every region for every day of a range.
+    """
+    today_cases = counts[..., -1]
+    growth_rates = calculate_growth_rates(today_cases, counts[..., -2])
+    is_anomaly = detect_anomalies(today_cases, counts[..., :-1], present[..., :-1])
+    risk_scores = calculate_risk_scores(
+        growth_rates, rainfall, humidity, water_quality_anomaly, is_anomaly
+    )
+    return {
+        'total_cases': today_cases,
+        'growth_rate': growth_rates,
+        'is_anomaly': is_anomaly,
+        'risk_score': risk_scores,
+    }
+
+
+def score_date_range(
+    date_from: str,
+    date_to: str,
+    regions: Optional[List[str]] = None
+) -> List[Dict]:
+    """
+    Score every region for every day of a range and write the results back.
     
-    # Calculate growth rate
-    growth_rate = calculate_growth_rate(today_cases, yesterday_cases)
+    Trailing windows are sliced out of one in-memory series per region and
+    each day is scored with the environment reading current on that day, so
+    the cost is four environment reads, one series aggregation and one
+    bulk_write however long the range is.
     
-    # Detect disease anomaly
-    is_anomaly = detect_anomaly(today_cases, historical_cases)
+    Returns:
+        Updated regional statistics, one entry per region and scored day
+    """
+    region_names, dates, counts, present = fetch_case_series(date_from, date_to, regions)
+    if not region_names:
+        return []
     
-    # Get environmental data
-    weather_data = weather.find_one({'region': region}, sort=[('date', -1)])
-    water_data = water.find_one({'region': region}, sort=[('date', -1)])
+    scored_dates = dates[WINDOW_DAYS:]
+    environment = fetch_environment(region_names, scored_dates)
     
-    rainfall = weather_data.get('rainfall', 0) if weather_data else 0
-    humidity = weather_data.get('humidity', 50) if weather_data else 50
+    def environment_array(field, dtype):
+        # Shape (regions, days)
+        return np.array([[day[field] for day in environment[r]] for r in region_names], dtype=dtype)
     
-    # Check water quality anomaly (pH outside 6.5-8.5 or TDS > 500)
-    water_quality_anomaly = False
-    if water_data:
-        ph = water_data.get('ph', 7.0)
-        tds = water_data.get('tds', 0)
-        water_quality_anomaly = ph < 6.5 or ph > 8.5 or tds > 500
+    rainfall = environment_array('rainfall', float)
+    humidity = environment_array('humidity', float)
+    water_anomaly = environment_array('water_quality_anomaly', bool)
     
-    # Calculate risk score
-    risk_score = calculate_risk_score(growth_rate, rainfall, humidity, water_quality_anomaly, is_anomaly)
-    risk_level = get_risk_level(risk_score)
+    # Shape (regions, days, WINDOW_DAYS + 1)
+    count_windows = np.lib.stride_tricks.sliding_window_view(counts, WINDOW_DAYS + 1, axis=1)
+    present_windows = np.lib.stride_tricks.sliding_window_view(present, WINDOW_DAYS + 1, axis=1)
+    risks = compute_region_risks(
+        count_windows,
+        present_windows,
+        rainfall,
+        humidity,
+        water_anomaly
+    )
     
-    # Update regional stat
-    regional_stats.update_one(
-        {'region': region, 'date': today},
-        {
-            '$set': {
-                'risk_score': risk_score,
-                'risk_level': risk_level,
-                'growth_rate': growth_rate,
-                'is_anomaly': is_anomaly,
-                'rainfall': rainfall,
-                'humidity': humidity,
-                'updated_at': datetime.utcnow()
-            }
+    now = datetime.utcnow()
+    results = []
+    operations = []
+    # Only days that have a stat are scored
+    for i, j in zip(*np.nonzero(present[:, WINDOW_DAYS:])):
+        region = region_names[i]
+        risk_score = int(risks['risk_score'][i, j])
+        result = {
+            'region': region,
+            'date': scored_dates[j],
+            'risk_score': risk_score,
+            'risk_level': get_risk_level(risk_score),
+            'total_cases': int(risks['total_cases'][i, j]),
+            'growth_rate': float(risks['growth_rate'][i, j]),
+            'is_anomaly': bool(risks['is_anomaly'][i, j])
         }
-    )
+        results.append(result)
+        operations.append(UpdateOne(
+            {'region': region, 'disease': 'ALL', 'date': result['date']},
+            {
+                '$set': {
+                    'risk_score': result['risk_score'],
+                    'risk_level': result['risk_level'],
+                    'growth_rate': result['growth_rate'],
+                    'is_anomaly': result['is_anomaly'],
+                    'rainfall': float(rainfall[i, j]),
+                    'humidity': float(humidity[i, j]),
+                    'updated_at': now
+                }
+            }
+        ))
+    
+    if operations:
+        get_collection(Collections.REGIONAL_STATS).bulk_write(operations, ordered=False)
+    
+    return results
+
+
+def run_risk_engine(
+    regions: Optional[List[str]] = None,
+    date: Optional[str] = None,
+    send_alerts: bool = True
+) -> List[Dict]:
+    """
+    Run the risk engine for every region with stats on the given date.
+    
+    Args:
+        regions: Restrict the run to these regions (default: all regions)
+        date: Date to score (YYYY-MM-DD). Defaults to today.
+        send_alerts: Whether to raise alerts for high-risk regions
+    
+    Returns:
+        Updated regional statistics, one entry per region
+    """
+    target_date = date or datetime.utcnow().strftime('%Y-%m-%d')
+    results = score_date_range(target_date, target_date, regions)
     
     # Trigger alerts if risk is high
-    if risk_score >= 75 or is_anomaly:
+    if send_alerts:
         from analytics.alerts import create_risk_alert
-        create_risk_alert(region, risk_score, risk_level, is_anomaly)
+        for result in results:
+            if result['risk_score'] >= 75 or result['is_anomaly']:
+                create_risk_alert(
+                    result['region'], result['risk_score'], result['risk_level'], result['is_anomaly']
+                )
+    
+    # Dashboards read the fresh scores from their snapshots
+    if results:
+        refresh_region_snapshots([result['region'] for result in results])
+        invalidate_snapshots([])
+    
+    return results
+
+
+def update_regional_risk(region: str) -> Optional[Dict]:
+    """
+    Update risk score for a specific region.
+    
+    Args:
+        region: The region name
+    
+    Returns:
+        Updated regional statistics, or None if the region has no stats today
+    """
+    results = run_risk_engine(regions=[region])
+    return results[0] if results else None
+
+
+def _cache_put(cache: Dict, key, *value):
+    """Store value under key for WINDOW_CACHE_TTL, evicting expired and excess entries."""
+    with _cache_lock:
+        cache.pop(key, None)
+        now = time.monotonic()
+        # Every entry lives one TTL, so insertion order is expiry order
+        while cache and (len(cache) >= WINDOW_CACHE_MAX_ENTRIES or next(iter(cache.values()))[0] <= now):
+            cache.pop(next(iter(cache)))
+        cache[key] = (now + WINDOW_CACHE_TTL, *value)
+
+
+def _cached_baseline(region: str, target_date: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Case counts of the WINDOW_DAYS before target_date, cached per process."""
+    key = (region, target_date)
+    cached = _window_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1], cached[2]
+    
+    regional_stats = get_collection(Collections.REGIONAL_STATS)
+    dates = window_dates(target_date)[:-1]
+    date_index = {date: i for i, date in enumerate(dates)}
+    
+    counts = np.zeros(len(dates), dtype=float)
+    present = np.zeros(len(dates), dtype=bool)
+    for stat in regional_stats.find(
+        {'region': region, 'disease': 'ALL', 'date': {'$in': dates}},
+        {'date': 1, 'total_cases': 1, '_id': 0}
+    ):
+        counts[date_index[stat['date']]] = stat.get('total_cases') or 0
+        present[date_index[stat['date']]] = True
     
+    _cache_put(_window_cache, key, counts, present)
+    return counts, present
+
+
+def _cached_environment(region: str, date: str) -> Dict:
+    """Environment reading of a region current on date, cached per process."""
+    key = (region, date)
+    cached = _environment_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    environment = fetch_environment([region], [date])[region][0]
+    _cache_put(_environment_cache, key, environment)
+    return environment
+
+
+def invalidate_window_cache(region: str, date: str):
+    """
+    Drop cached baselines of a region whose window contains date.
+    
+    Only this process's cache is affected; other workers keep their copy of
+    the baseline until it expires, at most WINDOW_CACHE_TTL seconds later.
+    """
+    target = datetime.strptime(date, '%Y-%m-%d')
+    affected = {
+        (target + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(1, WINDOW_DAYS + 1)
+    }
+    with _cache_lock:
+        for key in [k for k in _window_cache if k[0] == region and k[1] in affected]:
+            _window_cache.pop(key, None)
+
+
+def _counter_update(delta: int, now: datetime) -> Dict:
     return {
+        '$inc': {'total_cases': delta},
+        '$set': {'updated_at': now},
+        '$setOnInsert': {'created_at': now, **STAT_DEFAULTS}
+    }
+
+
+def adjust_case_counters(region: str, disease: Optional[str], date: str, delta: int) -> Optional[Dict]:
+    """
+    Atomically adjust the (region, disease, date) and (region, ALL, date) counters.
+    
+    Returns:
+        The updated ALL stat for the region and date, or None if it does not exist
+    """
+    regional_stats = get_collection(Collections.REGIONAL_STATS)
+    update = _counter_update(delta, datetime.utcnow())
+    upsert = delta > 0
+    
+    if disease and disease != 'ALL':
+        regional_stats.update_one(
+            {'region': region, 'disease': disease, 'date': date}, update, upsert=upsert
+        )
+    
+    invalidate_window_cache(region, date)
+    return regional_stats.find_one_and_update(
+        {'region': region, 'disease': 'ALL', 'date': date},
+        update,
+        upsert=upsert,
+        return_document=ReturnDocument.AFTER,
+        projection={'total_cases': 1, 'risk_score': 1, 'is_anomaly': 1}
+    )
+
+
+def refresh_region_risk(region: str, date: str, stat: Dict) -> Dict:
+    """
+    Recompute one region's score for a date from its freshly updated ALL stat.
+    
+    The prior-day baseline and the environment come from the process cache,
+    so a refresh normally costs a single write.
+    """
+    prior_counts, prior_present = _cached_baseline(region, date)
+    environment = _cached_environment(region, date)
+    
+    counts = np.append(prior_counts, stat.get('total_cases') or 0)
+    present = np.append(prior_present, True)
+    risks = compute_region_risks(
+        counts,
+        present,
+        np.float64(environment['rainfall']),
+        np.float64(environment['humidity']),
+        np.bool_(environment['water_quality_anomaly'])
+    )
+    
+    risk_score = int(risks['risk_score'])
+    result = {
         'region': region,
         'risk_score': risk_score,
-        'risk_level': risk_level,
-        'total_cases': today_cases,
-        'growth_rate': growth_rate,
-        'is_anomaly': is_anomaly
+        'risk_level': get_risk_level(risk_score),
+        'total_cases': int(risks['total_cases']),
+        'growth_rate': float(risks['growth_rate']),
+        'is_anomaly': bool(risks['is_anomaly'])
     }
+    
+    get_collection(Collections.REGIONAL_STATS).update_one(
+        {'_id': stat['_id']},
+        {
+            '$set': {
+                'risk_score': result['risk_score'],
+                'risk_level': result['risk_level'],
+                'growth_rate': result['growth_rate'],
+                'is_anomaly': result['is_anomaly'],
+                'rainfall': environment['rainfall'],
+                'humidity': environment['humidity'],
+                'updated_at': datetime.utcnow()
+            }
+        }
+    )
+    
+    # Only alert when this change pushes the region over the threshold
+    was_alerting = stat.get('risk_score', 0) >= 75 or stat.get('is_anomaly', False)
+    if (risk_score >= 75 or result['is_anomaly']) and not was_alerting:
+        from analytics.alerts import create_risk_alert
+        # Called from the request path, so never block on the fan-out
+        create_risk_alert(
+            region, risk_score, result['risk_level'], result['is_anomaly'], background=True
+        )
+    
+    return result
 
 
-def run_risk_engine():
-    """Run risk engine for all regions."""
-    regions = ['North Region', 'South Region', 'East Region', 'West Region', 'Central Region']
-    results = []
+def _review_delta(record: Dict, new_status: str) -> int:
+    """Change in approved case count caused by moving record to new_status."""
+    was_approved = record.get('status') == 'approved'
+    is_approved = new_status == 'approved'
+    if was_approved == is_approved or not record.get('patient_region') or not record.get('date'):
+        return 0
+    return 1 if is_approved else -1
+
+
+def apply_record_reviews(reviews: List[Tuple[Dict, str]]) -> List[Dict]:
+    """
+    Keep regional counters and risk in step with a batch of record reviews.
     
-    for region in regions:
-        result = update_regional_risk(region)
-        if result:
-            results.append(result)
+    Case count changes are summed first, so the disease counters take one
+    bulk write and each affected region and date is re-scored once.
     
+    Args:
+        reviews: (record as it was before the review, new status) pairs
+    
+    Returns:
+        The refreshed regional risks, one per affected region and date
+    """
+    disease_deltas = defaultdict(int)
+    all_deltas = defaultdict(int)
+    for record, new_status in reviews:
+        delta = _review_delta(record, new_status)
+        if not delta:
+            continue
+        key = (record['patient_region'], record['date'])
+        all_deltas[key] += delta
+        disease = record.get('diagnosis')
+        if disease and disease != 'ALL':
+            disease_deltas[(*key, disease)] += delta
+    
+    all_deltas = {key: delta for key, delta in all_deltas.items() if delta}
+    if not all_deltas:
+        return []
+    
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {'region': region, 'disease': disease, 'date': date},
+            _counter_update(delta, now),
+            upsert=delta > 0
+        )
+        for (region, date, disease), delta in disease_deltas.items()
+        if delta
+    ]
+    if operations:
+        get_collection(Collections.REGIONAL_STATS).bulk_write(operations, ordered=False)
+    
+    results = []
+    for (region, date), delta in all_deltas.items():
+        stat = adjust_case_counters(region, None, date, delta)
+        if stat:
+            results.append(refresh_region_risk(region, date, stat))
+    
+    invalidate_snapshots(sorted({region for region, _ in all_deltas}))
     return results
+
+
+def apply_record_review(record: Dict, new_status: str) -> Optional[Dict]:
+    """
+    Keep regional counters and risk in step with a medical record review.
+    
+    Args:
+        record: The medical record as it was before the review
+        new_status: The status the record was moved to
+    
+    Returns:
+        The refreshed regional risk, or None if no counter changed
+    """
+    results = apply_record_reviews([(record, new_status)])
+    return results[0] if results else None
@@ -0,0 +1,447 @@
+"""
+Dashboard Snapshots - Precomputed region and admin dashboard facts.
+
+The dashboards show the same region-level facts to every viewer: latest
+risk stat, latest weather, latest water reading and the recent trend.
+Those are computed once per region (and once for the admin overview) by
+the risk engine and environmental ingestion, and stored in
+dashboard_snapshots so a dashboard request costs a single indexed read.
+
+A snapshot is stale when it is older than
+settings.DASHBOARD_SNAPSHOT_MAX_AGE seconds or has been invalidated. A
+stale snapshot is rebuilt on read by the one request holding its rebuild
+lock, and served as it is to the other readers meanwhile. Missing
+snapshots and those of an older SNAPSHOT_VERSION are rebuilt by every
+reader. The locks live in Django's cache, so with the default per-process
+locmem cache each worker process rebuilds at most once at a time.
+
+Only the DASHBOARD_REGIONS and regions with regional stats are stored;
+the snapshot of any other region is computed for the request only.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from pymongo import ReplaceOne
+from healthiq.cache import CacheNamespaces, invalidate_namespace
+from healthiq.concurrency import run_concurrently
+from healthiq.mongodb import get_async_collection, get_collection, Collections
+from notifications.broadcasts import active_broadcasts_query
+
+
+# Bump when the snapshot document layout changes
+SNAPSHOT_VERSION = 2
+
+# Regions shown on the dashboards
+DASHBOARD_REGIONS = ['Chennai_South', 'Chennai_Central', 'Coimbatore']
+
+ADMIN_SNAPSHOT_ID = 'admin'
+
+# Seconds a rebuild lock is held at most, so a crashed rebuild does not
+# leave its snapshot stale for good
+REBUILD_LOCK_TIMEOUT = 30
+
+# generated_at of an invalidated snapshot, older than any max age
+INVALIDATED_AT = datetime(1970, 1, 1)
+
+# Number of recent ALL stats kept as the trend
+TREND_LENGTH = 7
+
+# Newest stats first. By date, because reviews and backfills update the
+# stats of past days too; updated_at only breaks ties between regions.
+LATEST_STATS_SORT = [('date', -1), ('updated_at', -1)]
+
+
+def region_snapshot_id(region: str) -> str:
+    return f'region:{region}'
+
+
+def _get_risk_level(score):
+    """Convert risk score to risk level."""
+    if score >= 76:
+        return 'critical'
+    elif score >= 51:
+        return 'high'
+    elif score >= 26:
+        return 'medium'
+    return 'low'
+
+
+def _is_servable(snapshot: Optional[Dict]) -> bool:
+    """Whether a snapshot exists and matches the current schema."""
+    return bool(snapshot) and snapshot.get('version') == SNAPSHOT_VERSION
+
+
+def _is_fresh(snapshot: Optional[Dict]) -> bool:
+    """Whether a snapshot matches the current schema and is recent enough."""
+    if not _is_servable(snapshot):
+        return False
+    max_age = timedelta(seconds=settings.DASHBOARD_SNAPSHOT_MAX_AGE)
+    return snapshot.get('generated_at', datetime.min) >= datetime.utcnow() - max_age
+
+
+def _rebuild_lock_key(snapshot_id: str) -> str:
+    return f'snapshots:rebuild:{snapshot_id}'
+
+
+def _claim_rebuild(snapshot_id: str, snapshot: Optional[Dict]) -> bool:
+    """
+    Whether this request should rebuild a snapshot that is not fresh.
+    
+    A servable snapshot is rebuilt only by the request that takes its
+    rebuild lock; it must then call _release_rebuilds.
+    """
+    if not _is_servable(snapshot):
+        return True
+    return cache.add(_rebuild_lock_key(snapshot_id), True, timeout=REBUILD_LOCK_TIMEOUT)
+
+
+def _release_rebuilds(snapshot_ids: List[str]):
+    if snapshot_ids:
+        cache.delete_many([_rebuild_lock_key(snapshot_id) for snapshot_id in snapshot_ids])
+
+
+def _drop_responses_built_meanwhile():
+    # Readers served the stale snapshot during the rebuild and may have cached responses from it
+    invalidate_namespace(CacheNamespaces.ANALYTICS)
+
+
+def _latest_by_region(collection, match: Dict, regions: List[str], sort: List, fields: List[str], n: int = 1) -> Dict[str, List[Dict]]:
+    """
+    Newest n documents of each region by sort, keeping only the given fields.
+    
+    Runs one find per region on its (region, sort) index, so it reads n
+    documents per region however long the history is.
+    """
+    projection = {'_id': 0, 'region': 1, **{field: 1 for field in fields}}
+    return {
+        region: list(collection.find({**match, 'region': region}, projection).sort(sort).limit(n))
+        for region in regions
+    }
+
+
+def refresh_region_snapshots(regions: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Rebuild and store the snapshots of the given regions.
+    
+    The source collections are read concurrently. Snapshots of regions
+    outside DASHBOARD_REGIONS without any regional stat are returned but
+    not stored, so a region name sent by a client never creates a document.
+    
+    Returns:
+        Mapping of region to its new snapshot
+    """
+    regions = list(regions or DASHBOARD_REGIONS)
+    if not regions:
+        return {}
+    
+    regional_stats = get_collection(Collections.REGIONAL_STATS)
+    weather = get_collection(Collections.WEATHER_DATA)
+    water = get_collection(Collections.WATER_QUALITY)
+    snapshots = get_collection(Collections.DASHBOARD_SNAPSHOTS)
+    
+    latest = run_concurrently(
+        trends=lambda: _latest_by_region(
+            regional_stats,
+            {'disease': 'ALL'},
+            regions,
+            LATEST_STATS_SORT,
+            ['date', 'risk_score', 'total_cases', 'growth_rate', 'is_anomaly', 'updated_at'],
+            n=TREND_LENGTH
+        ),
+        weather=lambda: _latest_by_region(
+            weather,
+            {},
+            regions,
+            [('date', -1)],
+            ['rainfall', 'humidity', 'temperature', 'air_quality']
+        ),
+        water=lambda: _latest_by_region(
+            water,
+            {},
+            regions,
+            [('date', -1)],
+            ['ph', 'tds']
+        )
+    )
+    trends, weather_by_region, water_by_region = latest['trends'], latest['weather'], latest['water']
+    
+    now = datetime.utcnow()
+    result = {}
+    for region in regions:
+        trend = trends.get(region, [])
+        result[region] = {
+            '_id': region_snapshot_id(region),
+            'version': SNAPSHOT_VERSION,
+            'generated_at': now,
+            'region': region,
+            'stat': trend[0] if trend else None,
+            'weather': (weather_by_region[region] or [None])[0],
+            'water': (water_by_region[region] or [None])[0],
+            # Newest first, like the stats it is built from
+            'trend': trend
+        }
+    
+    known = [s for region, s in result.items() if region in DASHBOARD_REGIONS or s['trend']]
+    if known:
+        snapshots.bulk_write(
+            [ReplaceOne({'_id': s['_id']}, s, upsert=True) for s in known],
+            ordered=False
+        )
+    return result
+
+
+def _resolve_region_snapshots(regions: List[str], stored: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Snapshots of the regions from their stored ones, rebuilding those this request claims."""
+    found = {}
+    rebuild, claimed = [], []
+    for region in regions:
+        snapshot = stored.get(region)
+        if _is_fresh(snapshot):
+            found[region] = snapshot
+        elif _claim_rebuild(region_snapshot_id(region), snapshot):
+            rebuild.append(region)
+            if snapshot:
+                claimed.append(region_snapshot_id(region))
+        else:
+            # Another request is rebuilding it
+            found[region] = snapshot
+    
+    if rebuild:
+        try:
+            found.update(refresh_region_snapshots(rebuild))
+            if claimed:
+                _drop_responses_built_meanwhile()
+        finally:
+            _release_rebuilds(claimed)
+    return found
+
+
+def get_region_snapshots(regions: List[str]) -> Dict[str, Dict]:
+    """Snapshots of the given regions in one read, rebuilding stale or missing ones."""
+    stored = {
+        s['region']: s for s in get_collection(Collections.DASHBOARD_SNAPSHOTS).find(
+            {'_id': {'$in': [region_snapshot_id(r) for r in regions]}}
+        )
+    }
+    return _resolve_region_snapshots(regions, stored)
+
+
+async def aget_region_snapshots(regions: List[str]) -> Dict[str, Dict]:
+    """Async get_region_snapshots; the rare rebuild runs on a worker thread."""
+    cursor = get_async_collection(Collections.DASHBOARD_SNAPSHOTS).find(
+        {'_id': {'$in': [region_snapshot_id(r) for r in regions]}}
+    )
+    stored = {s['region']: s async for s in cursor}
+    if all(_is_fresh(stored.get(r)) for r in regions):
+        return stored
+    return await sync_to_async(_resolve_region_snapshots, thread_sensitive=False)(regions, stored)
+
+
+def build_admin_overview() -> Dict:
+    """Compute the admin dashboard payload from the source collections."""
+    patients = get_collection(Collections.PATIENTS)
+    medical_records = get_collection(Collections.MEDICAL_RECORDS)
+    regional_stats = get_collection(Collections.REGIONAL_STATS)
+    notifications = get_collection(Collections.NOTIFICATIONS)
+    weather = get_collection(Collections.WEATHER_DATA)
+    water = get_collection(Collections.WATER_QUALITY)
+    
+    regions = DASHBOARD_REGIONS
+    now = datetime.utcnow()
+    trend_days = [now - timedelta(days=i) for i in range(6, -1, -1)]
+    trend_dates = [day.strftime('%Y-%m-%d') for day in trend_days]
+    today = trend_dates[-1]
+    
+    # The overview's queries are independent of each other, so they run concurrently
+    results = run_concurrently(
+        # Total patients
+        total_patients=lambda: patients.count_documents({}),
+        # Approved cases per day of the last week and top diseases, in one pass
+        records_facets=lambda: next(medical_records.aggregate([
+            {'$match': {'status': 'approved'}},
+            {
+                '$facet': {
+                    'trend': [
+                        {'$match': {'date': {'$in': trend_dates}}},
+                        {'$group': {'_id': '$date', 'count': {'$sum': 1}}}
+                    ],
+                    'diseases': [
+                        {'$group': {'_id': '$diagnosis', 'count': {'$sum': 1}}},
+                        {'$sort': {'count': -1}},
+                        {'$limit': 5}
+                    ]
+                }
+            }
+        ])),
+        # Active alerts (unread personal risk notifications plus recent regional broadcasts)
+        active_alerts=lambda: notifications.count_documents({
+            'type': 'risk',
+            '$or': [{'is_read': False}, active_broadcasts_query()]
+        }),
+        # Latest ALL stat per region
+        latest_stats=lambda: _latest_by_region(
+            regional_stats, {'disease': 'ALL'}, regions, LATEST_STATS_SORT, ['risk_score', 'total_cases']
+        ),
+        # Water quality (latest reading per region)
+        latest_water=lambda: _latest_by_region(water, {}, regions, [('date', -1)], ['ph', 'tds']),
+        # Weather data (latest reading)
+        latest_weather=lambda: weather.find_one({}, sort=[('date', -1)])
+    )
+    total_patients = results['total_patients']
+    records_facets = results['records_facets']
+    active_alerts = results['active_alerts']
+    latest_stats = results['latest_stats']
+    latest_water = results['latest_water']
+    latest_weather = results['latest_weather']
+    
+    cases_by_date = {d['_id']: d['count'] for d in records_facets['trend']}
+    
+    # Cases today (approved records from today)
+    cases_today = cases_by_date.get(today, 0)
+    
+    # Average risk score (new region names)
+    total_risk = 0
+    region_risks = []
+    
+    for region in regions:
+        stat = (latest_stats[region] or [None])[0]
+        risk_score = stat.get('risk_score', 50) if stat else 50
+        total_risk += risk_score
+        region_risks.append({
+            'region': region.replace('_', ' '),
+            'score': risk_score,
+            'level': _get_risk_level(risk_score),
+            'cases': stat.get('total_cases', 0) if stat else 0
+        })
+    
+    avg_risk_score = int(total_risk / len(regions)) if regions else 0
+    
+    # Cases trend (last 7 days)
+    cases_trend = [
+        {'date': day.strftime('%b %d'), 'cases': cases_by_date.get(date, 0)}
+        for day, date in zip(trend_days, trend_dates)
+    ]
+    
+    # Disease distribution
+    disease_counts = records_facets['diseases']
+    total_diseases = sum(d['count'] for d in disease_counts)
+    disease_distribution = [
+        {
+            'name': d['_id'],
+            'value': int((d['count'] / total_diseases) * 100) if total_diseases > 0 else 0
+        }
+        for d in disease_counts
+    ]
+    
+    # Water quality
+    water_quality = []
+    for region in regions:
+        data = (latest_water[region] or [None])[0]
+        water_quality.append({
+            'region': region.replace('_', ' '),
+            'ph': data.get('ph', 7.0) if data else 7.0,
+            'tds': data.get('tds', 300) if data else 300
+        })
+    
+    # Weather data (average or latest)
+    weather_data_result = {}
+    if latest_weather:
+        weather_data_result = {
+            'rainfall': latest_weather.get('rainfall', 0),
+            'humidity': latest_weather.get('humidity', 0),
+            'temperature': latest_weather.get('temperature', 0),
+            'air_quality': latest_weather.get('air_quality', 'Good')
+        }
+    else:
+        weather_data_result = {
+            'rainfall': 45,
+            'humidity': 78,
+            'temperature': 32,
+            'air_quality': 'Good'
+        }
+    
+    return {
+        'total_patients': total_patients,
+        'cases_today': cases_today,
+        'active_alerts': active_alerts,
+        'avg_risk_score': avg_risk_score,
+        'cases_trend': cases_trend,
+        'disease_distribution': disease_distribution,
+        'region_risks': region_risks,
+        'water_quality': water_quality,
+        'weather_data': weather_data_result
+    }
+
+
+def refresh_admin_snapshot() -> Dict:
+    """Rebuild and store the admin overview snapshot. Returns its payload."""
+    payload = build_admin_overview()
+    get_collection(Collections.DASHBOARD_SNAPSHOTS).replace_one(
+        {'_id': ADMIN_SNAPSHOT_ID},
+        {
+            'version': SNAPSHOT_VERSION,
+            'generated_at': datetime.utcnow(),
+            'payload': payload
+        },
+        upsert=True
+    )
+    return payload
+
+
+def _is_current_admin_snapshot(snapshot: Optional[Dict]) -> bool:
+    # The overview counts today's cases, so it never outlives the day it was built
+    return _is_fresh(snapshot) and snapshot['generated_at'].date() == datetime.utcnow().date()
+
+
+def _resolve_admin_snapshot(snapshot: Optional[Dict]) -> Dict:
+    """Admin overview payload from the stored snapshot, rebuilding it if this request claims it."""
+    if _is_current_admin_snapshot(snapshot):
+        return snapshot['payload']
+    if not _claim_rebuild(ADMIN_SNAPSHOT_ID, snapshot):
+        # Another request is rebuilding it
+        return snapshot['payload']
+    try:
+        payload = refresh_admin_snapshot()
+        if snapshot:
+            _drop_responses_built_meanwhile()
+        return payload
+    finally:
+        if snapshot:
+            _release_rebuilds([ADMIN_SNAPSHOT_ID])
+
+
+def get_admin_snapshot() -> Dict:
+    """Admin overview payload, rebuilt if the snapshot is stale or missing."""
+    return _resolve_admin_snapshot(
+        get_collection(Collections.DASHBOARD_SNAPSHOTS).find_one({'_id': ADMIN_SNAPSHOT_ID})
+    )
+
+
+async def aget_admin_snapshot() -> Dict:
+    """Async get_admin_snapshot; the rebuild runs on a worker thread."""
+    snapshot = await get_async_collection(Collections.DASHBOARD_SNAPSHOTS).find_one({'_id': ADMIN_SNAPSHOT_ID})
+    if _is_current_admin_snapshot(snapshot):
+        return snapshot['payload']
+    return await sync_to_async(_resolve_admin_snapshot, thread_sensitive=False)(snapshot)
+
+
+def invalidate_snapshots(regions: Optional[List[str]] = None):
+    """
+    Mark snapshots stale and drop cached analytics responses so the next read rebuilds them.
+    
+    Stale snapshots are kept, so readers have something to serve while
+    one of them rebuilds.
+    
+    Args:
+        regions: Regions whose snapshots changed; the admin overview is always
+            invalidated. None invalidates every snapshot.
+    """
+    invalidate_namespace(CacheNamespaces.ANALYTICS)
+    
+    query = {}
+    if regions is not None:
+        query = {'_id': {'$in': [region_snapshot_id(r) for r in regions] + [ADMIN_SNAPSHOT_ID]}}
+    get_collection(Collections.DASHBOARD_SNAPSHOTS).update_many(query, {'$set': {'generated_at': INVALIDATED_AT}})
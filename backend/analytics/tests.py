@@ -1,3 +1,103 @@
-from django.test import TestCase
+import unittest
+from django.conf import settings
+from django.test import SimpleTestCase
+from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from healthiq.mongodb import Collections, ensure_indexes
 
-# Create your tests here.
+
+# (collection, filter, sort) of the queries the views run on every request
+QUERY_SHAPES = [
+    (Collections.NOTIFICATIONS, {'user_id': 1}, [('created_at', -1)]),
+    (Collections.NOTIFICATIONS, {'user_id': 1, 'type': 'risk'}, [('created_at', -1)]),
+    (Collections.NOTIFICATIONS, {'user_id': 1, 'is_read': False}, None),
+    (Collections.NOTIFICATIONS, {'type': 'risk', 'is_read': False}, None),
+    (Collections.NOTIFICATIONS, {'audience': 'region', 'region': 'Chennai_South'}, [('created_at', -1)]),
+    (
+        Collections.NOTIFICATIONS,
+        {'type': 'risk', '$or': [{'user_id': 1}, {'audience': 'region', 'region': 'Chennai_South'}]},
+        [('created_at', -1)]
+    ),
+    (Collections.NOTIFICATION_RECEIPTS, {'user_id': 1, 'region': 'Chennai_South'}, None),
+    (Collections.MEDICAL_RECORDS, {'status': 'approved', 'date': '2026-02-12'}, None),
+    (Collections.MEDICAL_RECORDS, {'status': 'pending'}, [('created_at', -1)]),
+    (
+        Collections.MEDICAL_RECORDS,
+        {'status': 'pending', 'patient_region': {'$in': ['Chennai South', 'Chennai_South']}},
+        [('created_at', -1)]
+    ),
+    (Collections.MEDICAL_RECORDS, {'patient_id': 1}, [('created_at', -1)]),
+    (Collections.MEDICAL_RECORDS, {'patient_id': 1, 'status': 'approved'}, [('created_at', -1)]),
+    (Collections.MEDICAL_RECORDS, {'reviewed_at': {'$exists': True}}, [('reviewed_at', -1)]),
+    (Collections.PATIENTS, {'user_id': 1}, None),
+    (Collections.PATIENTS, {'region': 'Chennai_South'}, None),
+    (Collections.DOCTORS, {'user_id': 1}, None),
+    (Collections.DOCTORS, {'region': 'Chennai_South'}, None),
+    (Collections.DOCTORS, {'specialization': 'General Physician'}, None),
+    (Collections.APPOINTMENTS, {'doctor_id': 1}, [('appointment_date', -1)]),
+    (Collections.APPOINTMENTS, {'patient_id': 1}, [('appointment_date', -1)]),
+    (Collections.APPOINTMENTS, {}, [('appointment_date', -1)]),
+    (Collections.REGIONAL_STATS, {'region': 'Chennai_South', 'disease': 'ALL'}, [('date', -1), ('updated_at', -1)]),
+    (Collections.REGIONAL_STATS, {'region': 'Chennai_South', 'date': '2026-02-12'}, None),
+    (Collections.REGIONAL_STATS, {'disease': 'ALL'}, [('date', -1), ('updated_at', -1)]),
+    (Collections.WEATHER_DATA, {'region': 'Chennai_South'}, [('date', -1)]),
+    (Collections.WEATHER_DATA, {}, [('date', -1)]),
+    (Collections.WATER_QUALITY, {'region': 'Chennai_South'}, [('date', -1)]),
+]
+
+
+def plan_stages(plan):
+    """Yield every stage name of an explain() plan tree."""
+    yield plan.get('stage')
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from plan_stages(child)
+
+
+class IndexCoverageTests(SimpleTestCase):
+    """Every hot query shape must be answered by an index, never a COLLSCAN."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if not settings.MONGODB_URI:
+            raise unittest.SkipTest('MONGO_URI is not set')
+        cls.client = MongoClient(settings.MONGODB_URI, serverSelectionTimeoutMS=2000)
+        try:
+            cls.client.admin.command('ping')
+        except PyMongoError as e:
+            cls.client.close()
+            raise unittest.SkipTest(f'MongoDB is not reachable: {e}')
+        cls.db = cls.client[f'{settings.MONGODB_NAME}_index_test']
+        ensure_indexes(cls.db)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.drop_database(cls.db.name)
+        cls.client.close()
+        super().tearDownClass()
+
+    def test_ensure_indexes_is_idempotent(self):
+        first = ensure_indexes(self.db)
+        second = ensure_indexes(self.db)
+        self.assertEqual(first, second)
+
+    def test_query_shapes_use_indexes(self):
+        for collection, query, sort in QUERY_SHAPES:
+            with self.subTest(collection=collection, query=query, sort=sort):
+                cursor = self.db[collection].find(query)
+                if sort:
+                    cursor = cursor.sort(sort)
+                plan = cursor.explain()['queryPlanner']['winningPlan']
+                self.assertNotIn('COLLSCAN', set(plan_stages(plan)))
+
+    def test_slot_index_allows_one_live_appointment(self):
+        appointments = self.db[Collections.APPOINTMENTS]
+        slot = {'doctor_id': 1, 'appointment_date': '2026-02-12', 'appointment_time': '10:00'}
+        appointments.insert_one({**slot, 'status': 'cancelled'})
+        appointments.insert_one({**slot, 'status': 'pending'})
+        with self.assertRaises(DuplicateKeyError):
+            appointments.insert_one({**slot, 'status': 'confirmed'})
+        appointments.delete_many(slot)
@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Served by their async ports under ASGI (see healthiq.async_api)
+reads = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('risk', views.region_risk, name='region_risk'),
-    path('trend', views.region_trend, name='region_trend'),
-    path('diseases', views.disease_distribution, name='disease_distribution'),
-    path('environmental', views.environmental_data, name='environmental_data'),
+    path('risk', reads.region_risk, name='region_risk'),
+    path('trend', reads.region_trend, name='region_trend'),
+    path('diseases', reads.disease_distribution, name='disease_distribution'),
+    path('environmental', reads.environmental_data, name='environmental_data'),
 ]
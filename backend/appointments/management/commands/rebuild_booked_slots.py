@@ -0,0 +1,24 @@
+"""
+Management command to rebuild the doctors' booked-slot maps from the appointments.
+
+Run periodically (e.g. daily from cron) to drop past dates and repair any
+drift between the maps and the appointments.
+
+Usage: python manage.py rebuild_booked_slots
+"""
+
+from django.core.management.base import BaseCommand
+from appointments.slots import rebuild_booked_slots
+
+
+class Command(BaseCommand):
+    help = "Rewrite the doctors' booked_slots maps from the appointments holding slots"
+    
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding booked slot maps...')
+        
+        changed = rebuild_booked_slots()
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuild complete. Updated {changed} doctors.'
+        ))
@@ -1,3 +1,4 @@
+from datetime import datetime
 from rest_framework import serializers
 
 
@@ -24,3 +25,13 @@ class BookAppointmentSerializer(serializers.Serializer):
     appointment_date = serializers.CharField()
     appointment_time = serializers.CharField(required=False, default='10:00 AM')
     reason = serializers.CharField(required=False, default='')
+    
+    def validate_appointment_date(self, value):
+        # The date is a key of the doctor's booked_slots map, so only YYYY-MM-DD is accepted
+        try:
+            parsed = datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            parsed = None
+        if parsed is None or parsed.strftime('%Y-%m-%d') != value:
+            raise serializers.ValidationError("Date must be in YYYY-MM-DD format")
+        return value
@@ -0,0 +1,186 @@
+"""
+Appointment slot bookkeeping.
+
+A slot (doctor_id, appointment_date, appointment_time) is held by at most
+one appointment in a BOOKED_STATUSES status; the partial unique index on
+appointments enforces that, so booking is a single insert. A worker that
+cannot find the index (check_slot_index, run at startup) logs an error
+and checks for a live booking before each insert until the index shows
+up, which narrows but does not close the double-booking race. Each doctor
+document also keeps a compact map of held slots,
+    booked_slots: {'<YYYY-MM-DD>': ['<time>', ...]}
+so free and busy slots are answered from the doctor document alone.
+
+The map is written after the appointment, so it can miss a change if a
+worker dies in between. rebuild_booked_slots (the rebuild_booked_slots
+command) rewrites it from the appointments and drops past dates; booking
+also drops the past dates of the doctor being booked.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+from healthiq.mongodb import get_collection, Collections
+
+
+logger = logging.getLogger(__name__)
+
+# Statuses that hold a slot; a cancelled appointment frees it
+BOOKED_STATUSES = ['pending', 'confirmed', 'completed']
+
+# Key of the unique index registered for appointments in healthiq.mongodb.INDEXES
+SLOT_INDEX_KEY = [('doctor_id', ASCENDING), ('appointment_date', ASCENDING), ('appointment_time', ASCENDING)]
+
+# Seconds between two looks for a missing slot index
+SLOT_INDEX_RECHECK = 300
+
+# Whether this process has seen the slot index, and when it last looked
+_slot_index = {'confirmed': False, 'checked_at': None}
+
+
+def check_slot_index() -> bool:
+    """
+    Look for the unique slot index on appointments, logging an error if it is missing.
+    
+    Returns:
+        Whether the index exists (False too if MongoDB could not be asked)
+    """
+    _slot_index['checked_at'] = time.monotonic()
+    try:
+        indexes = get_collection(Collections.APPOINTMENTS).index_information()
+    except PyMongoError:
+        logger.exception('Could not check the appointment slot index')
+        return False
+    
+    _slot_index['confirmed'] = any(
+        index['key'] == SLOT_INDEX_KEY and index.get('unique') for index in indexes.values()
+    )
+    if not _slot_index['confirmed']:
+        logger.error(
+            'The unique appointment slot index is missing; bookings fall back to a racy '
+            'availability check. Run "python manage.py ensure_indexes --collection appointments".'
+        )
+    return _slot_index['confirmed']
+
+
+def slot_index_confirmed() -> bool:
+    """Whether the slot index is known to exist, looking again every SLOT_INDEX_RECHECK seconds while it is not."""
+    if _slot_index['confirmed']:
+        return True
+    checked_at = _slot_index['checked_at']
+    if checked_at is not None and time.monotonic() - checked_at < SLOT_INDEX_RECHECK:
+        return False
+    return check_slot_index()
+
+
+def slot_is_booked(doctor_id: int, appointment_date: str, appointment_time: str) -> bool:
+    """Whether a live appointment holds the slot."""
+    return get_collection(Collections.APPOINTMENTS).find_one({
+        'doctor_id': doctor_id,
+        'appointment_date': appointment_date,
+        'appointment_time': appointment_time,
+        'status': {'$in': BOOKED_STATUSES}
+    }, {'_id': 1}) is not None
+
+
+def _today() -> str:
+    return datetime.utcnow().strftime('%Y-%m-%d')
+
+
+def past_dates(doctor: Dict) -> List[str]:
+    """Dates of a doctor's availability map that are over."""
+    today = _today()
+    return [d for d in doctor.get('booked_slots', {}) if d < today]
+
+
+def hold_slot(doctor_id: int, appointment_date: str, appointment_time: str, prune: Iterable[str] = ()):
+    """
+    Mark a slot as booked on the doctor's availability map.
+    
+    Args:
+        prune: Past dates to drop from the map in the same update
+    """
+    update = {'$addToSet': {f'booked_slots.{appointment_date}': appointment_time}}
+    stale = [d for d in prune if d != appointment_date]
+    if stale:
+        update['$unset'] = {f'booked_slots.{d}': '' for d in stale}
+    get_collection(Collections.DOCTORS).update_one({'user_id': doctor_id}, update)
+
+
+def release_slot(doctor_id: int, appointment_date: str, appointment_time: str):
+    """Mark a slot as free on the doctor's availability map."""
+    get_collection(Collections.DOCTORS).update_one(
+        {'user_id': doctor_id},
+        {'$pull': {f'booked_slots.{appointment_date}': appointment_time}}
+    )
+
+
+def sync_slot(appointment: Dict, new_status: str):
+    """Update the availability map for an appointment moving to new_status."""
+    was_booked = appointment.get('status') in BOOKED_STATUSES
+    is_booked = new_status in BOOKED_STATUSES
+    if was_booked == is_booked:
+        return
+    
+    slot = (appointment['doctor_id'], appointment['appointment_date'], appointment.get('appointment_time'))
+    if is_booked:
+        hold_slot(*slot)
+    else:
+        release_slot(*slot)
+
+
+def get_booked_slots(doctor: Dict, appointment_date: str) -> List[str]:
+    """Booked times of a doctor on a date, from the doctor document."""
+    return sorted(doctor.get('booked_slots', {}).get(appointment_date, []))
+
+
+def rebuild_booked_slots() -> int:
+    """
+    Rewrite every doctor's availability map from the appointments.
+    
+    Only slots from today on are kept. Bookings and status changes made
+    while the maps are rewritten are applied again afterwards, so none is
+    lost to the rewrite.
+    
+    Returns:
+        Number of doctor documents changed
+    """
+    started = datetime.utcnow()
+    # Dates from before booking dates were validated may not be usable as keys
+    upcoming = {'appointment_date': {'$gte': _today(), '$regex': r'^\d{4}-\d{2}-\d{2}$'}}
+    appointments = get_collection(Collections.APPOINTMENTS)
+    doctors = get_collection(Collections.DOCTORS)
+    
+    booked = defaultdict(lambda: defaultdict(set))
+    held = appointments.find(
+        {'status': {'$in': BOOKED_STATUSES}, **upcoming},
+        {'doctor_id': 1, 'appointment_date': 1, 'appointment_time': 1}
+    )
+    for appointment in held:
+        booked[appointment['doctor_id']][appointment['appointment_date']].add(appointment.get('appointment_time'))
+    
+    ops = [
+        UpdateOne(
+            {'_id': doctor['_id']},
+            {'$set': {'booked_slots': {d: sorted(times) for d, times in booked[doctor['user_id']].items()}}}
+        )
+        for doctor in doctors.find({}, {'user_id': 1})
+    ]
+    changed = doctors.bulk_write(ops, ordered=False).modified_count if ops else 0
+    
+    # Changes that landed while the maps were rewritten
+    recent = appointments.find({
+        '$or': [{'created_at': {'$gte': started}}, {'updated_at': {'$gte': started}}],
+        **upcoming
+    })
+    for appointment in recent:
+        slot = (appointment['doctor_id'], appointment['appointment_date'], appointment.get('appointment_time'))
+        if appointment.get('status') in BOOKED_STATUSES:
+            hold_slot(*slot)
+        else:
+            release_slot(*slot)
+    return changed
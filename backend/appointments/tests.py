@@ -1,3 +1,39 @@
-from django.test import TestCase
+from unittest.mock import MagicMock, patch
+from django.test import SimpleTestCase
+from . import slots
 
-# Create your tests here.
+
+class SlotIndexTests(SimpleTestCase):
+    """Bookings check for a live appointment only while the slot index is missing."""
+    
+    def setUp(self):
+        self.appointments = MagicMock()
+        patcher = patch.object(slots, 'get_collection', return_value=self.appointments)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        state = patch.dict(slots._slot_index, {'confirmed': False, 'checked_at': None})
+        state.start()
+        self.addCleanup(state.stop)
+    
+    def test_index_is_confirmed_once(self):
+        self.appointments.index_information.return_value = {
+            '_id_': {'key': [('_id', 1)]},
+            'slot': {'key': slots.SLOT_INDEX_KEY, 'unique': True},
+        }
+        self.assertTrue(slots.slot_index_confirmed())
+        self.assertTrue(slots.slot_index_confirmed())
+        self.appointments.index_information.assert_called_once()
+    
+    def test_missing_index_is_logged_and_rechecked_later(self):
+        self.appointments.index_information.return_value = {
+            'slot': {'key': slots.SLOT_INDEX_KEY},
+        }
+        with self.assertLogs(slots.logger, 'ERROR'):
+            self.assertFalse(slots.slot_index_confirmed())
+        self.assertFalse(slots.slot_index_confirmed())
+        self.appointments.index_information.assert_called_once()
+        
+        slots._slot_index['checked_at'] -= slots.SLOT_INDEX_RECHECK
+        with self.assertLogs(slots.logger, 'ERROR'):
+            slots.slot_index_confirmed()
+        self.assertEqual(self.appointments.index_information.call_count, 2)
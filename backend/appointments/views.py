@@ -4,16 +4,14 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from datetime import datetime
 from bson import ObjectId
-from healthiq.mongodb import get_collection, Collections
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
+from healthiq.mongodb import get_collection, set_and_fetch, Collections
+from healthiq.pagination import paginated_response
+from healthiq.serialization import serialize_mongo_doc
+from notifications.dispatch import dispatch_notifications
 from .serializers import AppointmentSerializer, BookAppointmentSerializer
-
-
-def serialize_mongo_doc(doc):
-    """Convert MongoDB document to serializable format."""
-    if doc is None:
-        return None
-    doc['id'] = str(doc.pop('_id'))
-    return doc
+from .slots import hold_slot, past_dates, slot_index_confirmed, slot_is_booked, sync_slot
 
 
 @api_view(['POST'])
@@ -28,7 +26,6 @@ def book_appointment(request):
         appointments = get_collection(Collections.APPOINTMENTS)
         doctors = get_collection(Collections.DOCTORS)
         patients = get_collection(Collections.PATIENTS)
-        notifications = get_collection(Collections.NOTIFICATIONS)
         
         doctor_id = serializer.validated_data['doctor_id']
         appointment_date = serializer.validated_data['appointment_date']
@@ -43,17 +40,6 @@ def book_appointment(request):
         patient = patients.find_one({'user_id': request.user.id})
         patient_name = patient.get('name', '') if patient else ''
         
-        # Check if appointment slot is available
-        existing = appointments.find_one({
-            'doctor_id': doctor_id,
-            'appointment_date': appointment_date,
-            'appointment_time': appointment_time,
-            'status': {'$nin': ['cancelled']}
-        })
-        
-        if existing:
-            return Response({'message': 'This slot is already booked'}, status=status.HTTP_400_BAD_REQUEST)
-        
         appointment = {
             'patient_id': request.user.id,
             'patient_name': patient_name,
@@ -66,11 +52,20 @@ def book_appointment(request):
             'created_at': datetime.utcnow()
         }
         
-        result = appointments.insert_one(appointment)
+        # Without the unique slot index the insert alone would not stop a double booking
+        if not slot_index_confirmed() and slot_is_booked(doctor_id, appointment_date, appointment_time):
+            return Response({'message': 'This slot is already booked'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # The unique slot index rejects the insert if the slot is taken
+        try:
+            result = appointments.insert_one(appointment)
+        except DuplicateKeyError:
+            return Response({'message': 'This slot is already booked'}, status=status.HTTP_400_BAD_REQUEST)
         appointment['_id'] = result.inserted_id
+        hold_slot(doctor_id, appointment_date, appointment_time, prune=past_dates(doctor))
         
         # Notify the doctor
-        notifications.insert_one({
+        dispatch_notifications([{
             'user_id': doctor_id,
             'type': 'appointment',
             'title': 'New appointment request',
@@ -78,7 +73,7 @@ def book_appointment(request):
             'is_read': False,
             'created_at': datetime.utcnow(),
             'level': 'low'
-        })
+        }])
         
         return Response(serialize_mongo_doc(appointment), status=status.HTTP_201_CREATED)
     
@@ -92,13 +87,16 @@ def list_appointments(request):
     appointments = get_collection(Collections.APPOINTMENTS)
     
     if request.user.role == 'patient':
-        apt_list = list(appointments.find({'patient_id': request.user.id}).sort('appointment_date', -1))
+        query = {'patient_id': request.user.id}
     elif request.user.role == 'doctor':
-        apt_list = list(appointments.find({'doctor_id': request.user.id}).sort('appointment_date', -1))
+        query = {'doctor_id': request.user.id}
     else:
-        apt_list = list(appointments.find().sort('appointment_date', -1))
+        query = {}
     
-    return Response([serialize_mongo_doc(a) for a in apt_list])
+    return paginated_response(
+        request, appointments, query, serialize_mongo_doc,
+        sort_field='appointment_date', allow_stream=('admin', 'doctor')
+    )
 
 
 @api_view(['POST'])
@@ -106,28 +104,31 @@ def list_appointments(request):
 def cancel_appointment(request, appointment_id):
     """Cancel an appointment."""
     appointments = get_collection(Collections.APPOINTMENTS)
-    notifications = get_collection(Collections.NOTIFICATIONS)
     
     try:
-        appointment = appointments.find_one({'_id': ObjectId(appointment_id)})
-    except:
+        query = {'_id': ObjectId(appointment_id)}
+    except InvalidId:
         return Response({'message': 'Invalid appointment ID'}, status=status.HTTP_400_BAD_REQUEST)
     
+    # Patients may only cancel their own appointments
+    if request.user.role == 'patient':
+        query['patient_id'] = request.user.id
+    
+    appointment, updated = set_and_fetch(
+        appointments, query, {'status': 'cancelled', 'updated_at': datetime.utcnow()}
+    )
+    
     if not appointment:
+        # Tell a missing appointment apart from someone else's
+        if 'patient_id' in query and appointments.find_one({'_id': query['_id']}, {'_id': 1}):
+            return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
         return Response({'message': 'Appointment not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Check if user owns this appointment
-    if request.user.role == 'patient' and appointment['patient_id'] != request.user.id:
-        return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
-    
-    appointments.update_one(
-        {'_id': ObjectId(appointment_id)},
-        {'$set': {'status': 'cancelled', 'updated_at': datetime.utcnow()}}
-    )
+    sync_slot(appointment, 'cancelled')
     
     # Notify the other party
     notify_user_id = appointment['doctor_id'] if request.user.role == 'patient' else appointment['patient_id']
-    notifications.insert_one({
+    dispatch_notifications([{
         'user_id': notify_user_id,
         'type': 'appointment',
         'title': 'Appointment cancelled',
@@ -135,7 +136,6 @@ def cancel_appointment(request, appointment_id):
         'is_read': False,
         'created_at': datetime.utcnow(),
         'level': 'medium'
-    })
+    }])
     
-    updated = appointments.find_one({'_id': ObjectId(appointment_id)})
     return Response(serialize_mongo_doc(updated))
@@ -14,3 +14,12 @@ python manage.py collectstatic --noinput
 
 # Run migrations for Django auth database (if needed)
 python manage.py migrate --noinput
+
+# Build MongoDB indexes (idempotent)
+python manage.py ensure_indexes
+
+# Deliver notifications a previous instance left in the outbox
+python manage.py flush_notification_outbox
+
+# Drop past dates from the doctors' booked slot maps and repair drift
+python manage.py rebuild_booked_slots
@@ -0,0 +1,62 @@
+"""
+Doctor routing - which doctors serve which region.
+
+New medical records are routed to the doctors of the patient's region.
+The region -> doctors map is small and read on every record submission,
+so each process keeps it in memory and reloads it from the doctors
+collection at most every DOCTOR_ROUTING_TTL seconds, or sooner after
+invalidate_doctor_routing().
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from healthiq.mongodb import get_collection, Collections
+
+
+_routes: Optional[Dict[str, Tuple[int, ...]]] = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def region_key(region: str) -> str:
+    """Regions are stored both as 'Chennai_South' and 'Chennai South'."""
+    return (region or '').replace(' ', '_')
+
+
+def region_forms(region: str) -> List[str]:
+    """Both stored spellings of a region, to match documents written in either."""
+    key = region_key(region)
+    return sorted({key, key.replace('_', ' ')})
+
+
+def _load_routes() -> Dict[str, Tuple[int, ...]]:
+    """Build the region -> doctor user ids map with one projected scan."""
+    routes = {}
+    for doctor in get_collection(Collections.DOCTORS).find({}, {'user_id': 1, 'region': 1, '_id': 0}):
+        if doctor.get('region'):
+            routes.setdefault(region_key(doctor['region']), []).append(doctor['user_id'])
+    return {region: tuple(sorted(ids)) for region, ids in routes.items()}
+
+
+def get_routes() -> Dict[str, Tuple[int, ...]]:
+    """The region -> doctor user ids map, reloaded when older than the TTL."""
+    global _routes, _loaded_at
+    with _lock:
+        if _routes is None or time.monotonic() - _loaded_at > settings.DOCTOR_ROUTING_TTL:
+            _routes = _load_routes()
+            _loaded_at = time.monotonic()
+        return _routes
+
+
+def get_region_doctors(region: str) -> List[int]:
+    """User ids of the doctors serving a region."""
+    return list(get_routes().get(region_key(region), ()))
+
+
+def invalidate_doctor_routing():
+    """Reload the map on next use (call after adding or moving a doctor)."""
+    global _routes
+    with _lock:
+        _routes = None
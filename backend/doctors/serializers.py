@@ -31,3 +31,15 @@ class ApproveRejectSerializer(serializers.Serializer):
     record_id = serializers.CharField()
     action = serializers.ChoiceField(choices=['approve', 'reject'])
     notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class BatchReviewItemSerializer(serializers.Serializer):
+    """One record decision of a batch review."""
+    record_id = serializers.CharField()
+    action = serializers.ChoiceField(choices=['approve', 'reject'])
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class BatchReviewSerializer(serializers.Serializer):
+    """Serializer for batch approve/reject."""
+    items = BatchReviewItemSerializer(many=True, allow_empty=False, max_length=500)
@@ -1,3 +1,140 @@
-from django.test import TestCase
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+from django.test import SimpleTestCase
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from . import views
 
-# Create your tests here.
+
+class FakeUser:
+    is_authenticated = True
+    
+    def __init__(self, user_id, role):
+        self.id = user_id
+        self.role = role
+
+
+class FakeRecords:
+    """medical_records stand-in applying batch_review_records' guarded updates."""
+    
+    def __init__(self, docs):
+        self.docs = {doc['_id']: dict(doc) for doc in docs}
+    
+    def find(self, query):
+        return [dict(self.docs[i]) for i in query['_id']['$in'] if i in self.docs]
+    
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            doc = self.docs.get(operation._filter['_id'])
+            if doc and all(doc.get(k) == v for k, v in operation._filter.items()):
+                doc.update(operation._doc['$set'])
+
+
+class BatchReviewTests(SimpleTestCase):
+    """Each record of a batch is reviewed at most once, and only if nobody else did first."""
+    
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.records = FakeRecords([
+            {'_id': ObjectId(), 'patient_id': 7, 'diagnosis': 'Dengue', 'status': 'pending'}
+            for _ in range(3)
+        ])
+        self.ids = list(self.records.docs)
+        for target, mock in (
+            ('get_collection', MagicMock(return_value=self.records)),
+            ('apply_record_reviews', MagicMock()),
+            ('dispatch_notifications', MagicMock()),
+        ):
+            patcher = patch.object(views, target, mock)
+            setattr(self, target, patcher.start())
+            self.addCleanup(patcher.stop)
+    
+    def review(self, items, user=FakeUser(3, 'doctor')):
+        request = self.factory.post('/doctor/records/review', {'items': items}, format='json')
+        force_authenticate(request, user=user)
+        return views.batch_review_records(request)
+    
+    def test_only_doctors(self):
+        response = self.review([{'record_id': str(self.ids[0]), 'action': 'approve'}], FakeUser(7, 'patient'))
+        self.assertEqual(response.status_code, 403)
+    
+    def test_empty_batch_is_rejected(self):
+        self.assertEqual(self.review([]).status_code, 400)
+    
+    def test_reviews_every_item(self):
+        response = self.review([
+            {'record_id': str(self.ids[0]), 'action': 'approve'},
+            {'record_id': str(self.ids[1]), 'action': 'reject', 'notes': 'Incomplete'},
+        ])
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['failed'], 0)
+        self.assertEqual(self.records.docs[self.ids[0]]['status'], 'approved')
+        self.assertEqual(self.records.docs[self.ids[1]]['status'], 'rejected')
+        reviews = self.apply_record_reviews.call_args.args[0]
+        self.assertEqual([new_status for _, new_status in reviews], ['approved', 'rejected'])
+        self.assertEqual(len(self.dispatch_notifications.call_args.args[0]), 2)
+    
+    def test_invalid_missing_and_duplicate_ids(self):
+        response = self.review([
+            {'record_id': 'nope', 'action': 'approve'},
+            {'record_id': str(ObjectId()), 'action': 'approve'},
+            {'record_id': str(self.ids[0]), 'action': 'approve'},
+            {'record_id': str(self.ids[0]), 'action': 'reject'},
+        ])
+        messages = [result.get('message') for result in response.data['results']]
+        self.assertEqual(messages, ['Invalid record ID', 'Record not found', None, 'Duplicate record ID'])
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(self.records.docs[self.ids[0]]['status'], 'approved')
+    
+    def test_record_reviewed_meanwhile_is_not_reported_as_ours(self):
+        original_find = self.records.find
+        
+        def find(query):
+            docs = original_find(query)
+            if self.records.docs[self.ids[0]].get('reviewed_by') is None:
+                # Another doctor reviews the record between the read and the write
+                self.records.docs[self.ids[0]].update(status='rejected', reviewed_by=4)
+            return docs
+        self.records.find = find
+        
+        response = self.review([{'record_id': str(self.ids[0]), 'action': 'approve'}])
+        self.assertEqual(response.data['results'][0]['message'], 'Record was changed by another review')
+        self.assertEqual(response.data['updated'], 0)
+        self.assertEqual(self.records.docs[self.ids[0]]['status'], 'rejected')
+        self.apply_record_reviews.assert_called_once_with([])
+
+
+class PendingRecordsTests(SimpleTestCase):
+    """The pending queue lists every region unless the doctor narrows it."""
+    
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.doctors = MagicMock()
+        self.doctors.find_one.return_value = {'_id': ObjectId(), 'region': 'Chennai_South'}
+        collections = {views.Collections.DOCTORS: self.doctors, views.Collections.MEDICAL_RECORDS: MagicMock()}
+        for target, mock in (
+            ('get_collection', MagicMock(side_effect=collections.__getitem__)),
+            ('paginated_response', MagicMock(return_value=Response([]))),
+        ):
+            patcher = patch.object(views, target, mock)
+            setattr(self, target, patcher.start())
+            self.addCleanup(patcher.stop)
+    
+    def query(self, params):
+        request = self.factory.get('/doctor/records/pending', params)
+        force_authenticate(request, user=FakeUser(3, 'doctor'))
+        views.pending_records(request)
+        return self.paginated_response.call_args.args[2]
+    
+    def test_default_lists_every_pending_record(self):
+        self.assertEqual(self.query({}), {'status': 'pending'})
+        self.doctors.find_one.assert_not_called()
+    
+    def test_mine_uses_the_doctors_region(self):
+        self.assertEqual(self.query({'region': 'mine'}), {
+            'status': 'pending', 'patient_region': {'$in': ['Chennai South', 'Chennai_South']}
+        })
+    
+    def test_explicit_region(self):
+        self.assertEqual(self.query({'region': 'Coimbatore'})['patient_region'], {'$in': ['Coimbatore']})
+        self.assertEqual(self.query({'region': 'all'}), {'status': 'pending'})
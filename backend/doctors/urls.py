@@ -6,6 +6,7 @@ urlpatterns = [
     path('<str:doctor_id>/slots', views.doctor_slots, name='doctor_slots'),
     path('pending', views.pending_records, name='pending_records'),
     path('approve', views.approve_reject_record, name='approve_reject'),
+    path('review', views.batch_review_records, name='batch_review'),
     path('approve/<str:record_id>', views.approve_record, name='approve_record'),
     path('reject/<str:record_id>', views.reject_record, name='reject_record'),
     path('patient/<str:patient_id>/history', views.patient_history_for_doctor, name='patient_history_doctor'),
@@ -4,16 +4,22 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from datetime import datetime
 from bson import ObjectId
-from healthiq.mongodb import get_collection, Collections
-from .serializers import DoctorSerializer, PendingRecordSerializer, ApproveRejectSerializer
-
-
-def serialize_mongo_doc(doc):
-    """Convert MongoDB document to serializable format."""
-    if doc is None:
-        return None
-    doc['id'] = str(doc.pop('_id'))
-    return doc
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from healthiq.mongodb import get_collection, set_and_fetch, Collections
+from healthiq.pagination import paginated_response
+from healthiq.serialization import serialize_mongo_doc
+from notifications.dispatch import dispatch_notifications
+from analytics.risk_engine import apply_record_review, apply_record_reviews
+from appointments.slots import get_booked_slots, sync_slot
+from .routing import region_forms
+from .serializers import (
+    DoctorSerializer,
+    PendingRecordSerializer,
+    ApproveRejectSerializer,
+    BatchReviewSerializer
+)
 
 
 @api_view(['GET'])
@@ -28,14 +34,18 @@ def list_doctors(request):
     if request.GET.get('region'):
         query['region'] = request.GET.get('region')
     
-    doctor_list = list(doctors.find(query))
-    return Response([serialize_mongo_doc(d) for d in doctor_list])
+    return paginated_response(request, doctors, query, serialize_mongo_doc)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def doctor_slots(request, doctor_id):
-    """Get available slots for a doctor."""
+    """
+    Get available slots for a doctor.
+    
+    Query params:
+        date: Optional date (YYYY-MM-DD) to get free/busy detail for
+    """
     doctors = get_collection(Collections.DOCTORS)
     
     try:
@@ -46,20 +56,47 @@ def doctor_slots(request, doctor_id):
     if not doctor:
         return Response({'message': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
     
+    # With ?date=, report whether the doctor works that day and which times are taken
+    appointment_date = request.GET.get('date')
+    if appointment_date:
+        return Response({
+            'date': appointment_date,
+            'available': appointment_date in doctor.get('available_dates', []),
+            'booked': get_booked_slots(doctor, appointment_date)
+        })
+    
     return Response(doctor.get('available_dates', []))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def pending_records(request):
-    """Get pending medical records for doctor approval."""
+    """
+    Get pending medical records for doctor approval.
+    
+    Query params:
+        region: Only records of patients in this region, or 'mine' for the
+            doctor's own region. Without it every pending record is listed,
+            including those of patients without a (routable) region, which
+            are sent to every doctor.
+    """
     if request.user.role != 'doctor':
         return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    records = get_collection(Collections.MEDICAL_RECORDS)
-    pending = list(records.find({'status': 'pending'}).sort('created_at', -1))
+    region = request.GET.get('region')
+    if region and region.lower() == 'mine':
+        doctor = get_collection(Collections.DOCTORS).find_one({'user_id': request.user.id}, {'region': 1})
+        region = doctor.get('region') if doctor else None
     
-    return Response([serialize_mongo_doc(r) for r in pending])
+    query = {'status': 'pending'}
+    if region and region.lower() != 'all':
+        # Records keep the patient's region as entered, with '_' or ' '
+        query['patient_region'] = {'$in': region_forms(region)}
+    
+    records = get_collection(Collections.MEDICAL_RECORDS)
+    return paginated_response(
+        request, records, query, serialize_mongo_doc, sort_field='created_at', allow_stream=('doctor',)
+    )
 
 
 @api_view(['POST'])
@@ -76,32 +113,30 @@ def approve_reject_record(request):
         notes = serializer.validated_data.get('notes', '')
         
         records = get_collection(Collections.MEDICAL_RECORDS)
-        notifications = get_collection(Collections.NOTIFICATIONS)
-        
-        try:
-            record = records.find_one({'_id': ObjectId(record_id)})
-        except:
-            return Response({'message': 'Invalid record ID'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        if not record:
-            return Response({'message': 'Record not found'}, status=status.HTTP_404_NOT_FOUND)
-        
         new_status = 'approved' if action == 'approve' else 'rejected'
         
-        records.update_one(
-            {'_id': ObjectId(record_id)},
-            {
-                '$set': {
+        try:
+            record, updated_record = set_and_fetch(
+                records,
+                {'_id': ObjectId(record_id)},
+                {
                     'status': new_status,
                     'doctor_notes': notes,
                     'reviewed_by': request.user.id,
                     'reviewed_at': datetime.utcnow()
                 }
-            }
-        )
+            )
+        except InvalidId:
+            return Response({'message': 'Invalid record ID'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not record:
+            return Response({'message': 'Record not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Keep regional counters and risk fresh
+        apply_record_review(record, new_status)
         
         # Notify the patient
-        notifications.insert_one({
+        dispatch_notifications([{
             'user_id': record['patient_id'],
             'type': 'record',
             'title': f'Medical record {new_status}',
@@ -109,9 +144,8 @@ def approve_reject_record(request):
             'is_read': False,
             'created_at': datetime.utcnow(),
             'level': 'low' if new_status == 'approved' else 'medium'
-        })
+        }])
         
-        updated_record = records.find_one({'_id': ObjectId(record_id)})
         return Response(serialize_mongo_doc(updated_record))
     
     return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
@@ -132,9 +166,7 @@ def patient_history_for_doctor(request, patient_id):
     except ValueError:
         query = {'patient_id': patient_id, 'status': 'approved'}
     
-    patient_records = list(records.find(query).sort('created_at', -1))
-    
-    return Response([serialize_mongo_doc(r) for r in patient_records])
+    return paginated_response(request, records, query, serialize_mongo_doc, sort_field='created_at')
 
 
 @api_view(['GET'])
@@ -147,11 +179,15 @@ def doctor_appointments(request):
     appointments = get_collection(Collections.APPOINTMENTS)
     apt_list = list(appointments.find({'doctor_id': request.user.id}).sort('appointment_date', -1))
     
-    # Enrich with patient names
+    # Enrich with patient names, one lookup for all patients
     patients = get_collection(Collections.PATIENTS)
+    patient_ids = list({apt['patient_id'] for apt in apt_list})
+    names = {
+        p['user_id']: p.get('name', 'Unknown')
+        for p in patients.find({'user_id': {'$in': patient_ids}}, {'user_id': 1, 'name': 1})
+    } if patient_ids else {}
     for apt in apt_list:
-        patient = patients.find_one({'user_id': apt['patient_id']})
-        apt['patient_name'] = patient.get('name', 'Unknown') if patient else 'Unknown'
+        apt['patient_name'] = names.get(apt['patient_id'], 'Unknown')
     
     return Response([serialize_mongo_doc(a) for a in apt_list])
 
@@ -170,23 +206,26 @@ def update_appointment_status(request):
         return Response({'message': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
     
     appointments = get_collection(Collections.APPOINTMENTS)
-    notifications = get_collection(Collections.NOTIFICATIONS)
     
+    # Re-confirming a cancelled appointment can collide with a newer booking
     try:
-        appointment = appointments.find_one({'_id': ObjectId(appointment_id)})
-    except:
+        appointment, updated = set_and_fetch(
+            appointments,
+            {'_id': ObjectId(appointment_id)},
+            {'status': new_status, 'updated_at': datetime.utcnow()}
+        )
+    except (InvalidId, TypeError):
         return Response({'message': 'Invalid appointment ID'}, status=status.HTTP_400_BAD_REQUEST)
+    except DuplicateKeyError:
+        return Response({'message': 'This slot is already booked'}, status=status.HTTP_400_BAD_REQUEST)
     
     if not appointment:
         return Response({'message': 'Appointment not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    appointments.update_one(
-        {'_id': ObjectId(appointment_id)},
-        {'$set': {'status': new_status, 'updated_at': datetime.utcnow()}}
-    )
+    sync_slot(appointment, new_status)
     
     # Notify the patient
-    notifications.insert_one({
+    dispatch_notifications([{
         'user_id': appointment['patient_id'],
         'type': 'appointment',
         'title': f'Appointment {new_status}',
@@ -194,12 +233,110 @@ def update_appointment_status(request):
         'is_read': False,
         'created_at': datetime.utcnow(),
         'level': 'low'
-    })
+    }])
     
-    updated = appointments.find_one({'_id': ObjectId(appointment_id)})
     return Response(serialize_mongo_doc(updated))
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_review_records(request):
+    """
+    Approve or reject many medical records at once.
+    
+    Body: {"items": [{"record_id": ..., "action": "approve"|"reject", "notes": ...}, ...]}
+    
+    Returns one result per item, in order: the updated record on success,
+    or a message when the record is invalid, missing or changed meanwhile.
+    """
+    if request.user.role != 'doctor':
+        return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    serializer = BatchReviewSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+    
+    items = serializer.validated_data['items']
+    results = [{'record_id': item['record_id']} for item in items]
+    
+    # Resolve ids; each record may be reviewed once per batch
+    object_ids = {}
+    for item, result in zip(items, results):
+        try:
+            object_id = ObjectId(item['record_id'])
+        except (InvalidId, TypeError):
+            result['message'] = 'Invalid record ID'
+            continue
+        if object_id in object_ids:
+            result['message'] = 'Duplicate record ID'
+            continue
+        object_ids[object_id] = (item, result)
+    
+    records = get_collection(Collections.MEDICAL_RECORDS)
+    found = {r['_id']: r for r in records.find({'_id': {'$in': list(object_ids)}})}
+    
+    # Stored datetimes keep milliseconds, so compare against a truncated stamp
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    reviewed_ids = []
+    operations = []
+    for object_id, (item, result) in object_ids.items():
+        record = found.get(object_id)
+        if not record:
+            result['message'] = 'Record not found'
+            continue
+        reviewed_ids.append(object_id)
+        operations.append(UpdateOne(
+            {'_id': object_id, 'status': record.get('status')},
+            {
+                '$set': {
+                    'status': 'approved' if item['action'] == 'approve' else 'rejected',
+                    'doctor_notes': item['notes'],
+                    'reviewed_by': request.user.id,
+                    'reviewed_at': now
+                }
+            }
+        ))
+    if operations:
+        records.bulk_write(operations, ordered=False)
+    
+    # Records stamped by this batch are the ones whose status guard matched
+    updated = {r['_id']: r for r in records.find({'_id': {'$in': reviewed_ids}})} if reviewed_ids else {}
+    reviews = []
+    notifications = []
+    for object_id, (item, result) in object_ids.items():
+        if object_id not in found:
+            continue
+        record = updated.get(object_id)
+        if not record or record.get('reviewed_at') != now or record.get('reviewed_by') != request.user.id:
+            result['message'] = 'Record was changed by another review'
+            continue
+        
+        new_status = record['status']
+        notes = item['notes']
+        reviews.append((found[object_id], new_status))
+        notifications.append({
+            'user_id': record['patient_id'],
+            'type': 'record',
+            'title': f'Medical record {new_status}',
+            'message': f'Your medical record for "{record["diagnosis"]}" has been {new_status} by a doctor.' + (f' Notes: {notes}' if notes else ''),
+            'is_read': False,
+            'created_at': now,
+            'level': 'low' if new_status == 'approved' else 'medium'
+        })
+        result['record'] = serialize_mongo_doc(record)
+    
+    # Counters and risk move once per affected region, notifications in one outbox entry
+    apply_record_reviews(reviews)
+    dispatch_notifications(notifications)
+    
+    return Response({
+        'results': results,
+        'updated': len(reviews),
+        'failed': len(results) - len(reviews)
+    })
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def approve_record(request, record_id):
@@ -208,29 +345,28 @@ def approve_record(request, record_id):
         return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     
     records = get_collection(Collections.MEDICAL_RECORDS)
-    notifications = get_collection(Collections.NOTIFICATIONS)
     
     try:
-        record = records.find_one({'_id': ObjectId(record_id)})
-    except:
+        record, updated_record = set_and_fetch(
+            records,
+            {'_id': ObjectId(record_id)},
+            {
+                'status': 'approved',
+                'reviewed_by': request.user.id,
+                'reviewed_at': datetime.utcnow()
+            }
+        )
+    except InvalidId:
         return Response({'message': 'Invalid record ID'}, status=status.HTTP_400_BAD_REQUEST)
     
     if not record:
         return Response({'message': 'Record not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    records.update_one(
-        {'_id': ObjectId(record_id)},
-        {
-            '$set': {
-                'status': 'approved',
-                'reviewed_by': request.user.id,
-                'reviewed_at': datetime.utcnow()
-            }
-        }
-    )
+    # Keep regional counters and risk fresh
+    apply_record_review(record, 'approved')
     
     # Notify the patient
-    notifications.insert_one({
+    dispatch_notifications([{
         'user_id': record['patient_id'],
         'type': 'record',
         'title': 'Medical record approved',
@@ -238,9 +374,8 @@ def approve_record(request, record_id):
         'is_read': False,
         'created_at': datetime.utcnow(),
         'severity': 'low'
-    })
+    }])
     
-    updated_record = records.find_one({'_id': ObjectId(record_id)})
     return Response(serialize_mongo_doc(updated_record))
 
 
@@ -252,31 +387,30 @@ def reject_record(request, record_id):
         return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     
     records = get_collection(Collections.MEDICAL_RECORDS)
-    notifications = get_collection(Collections.NOTIFICATIONS)
     notes = request.data.get('notes', '')
     
     try:
-        record = records.find_one({'_id': ObjectId(record_id)})
-    except:
-        return Response({'message': 'Invalid record ID'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    if not record:
-        return Response({'message': 'Record not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    records.update_one(
-        {'_id': ObjectId(record_id)},
-        {
-            '$set': {
+        record, updated_record = set_and_fetch(
+            records,
+            {'_id': ObjectId(record_id)},
+            {
                 'status': 'rejected',
                 'doctor_notes': notes,
                 'reviewed_by': request.user.id,
                 'reviewed_at': datetime.utcnow()
             }
-        }
-    )
+        )
+    except InvalidId:
+        return Response({'message': 'Invalid record ID'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not record:
+        return Response({'message': 'Record not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    # Keep regional counters and risk fresh
+    apply_record_review(record, 'rejected')
     
     # Notify the patient
-    notifications.insert_one({
+    dispatch_notifications([{
         'user_id': record['patient_id'],
         'type': 'record',
         'title': 'Medical record rejected',
@@ -284,7 +418,6 @@ def reject_record(request, record_id):
         'is_read': False,
         'created_at': datetime.utcnow(),
         'severity': 'medium'
-    })
+    }])
     
-    updated_record = records.find_one({'_id': ObjectId(record_id)})
     return Response(serialize_mongo_doc(updated_record))
@@ -6,9 +6,23 @@ import os
 # Bind to the port provided by Render (Render defaults to 10000)
 bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
 
+# Serving mode (see SERVER_MODE in healthiq/settings.py)
+server_mode = os.getenv('SERVER_MODE', 'wsgi')
+
 # Worker configuration
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+if server_mode == 'asgi':
+    # One event loop per core; each worker serves many concurrent requests.
+    # Views without an async port still run synchronously, each request on
+    # its own thread (Django's ThreadSensitiveContext), but with n rather
+    # than 2n+1 processes CPU-bound sync views get less parallelism; raise
+    # WEB_CONCURRENCY if they dominate the load.
+    wsgi_app = "healthiq.asgi:application"
+    workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "healthiq.wsgi:application"
+    workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+    worker_class = "sync"
 worker_connections = 1000
 timeout = 120
 keepalive = 5
@@ -32,3 +46,20 @@ tmp_upload_dir = None
 # SSL (handled by Render's load balancer)
 forwarded_allow_ips = "*"
 secure_scheme_headers = {"X-FORWARDED-PROTO": "https"}
+
+
+def post_fork(server, worker):
+    """Give each worker its own right-sized MongoDB pool."""
+    from healthiq.mongodb import configure_worker_pool
+    configure_worker_pool(server.cfg.workers)
+
+
+def post_worker_init(worker):
+    """
+    Start the notification worker once Django is loaded, so it sweeps the
+    outbox left by a crash, and report a missing appointment slot index.
+    """
+    from appointments.slots import check_slot_index
+    from notifications.dispatch import start
+    start()
+    check_slot_index()
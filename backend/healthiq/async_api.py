@@ -0,0 +1,82 @@
+"""
+Async API views for ASGI deployments.
+
+DRF's @api_view only runs synchronous views, so the async ports of the
+read-heavy endpoints are plain Django async views wrapped by
+async_api_view, which does what DRF does for them: JWT authentication
+(accounts.authentication.ClaimsJWTAuthentication), the IsAuthenticated
+check, the allowed methods and the JSON rendering and error format of
+the sync views.
+
+The URLconfs route to the async ports when settings.ASYNC_VIEWS is set
+(SERVER_MODE=asgi); their data comes from healthiq.mongodb.get_async_collection.
+
+Usage:
+    @async_api_view(['GET'])
+    @cached_response(CacheNamespaces.ANALYTICS)
+    async def region_risk(request):
+        ...
+        return AsyncResponse(result)
+"""
+
+from functools import wraps
+from typing import Any, List
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from .serialization import dumps
+
+
+class AsyncResponse(HttpResponse):
+    """JSON response of an async view, rendered like DRF's Response (keeps .data)."""
+    
+    def __init__(self, data: Any = None, status: int = status.HTTP_200_OK):
+        content = dumps(data) if data is not None else b''
+        super().__init__(content, status=status, content_type='application/json')
+        self.data = data
+
+
+def _error_response(exc: exceptions.APIException) -> AsyncResponse:
+    """An API exception in the format of healthiq.exceptions.custom_exception_handler."""
+    detail = exc.detail
+    if isinstance(detail, dict):
+        # SimpleJWT's InvalidToken nests its message
+        detail = detail.get('detail', 'An error occurred')
+    response = AsyncResponse({'message': str(detail), 'errors': {}}, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        from accounts.authentication import ClaimsJWTAuthentication
+        response['WWW-Authenticate'] = ClaimsJWTAuthentication().authenticate_header(None)
+    return response
+
+
+def async_api_view(http_method_names: List[str]):
+    """
+    Serve an async view as an authenticated API endpoint.
+    
+    Sets request.user and request.auth from the bearer token, and answers
+    401 for anonymous requests and 405 for other methods.
+    
+    Args:
+        http_method_names: Allowed methods, as for @api_view
+    """
+    allowed = [method.upper() for method in http_method_names]
+    
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            from accounts.authentication import ClaimsJWTAuthentication
+            
+            try:
+                if request.method not in allowed:
+                    raise exceptions.MethodNotAllowed(request.method)
+                authenticated = await ClaimsJWTAuthentication().aauthenticate(request)
+                if authenticated is None:
+                    raise exceptions.NotAuthenticated()
+            except exceptions.APIException as exc:
+                return _error_response(exc)
+            
+            request.user, request.auth = authenticated
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,113 @@
+"""
+Response cache for read-mostly endpoints, on Django's cache framework.
+
+Cached views share a namespace. Every namespace has a generation number
+that is part of each key, so invalidating a namespace is a single counter
+bump and the old entries simply expire. Keys are built from the view, the
+user's role and the sorted query params; only 200 responses are stored.
+Below @conditional_response the key also holds the request's ETag, so a
+cached body is only reused for the watermark it was built at.
+
+Usage:
+    @api_view(['GET'])
+    @permission_classes([IsAuthenticated])
+    @cached_response(CacheNamespaces.ANALYTICS)
+    def region_risk(request):
+        ...
+"""
+
+import inspect
+from functools import wraps
+from typing import Optional
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from .conditional import ETAG_ATTR
+
+
+# Cache namespace constants
+class CacheNamespaces:
+    ANALYTICS = 'analytics'
+
+
+def _generation_key(namespace: str) -> str:
+    return f'responses:{namespace}:generation'
+
+
+def get_generation(namespace: str) -> int:
+    """Current generation of a namespace."""
+    return cache.get_or_set(_generation_key(namespace), 1, timeout=None)
+
+
+def invalidate_namespace(namespace: str):
+    """Make every cached response of a namespace stale."""
+    try:
+        cache.incr(_generation_key(namespace))
+    except ValueError:
+        # Not cached yet (or evicted); start a generation no key was built with
+        cache.set(_generation_key(namespace), 2, timeout=None)
+
+
+def _response_cache_key(request, namespace: str, view_name: str, generation: int) -> str:
+    params = urlencode(sorted(request.GET.lists()), doseq=True)
+    role = getattr(request.user, 'role', '')
+    etag = getattr(request, ETAG_ATTR, '')
+    return f'responses:{namespace}:{generation}:{view_name}:{role}:{params}:{etag}'
+
+
+def response_cache_key(request, namespace: str, view_name: str) -> str:
+    """Cache key of a request: namespace generation, view, role and query params."""
+    return _response_cache_key(request, namespace, view_name, get_generation(namespace))
+
+
+async def aresponse_cache_key(request, namespace: str, view_name: str) -> str:
+    """Async response_cache_key."""
+    generation = await cache.aget_or_set(_generation_key(namespace), 1, timeout=None)
+    return _response_cache_key(request, namespace, view_name, generation)
+
+
+def cached_response(namespace: str, timeout: Optional[int] = None):
+    """
+    Cache a view's successful responses.
+    
+    Goes below @api_view/@permission_classes (or @async_api_view) so
+    authentication and permission checks still run on every request.
+    
+    Args:
+        namespace: Namespace invalidated together with invalidate_namespace
+        timeout: Seconds to keep an entry (default ANALYTICS_CACHE_TTL)
+    """
+    ttl = settings.ANALYTICS_CACHE_TTL if timeout is None else timeout
+    
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            from .async_api import AsyncResponse
+            
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                key = await aresponse_cache_key(request, namespace, view.__name__)
+                data = await cache.aget(key)
+                if data is not None:
+                    return AsyncResponse(data)
+                
+                response = await view(request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    await cache.aset(key, response.data, ttl)
+                return response
+            return async_wrapper
+        
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = response_cache_key(request, namespace, view.__name__)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+            
+            response = view(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, ttl)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,82 @@
+"""
+Concurrent execution of independent MongoDB queries.
+
+Dashboard views and snapshot rebuilds issue several queries that do not
+depend on each other. run_concurrently sends them together on a thread
+pool shared by the process, so the caller waits for the slowest query
+instead of the sum of all of them. PyMongo clients are thread-safe and
+pool their connections, so tasks can use get_collection freely; they
+should not touch the Django ORM, whose connections are per thread.
+
+Usage:
+    results = run_concurrently(
+        snapshot=lambda: get_region_snapshots([region])[region],
+        alerts=lambda: list(notifications.find(query).limit(5)),
+    )
+    results['snapshot'], results['alerts']
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from django.conf import settings
+
+
+_executor = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """The process's query pool, created on first use."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.QUERY_FANOUT_WORKERS, thread_name_prefix='query-fanout'
+            )
+    return _executor
+
+
+def _run_task(task: Callable[[], Any]) -> Any:
+    _local.in_pool = True
+    try:
+        return task()
+    finally:
+        _local.in_pool = False
+
+
+def run_concurrently(**tasks: Callable[[], Any]) -> Dict[str, Any]:
+    """
+    Run independent callables concurrently and join their results.
+    
+    Runs them one after another instead when there is only one, when the
+    pool is disabled (QUERY_FANOUT_WORKERS < 2) or when called from a task
+    of the pool itself, which could otherwise wait on its own pool.
+    
+    Args:
+        **tasks: Callables without arguments, by result name
+    
+    Returns:
+        Mapping of each name to its callable's result. The first exception
+        raised by a task is re-raised once all tasks have finished.
+    """
+    if len(tasks) < 2 or settings.QUERY_FANOUT_WORKERS < 2 or getattr(_local, 'in_pool', False):
+        return {name: task() for name, task in tasks.items()}
+    
+    executor = _get_executor()
+    futures = {name: executor.submit(_run_task, task) for name, task in tasks.items()}
+    # Wait for every task so none outlives the request that started it
+    for future in futures.values():
+        future.exception()
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _reset_after_fork():
+    """Pool threads do not survive a fork; the child starts its own pool."""
+    global _executor
+    _executor = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,129 @@
+"""
+Conditional GET (ETag / Last-Modified) for read endpoints.
+
+Each endpoint supplies a watermark function that reads only the cheap
+change markers of its data (updated_at / created_at of the underlying
+documents, counts). The ETag is a hash of the view, its query params and
+that watermark, so a matching If-None-Match or If-Modified-Since is
+answered with 304 before the view builds its payload.
+
+The ETag is also left on the request as ETAG_ATTR, and cached_response
+puts it in its key, so a response cached by a process that had not seen
+the latest change is never served under the new ETag.
+
+Usage:
+    @api_view(['GET'])
+    @permission_classes([IsAuthenticated])
+    @conditional_response(region_risk_watermark)
+    def region_risk(request):
+        ...
+"""
+
+import calendar
+import hashlib
+import inspect
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple
+from urllib.parse import urlencode
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+# Request attribute holding the ETag of the response being built
+ETAG_ATTR = 'conditional_etag'
+
+# watermark(request) -> (last modified time or None, any repr-able change token);
+# a coroutine function for async views
+Watermark = Callable[[Any], Tuple[Optional[datetime], Any]]
+
+
+def latest(*times: Optional[datetime]) -> Optional[datetime]:
+    """Newest of the given times, ignoring missing ones."""
+    present = [t for t in times if t is not None]
+    return max(present) if present else None
+
+
+def make_etag(request, view_name: str, token: Any) -> str:
+    """Strong ETag of a view's response for the given watermark token."""
+    params = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.sha1(f'{view_name}?{params}|{token!r}'.encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _timestamp(value: datetime) -> int:
+    """Seconds since the epoch of a naive UTC (MongoDB) datetime."""
+    return calendar.timegm(value.utctimetuple())
+
+
+def is_not_modified(request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Whether the client's cached copy is current (If-None-Match wins over If-Modified-Since)."""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    if if_modified_since is not None and last_modified is not None:
+        return _timestamp(last_modified) <= if_modified_since
+    return False
+
+
+def _add_validators(response, etag: str, last_modified: Optional[datetime]):
+    """Set the ETag, Last-Modified and caching headers of a conditional response."""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    # Responses are per user (JWT); clients must revalidate before reuse
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def conditional_response(watermark: Watermark):
+    """
+    Answer conditional GETs of a view from its watermark.
+    
+    Goes below @api_view/@permission_classes (or @async_api_view) so 304s
+    are only sent to clients allowed to see the resource.
+    
+    Args:
+        watermark: Function of the request returning (last_modified, token),
+            async for async views
+    """
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            from .async_api import AsyncResponse
+            
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                last_modified, token = await watermark(request)
+                etag = make_etag(request, view.__name__, token)
+                
+                if is_not_modified(request, etag, last_modified):
+                    response = AsyncResponse(status=status.HTTP_304_NOT_MODIFIED)
+                else:
+                    setattr(request, ETAG_ATTR, etag)
+                    response = await view(request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK:
+                        return response
+                return _add_validators(response, etag, last_modified)
+            return async_wrapper
+        
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            last_modified, token = watermark(request)
+            etag = make_etag(request, view.__name__, token)
+            
+            if is_not_modified(request, etag, last_modified):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                setattr(request, ETAG_ATTR, etag)
+                response = view(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+            return _add_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
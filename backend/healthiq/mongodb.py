@@ -1,8 +1,61 @@
-from pymongo import MongoClient
+import asyncio
+import importlib.util
+import os
+from typing import Dict, Optional, Tuple
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, IndexModel, MongoClient, ReturnDocument
+from pymongo.errors import OperationFailure
 from django.conf import settings
 
 _client = None
 _db = None
+# AsyncMongoClient of the async views and the event loop it is bound to
+_async_client = None
+_async_db = None
+_async_loop = None
+# Number of processes sharing MONGODB_CONNECTION_BUDGET, set after a fork
+_worker_count = 1
+
+# Python module each wire compressor needs
+_COMPRESSOR_MODULES = {
+    'zstd': 'zstandard',
+    'snappy': 'snappy',
+    'zlib': 'zlib',
+}
+
+
+def _available_compressors():
+    """Configured compressors whose library is importable, in preference order."""
+    return [
+        name for name in settings.MONGODB_COMPRESSORS
+        if importlib.util.find_spec(_COMPRESSOR_MODULES.get(name, name)) is not None
+    ]
+
+
+def _pool_size():
+    """Per-client pool size, shrunk so all workers fit the connection budget."""
+    max_pool_size = settings.MONGODB_MAX_POOL_SIZE
+    if settings.MONGODB_CONNECTION_BUDGET:
+        # ASGI workers hold a sync and an async client, which share the worker's share
+        clients = 2 if settings.ASYNC_VIEWS else 1
+        max_pool_size = min(max_pool_size, settings.MONGODB_CONNECTION_BUDGET // (_worker_count * clients))
+    return max(1, max_pool_size)
+
+
+def get_client_options():
+    """Keyword arguments for MongoClient built from settings."""
+    max_pool_size = _pool_size()
+    return {
+        'maxPoolSize': max_pool_size,
+        'minPoolSize': min(settings.MONGODB_MIN_POOL_SIZE, max_pool_size),
+        'waitQueueTimeoutMS': settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        'connectTimeoutMS': settings.MONGODB_CONNECT_TIMEOUT_MS,
+        'compressors': _available_compressors(),
+        'retryReads': settings.MONGODB_RETRY_READS,
+        'retryWrites': settings.MONGODB_RETRY_WRITES,
+        'readPreference': settings.MONGODB_READ_PREFERENCE,
+        'appname': 'healthiq',
+    }
 
 
 def get_db():
@@ -15,7 +68,7 @@ def get_db():
             raise RuntimeError(
                 "MONGO_URI is not set. Configure it in environment variables."
             )
-        _client = MongoClient(uri)
+        _client = MongoClient(uri, **get_client_options())
         _db = _client[settings.MONGODB_NAME]
     
     return _db
@@ -26,6 +79,63 @@ def get_collection(collection_name: str):
     return get_db()[collection_name]
 
 
+def get_async_db():
+    """
+    Async counterpart of get_db for the async views.
+    
+    An AsyncMongoClient belongs to the event loop it was first used on, so
+    a new one is opened when called from another loop (one loop per
+    uvicorn worker in production).
+    """
+    global _async_client, _async_db, _async_loop
+    
+    loop = asyncio.get_running_loop()
+    if _async_db is None or _async_loop is not loop:
+        uri = settings.MONGODB_URI
+        if not uri:
+            raise RuntimeError(
+                "MONGO_URI is not set. Configure it in environment variables."
+            )
+        _async_client = AsyncMongoClient(uri, **get_client_options())
+        _async_db = _async_client[settings.MONGODB_NAME]
+        _async_loop = loop
+    
+    return _async_db
+
+
+def get_async_collection(collection_name: str):
+    """Get a MongoDB collection of the async client (await its methods)."""
+    return get_async_db()[collection_name]
+
+
+def set_and_fetch(collection, query: Dict, fields: Dict, projection=None) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """
+    $set top-level fields on one document in a single round trip.
+    
+    The document is returned as it was before the update (what callers
+    need to react to the change) and, rebuilt from that and fields, as it
+    is after it (what the views respond with).
+    
+    Args:
+        collection: Collection to update
+        query: Filter selecting the document
+        fields: Top-level fields to $set
+        projection: Optional projection of the returned documents
+    
+    Returns:
+        (before, after), or (None, None) if no document matched
+    """
+    before = collection.find_one_and_update(
+        query,
+        {'$set': fields},
+        projection=projection,
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        return None, None
+    return before, {**before, **fields}
+
+
 def close_connection():
     """Close MongoDB connection."""
     global _client, _db
@@ -35,6 +145,37 @@ def close_connection():
         _db = None
 
 
+def reset_after_fork():
+    """
+    Forget the client inherited from a parent process.
+    
+    MongoClient is not fork-safe; a forked child must open its own
+    connections on first use instead of sharing the parent's sockets.
+    """
+    global _client, _db, _async_client, _async_db, _async_loop
+    _client = None
+    _db = None
+    _async_client = None
+    _async_db = None
+    _async_loop = None
+
+
+def configure_worker_pool(worker_count: int):
+    """
+    Post-fork hook for pre-forking servers.
+    
+    Drops any inherited client and sizes this worker's pool so that
+    worker_count workers together stay within MONGODB_CONNECTION_BUDGET.
+    """
+    global _worker_count
+    _worker_count = max(1, worker_count)
+    reset_after_fork()
+
+
+# Any fork (gunicorn workers, backfill process pools) gets a fresh client
+os.register_at_fork(after_in_child=reset_after_fork)
+
+
 # Collection names constants
 class Collections:
     PATIENTS = 'patients'
@@ -45,3 +186,124 @@ class Collections:
     WEATHER_DATA = 'weather_data'
     WATER_QUALITY = 'water_quality'
     NOTIFICATIONS = 'notifications'
+    NOTIFICATION_RECEIPTS = 'notification_receipts'
+    NOTIFICATION_COUNTERS = 'notification_counters'
+    DASHBOARD_SNAPSHOTS = 'dashboard_snapshots'
+    NOTIFICATION_OUTBOX = 'notification_outbox'
+
+
+# Indexes backing the hot query shapes of each collection.
+# Needs MongoDB 6.0+, the first release accepting $in in a partialFilterExpression.
+INDEXES = {
+    Collections.PATIENTS: [
+        IndexModel([('user_id', ASCENDING)]),
+        IndexModel([('region', ASCENDING), ('user_id', ASCENDING)]),
+    ],
+    Collections.MEDICAL_RECORDS: [
+        IndexModel([('status', ASCENDING), ('date', ASCENDING)]),
+        IndexModel([('status', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('status', ASCENDING), ('patient_region', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('status', ASCENDING), ('diagnosis', ASCENDING)]),
+        IndexModel([('patient_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('patient_id', ASCENDING), ('status', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('reviewed_at', DESCENDING)], sparse=True),
+    ],
+    Collections.DOCTORS: [
+        IndexModel([('user_id', ASCENDING)]),
+        IndexModel([('region', ASCENDING)]),
+        IndexModel([('specialization', ASCENDING)]),
+    ],
+    Collections.APPOINTMENTS: [
+        IndexModel([('doctor_id', ASCENDING), ('appointment_date', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('patient_id', ASCENDING), ('appointment_date', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('appointment_date', DESCENDING), ('_id', DESCENDING)]),
+        # One live appointment per slot; cancelled ones fall out of the index (MongoDB 6.0+)
+        IndexModel(
+            [('doctor_id', ASCENDING), ('appointment_date', ASCENDING), ('appointment_time', ASCENDING)],
+            unique=True,
+            partialFilterExpression={'status': {'$in': ['pending', 'confirmed', 'completed']}}
+        ),
+    ],
+    Collections.REGIONAL_STATS: [
+        IndexModel([('region', ASCENDING), ('disease', ASCENDING), ('date', ASCENDING)], unique=True),
+        IndexModel([('region', ASCENDING), ('disease', ASCENDING), ('date', DESCENDING), ('updated_at', DESCENDING)]),
+        IndexModel([('disease', ASCENDING), ('date', DESCENDING), ('updated_at', DESCENDING)]),
+    ],
+    Collections.WEATHER_DATA: [
+        IndexModel([('region', ASCENDING), ('date', DESCENDING)]),
+        IndexModel([('date', DESCENDING)]),
+    ],
+    Collections.WATER_QUALITY: [
+        IndexModel([('region', ASCENDING), ('date', DESCENDING)]),
+    ],
+    Collections.NOTIFICATIONS: [
+        IndexModel([('user_id', ASCENDING), ('created_at', DESCENDING)]),
+        IndexModel([('user_id', ASCENDING), ('is_read', ASCENDING)]),
+        IndexModel([('type', ASCENDING), ('is_read', ASCENDING)]),
+        IndexModel([('audience', ASCENDING), ('region', ASCENDING), ('created_at', DESCENDING)]),
+    ],
+    Collections.NOTIFICATION_RECEIPTS: [
+        IndexModel([('user_id', ASCENDING), ('notification_id', ASCENDING)], unique=True),
+        IndexModel([('user_id', ASCENDING), ('region', ASCENDING)]),
+    ],
+    Collections.NOTIFICATION_OUTBOX: [
+        IndexModel([('claim', ASCENDING)]),
+        IndexModel([('status', ASCENDING), ('created_at', ASCENDING)]),
+        IndexModel([('status', ASCENDING), ('claimed_at', ASCENDING)]),
+    ],
+}
+
+
+class IndexBuildError(RuntimeError):
+    """Some registered indexes could not be built; the others were."""
+    
+    def __init__(self, created: Dict, failures: Dict):
+        self.created = created
+        self.failures = failures
+        super().__init__('; '.join(
+            f'{name}.{index}: {error}' for name, errors in failures.items() for index, error in errors
+        ))
+
+
+def _index_error(index: IndexModel, exc: OperationFailure) -> str:
+    """What went wrong building an index, and how to fix it where that is known."""
+    message = (exc.details or {}).get('errmsg') or str(exc)
+    if exc.code == 11000:
+        return f'duplicate keys exist, remove the duplicates and re-run ({message})'
+    if 'partialFilterExpression' in index.document and exc.code == 67:
+        return f'partial filter needs MongoDB 6.0 or later ({message})'
+    return message
+
+
+def ensure_indexes(db=None, collections=None):
+    """
+    Build the registered indexes (idempotent, existing indexes are left alone).
+    
+    Indexes are built one at a time, so one that cannot be built (e.g. a
+    unique index over duplicate documents) does not hold back the others.
+    
+    Args:
+        db: Database to index. Defaults to the configured database.
+        collections: Restrict to these collection names. Defaults to all.
+    
+    Returns:
+        Mapping of collection name to the index names it now has
+    
+    Raises:
+        IndexBuildError: If any index failed, after building all the others
+    """
+    db = db if db is not None else get_db()
+    created = {}
+    failures = {}
+    for name, indexes in INDEXES.items():
+        if collections is not None and name not in collections:
+            continue
+        created[name] = []
+        for index in indexes:
+            try:
+                created[name] += db[name].create_indexes([index])
+            except OperationFailure as e:
+                failures.setdefault(name, []).append((index.document['name'], _index_error(index, e)))
+    if failures:
+        raise IndexBuildError(created, failures)
+    return created
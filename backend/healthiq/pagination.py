@@ -0,0 +1,242 @@
+"""
+Keyset (cursor) pagination for MongoDB list endpoints.
+
+Pages are ordered by (sort_field, _id) descending, so fetching any page is
+an index range scan no matter how deep it is. The response body stays a
+plain list; the opaque cursor of the next page is sent in the
+X-Next-Cursor header and is absent on the last page.
+
+Pagination is opt-in: a request with neither page_size nor cursor gets
+the whole listing in the same order, as before pagination existed, so
+clients that don't read X-Next-Cursor never see a truncated list.
+
+Query params:
+    page_size: Items per page (default API_PAGE_SIZE once paginating,
+        capped at API_MAX_PAGE_SIZE)
+    cursor: Value of X-Next-Cursor from the previous page
+    stream: 'json' or 'ndjson' to receive every remaining item in one
+        streamed response instead of a page (endpoints with allow_stream,
+        for the roles it lists only)
+
+A streamed response is encoded while the MongoDB cursor is read in
+batches of API_STREAM_BATCH_SIZE, so worker memory stays flat whatever
+the size of the result. The cursor is closed when the response is, even
+if the client goes away before the first chunk.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from asgiref.sync import sync_to_async
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ParseError, PermissionDenied
+from rest_framework.response import Response
+from .serialization import iter_json_array, iter_ndjson
+
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+# ?stream= value -> (encoder, content type)
+STREAM_FORMATS = {
+    'json': (iter_json_array, 'application/json'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
+
+
+def wants_page(request) -> bool:
+    """Whether the request opted into pagination."""
+    return 'page_size' in request.GET or 'cursor' in request.GET
+
+
+def get_page_size(request) -> int:
+    """Requested page size, clamped to the configured bounds."""
+    try:
+        page_size = int(request.GET.get('page_size', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ParseError('page_size must be an integer')
+    return max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+
+def encode_cursor(doc: Dict, sort_field: Optional[str]) -> str:
+    """Opaque cursor pointing just past doc."""
+    payload = {'id': str(doc['_id'])}
+    if sort_field:
+        value = doc.get(sort_field)
+        if isinstance(value, datetime):
+            payload['dt'] = value.isoformat()
+        else:
+            payload['v'] = value
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort_field: Optional[str]) -> Dict:
+    """Query selecting the documents after a cursor in (sort_field, _id) descending order."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last_id = ObjectId(payload['id'])
+        if sort_field is None:
+            return {'_id': {'$lt': last_id}}
+        value = datetime.fromisoformat(payload['dt']) if 'dt' in payload else payload.get('v')
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ParseError('Invalid cursor')
+    
+    after = [
+        {sort_field: {'$lt': value}},
+        {sort_field: value, '_id': {'$lt': last_id}},
+    ]
+    if value is not None:
+        # Missing/null values sort last in descending order
+        after.append({sort_field: None})
+    return {'$or': after}
+
+
+def _keyset_query(request, query: Dict, sort_field: Optional[str]) -> Tuple[Dict, List]:
+    """The listing's filter, resumed after the request's cursor, and its sort."""
+    cursor = request.GET.get('cursor')
+    if cursor:
+        query = {'$and': [query, decode_cursor(cursor, sort_field)]}
+    sort = [(sort_field, -1), ('_id', -1)] if sort_field else [('_id', -1)]
+    return query, sort
+
+
+def paginate(request, collection, query: Dict, sort_field: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Fetch one page of a query.
+    
+    Args:
+        request: The request carrying page_size/cursor params
+        collection: MongoDB collection to query
+        query: Filter of the listing
+        sort_field: Field to order by, newest first. None orders by _id only.
+    
+    Returns:
+        (documents, next_cursor) where next_cursor is None on the last page.
+        Without page_size/cursor params every document is returned.
+    """
+    query, sort = _keyset_query(request, query, sort_field)
+    if not wants_page(request):
+        return list(collection.find(query).sort(sort)), None
+    
+    page_size = get_page_size(request)
+    docs = list(collection.find(query).sort(sort).limit(page_size + 1))
+    
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor
+
+
+async def _aiter_chunks(chunks: Iterator[bytes]):
+    """
+    Serve a sync stream under ASGI one chunk at a time.
+    
+    Django would otherwise read a synchronous iterator to the end before
+    sending anything to an ASGI client.
+    """
+    next_chunk = sync_to_async(next, thread_sensitive=False)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=False)()
+
+
+class _CursorStream:
+    """
+    Chunks encoded from a MongoDB cursor, as StreamingHttpResponse content.
+    
+    The response calls close() when it is closed, which a generator's
+    finally would not do if it never started, so the cursor is closed here.
+    """
+    
+    def __init__(self, chunks: Iterator[bytes], cursor):
+        self._chunks = chunks
+        self._cursor = cursor
+    
+    def __iter__(self):
+        return self._chunks
+    
+    def close(self):
+        try:
+            self._chunks.close()
+        finally:
+            self._cursor.close()
+
+
+class _AsyncCursorStream:
+    """A _CursorStream served under ASGI (see _aiter_chunks)."""
+    
+    def __init__(self, stream: _CursorStream):
+        self._stream = stream
+    
+    def __aiter__(self):
+        return _aiter_chunks(iter(self._stream))
+    
+    def close(self):
+        self._stream.close()
+
+
+def streamed_response(
+    request,
+    collection,
+    query: Dict,
+    serialize: Callable[[Dict], Dict],
+    sort_field: Optional[str] = None,
+    roles: Sequence[str] = ()
+) -> StreamingHttpResponse:
+    """
+    Every item of a query (after the request's cursor, if any) as a streamed list.
+    
+    Items come in the order of the paginated listing, read from the cursor
+    in batches and encoded as a JSON array or NDJSON per the stream param.
+    
+    Args:
+        roles: Roles allowed to stream the listing
+    """
+    if getattr(request.user, 'role', None) not in roles:
+        raise PermissionDenied('Streaming is not available for this listing')
+    stream_format = request.GET.get('stream')
+    if stream_format not in STREAM_FORMATS:
+        raise ParseError(f"stream must be one of: {', '.join(STREAM_FORMATS)}")
+    encode, content_type = STREAM_FORMATS[stream_format]
+    
+    query, sort = _keyset_query(request, query, sort_field)
+    cursor = collection.find(query).sort(sort).batch_size(settings.API_STREAM_BATCH_SIZE)
+    stream = _CursorStream(encode(cursor, serialize), cursor)
+    
+    if settings.ASYNC_VIEWS:
+        stream = _AsyncCursorStream(stream)
+    return StreamingHttpResponse(stream, content_type=content_type)
+
+
+def paginated_response(
+    request,
+    collection,
+    query: Dict,
+    serialize: Callable[[Dict], Dict],
+    sort_field: Optional[str] = None,
+    allow_stream: Sequence[str] = ()
+):
+    """
+    One page of a query as a list response, with the next cursor in a header.
+    
+    Without page_size/cursor params the whole listing is returned.
+    A stream param returns the whole listing as a streamed_response
+    instead, for users whose role is in allow_stream.
+    """
+    if allow_stream and request.GET.get('stream'):
+        return streamed_response(request, collection, query, serialize, sort_field, roles=allow_stream)
+    
+    docs, next_cursor = paginate(request, collection, query, sort_field)
+    response = Response([serialize(doc) for doc in docs])
+    if next_cursor:
+        response[NEXT_CURSOR_HEADER] = next_cursor
+    return response
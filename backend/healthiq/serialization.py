@@ -0,0 +1,132 @@
+"""
+JSON serialization of MongoDB documents.
+
+One place for what every app used to hand-roll: serialize_mongo_doc
+exposes a document's _id as 'id', and dumps encodes the remaining BSON
+types (ObjectId, Decimal128, datetimes) on the fly, with orjson when it
+is installed and DRF's encoder otherwise. healthiq.renderers plugs dumps
+into DRF, and iter_json_array / iter_ndjson encode a cursor as it is read
+so large lists never exist as one Python structure.
+"""
+
+from typing import Any, Callable, Iterable, Iterator, Optional
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional; DRF's encoder is used instead
+    orjson = None
+
+
+# Documents encoded per chunk when streaming
+STREAM_CHUNK_SIZE = 200
+
+
+def serialize_mongo_doc(doc: Optional[dict]) -> Optional[dict]:
+    """Convert MongoDB document to serializable format (in place: _id becomes id)."""
+    if doc is None:
+        return None
+    if '_id' in doc:
+        doc['id'] = str(doc.pop('_id'))
+    return doc
+
+
+class BSONJSONEncoder(encoders.JSONEncoder):
+    """DRF's JSONEncoder, also encoding ObjectId and Decimal128."""
+    
+    def default(self, obj):
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        if isinstance(obj, Decimal128):
+            return float(obj.to_decimal())
+        return super().default(obj)
+
+
+# Compact and strict (no NaN), as DRF's JSONRenderer is configured by default
+_fallback_encoder = BSONJSONEncoder(ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+
+
+if orjson is not None:
+    # Non-str keys and numpy values as DRF's encoder allows, aware UTC datetimes
+    # ending in Z; other types go through BSONJSONEncoder.default
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+
+
+def _escape_line_separators(content: bytes) -> bytes:
+    # Like DRF's JSONRenderer, keep the output a strict JavaScript subset
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+    return content
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Compact UTF-8 JSON of data, with the output of DRF's JSONRenderer.
+    
+    Falls back to DRF's encoder when orjson is missing or rejects a value
+    (e.g. integers beyond 64 bits).
+    """
+    if orjson is not None:
+        try:
+            return _escape_line_separators(orjson.dumps(data, default=_fallback_encoder.default, option=ORJSON_OPTIONS))
+        except orjson.JSONEncodeError:
+            pass
+    return _escape_line_separators(_fallback_encoder.encode(data).encode())
+
+
+def iter_json_array(
+    docs: Iterable[Any],
+    transform: Optional[Callable[[Any], Any]] = serialize_mongo_doc,
+    chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Encode documents as a JSON array while reading them (e.g. from a cursor).
+    
+    Args:
+        docs: Documents or any iterable, consumed once
+        transform: Applied to each document before encoding (None to skip)
+        chunk_size: Documents per yielded chunk
+    
+    Yields:
+        Chunks of the array's bytes
+    """
+    yield b'['
+    chunk = []
+    first = True
+    for doc in docs:
+        encoded = dumps(transform(doc) if transform else doc)
+        chunk.append(encoded if first else b',' + encoded)
+        first = False
+        if len(chunk) >= chunk_size:
+            yield b''.join(chunk)
+            chunk = []
+    chunk.append(b']')
+    yield b''.join(chunk)
+
+
+def iter_ndjson(
+    docs: Iterable[Any],
+    transform: Optional[Callable[[Any], Any]] = serialize_mongo_doc,
+    chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Encode documents as newline-delimited JSON (one document per line) while reading them.
+    
+    Args:
+        docs: Documents or any iterable, consumed once
+        transform: Applied to each document before encoding (None to skip)
+        chunk_size: Documents per yielded chunk
+    
+    Yields:
+        Chunks of lines
+    """
+    chunk = []
+    for doc in docs:
+        chunk.append(dumps(transform(doc) if transform else doc) + b'\n')
+        if len(chunk) >= chunk_size:
+            yield b''.join(chunk)
+            chunk = []
+    if chunk:
+        yield b''.join(chunk)
@@ -7,6 +7,7 @@ from pathlib import Path
 from datetime import timedelta
 import os
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -88,11 +89,80 @@ DATABASES = {
     }
 }
 
+# Cache - backs the analytics response cache (see healthiq.cache).
+# 'locmem' is per process, so invalidation from management commands only
+# reaches other processes with 'file' or 'redis' (redis needs the redis package).
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.getenv('CACHE_LOCATION', {
+            'locmem': 'healthiq',
+            'file': str(BASE_DIR / 'cache'),
+            'redis': 'redis://127.0.0.1:6379/1',
+        }[CACHE_BACKEND]),
+    }
+}
+# Seconds a cached analytics response is served before it is recomputed
+ANALYTICS_CACHE_TTL = int(os.getenv('ANALYTICS_CACHE_TTL', '60'))
+
 # MongoDB Configuration (MongoDB Atlas)
 # Support both MONGO_URI (preferred for Render) and MONGODB_URI for backwards compatibility
 MONGODB_URI = os.getenv('MONGO_URI') or os.getenv('MONGODB_URI', '')
 MONGODB_NAME = os.getenv('MONGODB_NAME', 'healthiq')
 
+# MongoDB client tuning (per process; see healthiq.mongodb.configure_worker_pool)
+MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', '50'))
+MONGODB_MIN_POOL_SIZE = int(os.getenv('MONGODB_MIN_POOL_SIZE', '0'))
+# Total connections all workers of one instance may open (0 = no limit)
+MONGODB_CONNECTION_BUDGET = int(os.getenv('MONGODB_CONNECTION_BUDGET', '0'))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGODB_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '10000'))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', '10000'))
+# Tried in order; compressors whose library is not installed are skipped
+MONGODB_COMPRESSORS = [c for c in os.getenv('MONGODB_COMPRESSORS', 'zstd,snappy,zlib').split(',') if c]
+MONGODB_RETRY_READS = os.getenv('MONGODB_RETRY_READS', 'True').lower() == 'true'
+MONGODB_RETRY_WRITES = os.getenv('MONGODB_RETRY_WRITES', 'True').lower() == 'true'
+MONGODB_READ_PREFERENCE = os.getenv('MONGODB_READ_PREFERENCE', 'primary')
+
+# How risk alerts reach users: 'broadcast' stores one alert per region that
+# users read at query time, 'fanout' copies the alert to every patient
+RISK_ALERT_DELIVERY = os.getenv('RISK_ALERT_DELIVERY', 'broadcast')
+# Fan risk alerts out on a background thread so the risk engine returns immediately
+RISK_ALERTS_IN_BACKGROUND = os.getenv('RISK_ALERTS_IN_BACKGROUND', 'False').lower() == 'true'
+# Notifications written from views: 'background' hands them to an in-process
+# worker through a durable MongoDB outbox (see notifications.dispatch),
+# 'inline' writes them before the response
+NOTIFICATION_DISPATCH = os.getenv('NOTIFICATION_DISPATCH', 'background')
+NOTIFICATION_QUEUE_SIZE = int(os.getenv('NOTIFICATION_QUEUE_SIZE', '1000'))
+# Seconds a view waits for queue space before writing its notifications itself
+NOTIFICATION_QUEUE_TIMEOUT = float(os.getenv('NOTIFICATION_QUEUE_TIMEOUT', '0.5'))
+# Notifications per insert_many, and seconds the worker gathers entries per flush
+NOTIFICATION_FLUSH_SIZE = int(os.getenv('NOTIFICATION_FLUSH_SIZE', '500'))
+NOTIFICATION_FLUSH_INTERVAL = float(os.getenv('NOTIFICATION_FLUSH_INTERVAL', '0.05'))
+# Seconds between the worker's sweeps for outbox entries abandoned by a crash
+# (0 leaves them to flush_notification_outbox), and the ages after which a
+# pending or a claimed entry counts as abandoned
+NOTIFICATION_OUTBOX_SWEEP_INTERVAL = int(os.getenv('NOTIFICATION_OUTBOX_SWEEP_INTERVAL', '60'))
+NOTIFICATION_OUTBOX_GRACE = int(os.getenv('NOTIFICATION_OUTBOX_GRACE', '60'))
+NOTIFICATION_OUTBOX_STALE = int(os.getenv('NOTIFICATION_OUTBOX_STALE', '300'))
+# Claims after which an undeliverable outbox entry is marked failed and no longer swept
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', '5'))
+# Seconds a user's broadcast region is cached for the unread badge (see notifications.broadcasts)
+NOTIFICATION_AUDIENCE_TTL = int(os.getenv('NOTIFICATION_AUDIENCE_TTL', '300'))
+# Seconds each process keeps its region -> doctors routing map (see doctors.routing)
+DOCTOR_ROUTING_TTL = int(os.getenv('DOCTOR_ROUTING_TTL', '300'))
+# Threads per process running independent dashboard queries concurrently
+# (see healthiq.concurrency); below 2 runs them one after another
+QUERY_FANOUT_WORKERS = int(os.getenv('QUERY_FANOUT_WORKERS', '8'))
+# Seconds before a dashboard snapshot is rebuilt on read (see analytics.snapshots)
+DASHBOARD_SNAPSHOT_MAX_AGE = int(os.getenv('DASHBOARD_SNAPSHOT_MAX_AGE', '300'))
+
 # Password validation (simplified for development)
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', 'OPTIONS': {'min_length': 8}},
@@ -120,17 +190,30 @@ AUTH_USER_MODEL = 'accounts.User'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'healthiq.renderers.ORJSONRenderer',
     ),
     'EXCEPTION_HANDLER': 'healthiq.exceptions.custom_exception_handler',
 }
 
+# 'wsgi' (gunicorn sync workers) or 'asgi' (uvicorn workers, see gunicorn.conf.py).
+# Under 'asgi' the read-heavy analytics, notification and dashboard endpoints
+# are served by async views on the async MongoDB client (see healthiq.async_api)
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+ASYNC_VIEWS = SERVER_MODE == 'asgi'
+
+# Keyset pagination of list endpoints, used when a request sends page_size or
+# cursor (see healthiq.pagination)
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '100'))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '500'))
+# Documents fetched per round trip by streamed list responses (?stream=json|ndjson)
+API_STREAM_BATCH_SIZE = int(os.getenv('API_STREAM_BATCH_SIZE', '500'))
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
@@ -144,6 +227,15 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
+# Seconds a user's is_active/role is cached for stateless JWT authentication
+# (see accounts.authentication); saving the user drops it sooner, in every
+# process with a shared cache, in the saving process only with 'locmem'
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '60'))
+# Token revocations (logout) reach every worker process only through a shared
+# cache. With 'locmem' each process keeps its own revocation list, so other
+# workers accept a revoked token until it expires (ACCESS_TOKEN_LIFETIME,
+# REFRESH_TOKEN_LIFETIME).
+AUTH_SHARED_CACHE = CACHE_BACKEND != 'locmem'
 
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
@@ -169,6 +261,10 @@ CORS_ALLOWED_ORIGIN_REGEXES = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Let the frontend read the pagination cursor and revalidate with conditional GETs
+CORS_EXPOSE_HEADERS = ['X-Next-Cursor', 'ETag', 'Last-Modified']
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match', 'if-modified-since')
+
 # CSRF Trusted Origins for production
 CSRF_TRUSTED_ORIGINS = []
 if FRONTEND_URL:
@@ -0,0 +1,264 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+from bson import ObjectId
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ParseError, PermissionDenied
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from .cache import cached_response, invalidate_namespace
+from .conditional import conditional_response
+from .pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, paginated_response
+
+
+def fake_collection(docs):
+    """Collection whose find().sort().limit() returns docs, recording the calls."""
+    collection = MagicMock()
+    cursor = collection.find.return_value
+    cursor.sort.return_value = cursor
+    cursor.batch_size.return_value = cursor
+    cursor.limit.side_effect = lambda n: docs[:n]
+    cursor.__iter__.side_effect = lambda: iter(docs)
+    return collection
+
+
+class CursorTests(SimpleTestCase):
+    """Keyset cursors resume right after the document they were made from."""
+    
+    def test_datetime_round_trip(self):
+        doc = {'_id': ObjectId(), 'created_at': datetime(2026, 2, 12, 9, 30, 15, 123000)}
+        query = decode_cursor(encode_cursor(doc, 'created_at'), 'created_at')
+        self.assertEqual(query, {'$or': [
+            {'created_at': {'$lt': doc['created_at']}},
+            {'created_at': doc['created_at'], '_id': {'$lt': doc['_id']}},
+            {'created_at': None},
+        ]})
+    
+    def test_string_round_trip(self):
+        doc = {'_id': ObjectId(), 'appointment_date': '2026-02-12'}
+        query = decode_cursor(encode_cursor(doc, 'appointment_date'), 'appointment_date')
+        self.assertEqual(query['$or'][0], {'appointment_date': {'$lt': '2026-02-12'}})
+    
+    def test_missing_value_only_continues_within_nulls(self):
+        doc = {'_id': ObjectId()}
+        query = decode_cursor(encode_cursor(doc, 'created_at'), 'created_at')
+        self.assertEqual(query, {'$or': [
+            {'created_at': {'$lt': None}},
+            {'created_at': None, '_id': {'$lt': doc['_id']}},
+        ]})
+    
+    def test_id_only_cursor(self):
+        doc = {'_id': ObjectId()}
+        self.assertEqual(decode_cursor(encode_cursor(doc, None), None), {'_id': {'$lt': doc['_id']}})
+    
+    def test_invalid_cursor_is_a_parse_error(self):
+        for cursor in ('not-base64!', 'e30=', encode_cursor({'_id': 'x'}, None)):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ParseError):
+                    decode_cursor(cursor, 'created_at')
+
+
+class PaginatedResponseTests(SimpleTestCase):
+    """Listings are paginated only when the client asks for pages."""
+    
+    def setUp(self):
+        self.docs = [{'_id': ObjectId(), 'n': n} for n in range(5)]
+        self.collection = fake_collection(self.docs)
+        self.factory = APIRequestFactory()
+    
+    def respond(self, params):
+        request = self.factory.get('/items', params)
+        return paginated_response(request, self.collection, {}, lambda doc: {'n': doc['n']})
+    
+    def test_without_page_params_returns_everything(self):
+        response = self.respond({})
+        self.assertEqual([item['n'] for item in response.data], [0, 1, 2, 3, 4])
+        self.assertNotIn(NEXT_CURSOR_HEADER, response)
+        self.collection.find.return_value.limit.assert_not_called()
+    
+    def test_page_size_sets_next_cursor(self):
+        response = self.respond({'page_size': 2})
+        self.assertEqual([item['n'] for item in response.data], [0, 1])
+        self.assertEqual(
+            decode_cursor(response[NEXT_CURSOR_HEADER], None),
+            {'_id': {'$lt': self.docs[1]['_id']}}
+        )
+        # One extra document tells whether there is a next page
+        self.collection.find.return_value.limit.assert_called_once_with(3)
+    
+    def test_last_page_has_no_cursor(self):
+        response = self.respond({'page_size': 5})
+        self.assertEqual(len(response.data), 5)
+        self.assertNotIn(NEXT_CURSOR_HEADER, response)
+    
+    def test_cursor_is_applied_to_the_query(self):
+        cursor = encode_cursor(self.docs[1], None)
+        self.respond({'cursor': cursor})
+        query = self.collection.find.call_args[0][0]
+        self.assertEqual(query, {'$and': [{}, {'_id': {'$lt': self.docs[1]['_id']}}]})
+    
+    @override_settings(API_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        self.respond({'page_size': 1000})
+        self.collection.find.return_value.limit.assert_called_once_with(4)
+    
+    def test_invalid_page_size(self):
+        with self.assertRaises(ParseError):
+            self.respond({'page_size': 'ten'})
+
+
+class StreamedResponseTests(SimpleTestCase):
+    """Whole listings stream only for the roles an endpoint allows."""
+    
+    def setUp(self):
+        self.docs = [{'_id': ObjectId(), 'n': n} for n in range(3)]
+        self.collection = fake_collection(self.docs)
+        self.cursor = self.collection.find.return_value
+        self.factory = APIRequestFactory()
+    
+    def respond(self, role, params=None, allow_stream=('doctor',)):
+        request = self.factory.get('/items', params or {'stream': 'ndjson'})
+        request.user = MagicMock(role=role)
+        return paginated_response(request, self.collection, {}, lambda doc: {'n': doc['n']}, allow_stream=allow_stream)
+    
+    def test_streams_for_allowed_roles(self):
+        response = self.respond('doctor')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(b''.join(response.streaming_content), b'{"n":0}\n{"n":1}\n{"n":2}\n')
+    
+    def test_other_roles_are_denied(self):
+        with self.assertRaises(PermissionDenied):
+            self.respond('patient')
+    
+    def test_ignored_without_allow_stream(self):
+        response = self.respond('doctor', allow_stream=())
+        self.assertEqual([item['n'] for item in response.data], [0, 1, 2])
+    
+    def test_invalid_format(self):
+        with self.assertRaises(ParseError):
+            self.respond('doctor', {'stream': 'xml'})
+    
+    def test_closing_an_unread_response_closes_the_cursor(self):
+        self.respond('doctor').close()
+        self.cursor.close.assert_called_once()
+    
+    @override_settings(ASYNC_VIEWS=True)
+    def test_async_stream_closes_the_cursor(self):
+        response = self.respond('doctor', {'stream': 'json'})
+        self.assertTrue(response.is_async)
+        response.close()
+        self.cursor.close.assert_called_once()
+
+
+class ConditionalResponseTests(SimpleTestCase):
+    """Conditional GETs are answered from the watermark alone."""
+    
+    def setUp(self):
+        self.calls = 0
+        self.watermark = (datetime(2026, 2, 12, 9, 30), 1)
+        self.factory = APIRequestFactory()
+        
+        @api_view(['GET'])
+        @permission_classes([AllowAny])
+        @conditional_response(lambda request: self.watermark)
+        def view(request):
+            self.calls += 1
+            return Response({'calls': self.calls})
+        self.view = view
+    
+    def test_sets_validators(self):
+        response = self.view(self.factory.get('/stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertEqual(response['Last-Modified'], 'Thu, 12 Feb 2026 09:30:00 GMT')
+        self.assertIn('no-cache', response['Cache-Control'])
+    
+    def test_matching_etag_is_not_modified(self):
+        etag = self.view(self.factory.get('/stats'))['ETag']
+        response = self.view(self.factory.get('/stats', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.calls, 1)
+    
+    def test_new_watermark_changes_etag(self):
+        etag = self.view(self.factory.get('/stats'))['ETag']
+        self.watermark = (datetime(2026, 2, 12, 10, 0), 2)
+        response = self.view(self.factory.get('/stats', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_etag_depends_on_query_params(self):
+        etag = self.view(self.factory.get('/stats'))['ETag']
+        response = self.view(self.factory.get('/stats', {'region': 'Coimbatore'}, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+    
+    def test_if_modified_since(self):
+        response = self.view(self.factory.get('/stats', HTTP_IF_MODIFIED_SINCE='Thu, 12 Feb 2026 09:30:00 GMT'))
+        self.assertEqual(response.status_code, 304)
+        response = self.view(self.factory.get('/stats', HTTP_IF_MODIFIED_SINCE='Thu, 12 Feb 2026 09:29:59 GMT'))
+        self.assertEqual(response.status_code, 200)
+
+
+class CachedResponseTests(SimpleTestCase):
+    """Cached responses are reused until their namespace is invalidated."""
+    
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.status = 200
+        self.factory = APIRequestFactory()
+        
+        @api_view(['GET'])
+        @permission_classes([AllowAny])
+        @cached_response('tests')
+        def view(request):
+            self.calls += 1
+            return Response({'calls': self.calls}, status=self.status)
+        self.view = view
+    
+    def test_second_request_is_served_from_cache(self):
+        self.view(self.factory.get('/stats'))
+        response = self.view(self.factory.get('/stats'))
+        self.assertEqual(response.data, {'calls': 1})
+        self.assertEqual(self.calls, 1)
+    
+    def test_invalidate_namespace_drops_entries(self):
+        self.view(self.factory.get('/stats'))
+        invalidate_namespace('tests')
+        response = self.view(self.factory.get('/stats'))
+        self.assertEqual(response.data, {'calls': 2})
+    
+    def test_invalidate_before_first_use(self):
+        invalidate_namespace('tests')
+        self.view(self.factory.get('/stats'))
+        self.view(self.factory.get('/stats'))
+        self.assertEqual(self.calls, 1)
+    
+    def test_query_params_are_part_of_the_key(self):
+        self.view(self.factory.get('/stats', {'region': 'Coimbatore'}))
+        self.view(self.factory.get('/stats', {'region': 'Chennai_South'}))
+        self.assertEqual(self.calls, 2)
+    
+    def test_errors_are_not_cached(self):
+        self.status = 500
+        self.view(self.factory.get('/stats'))
+        self.view(self.factory.get('/stats'))
+        self.assertEqual(self.calls, 2)
+    
+    def test_watermark_is_part_of_the_key(self):
+        watermark = [(None, 1)]
+        
+        @api_view(['GET'])
+        @permission_classes([AllowAny])
+        @conditional_response(lambda request: watermark[0])
+        @cached_response('tests')
+        def view(request):
+            self.calls += 1
+            return Response({'calls': self.calls})
+        
+        view(self.factory.get('/stats'))
+        # Another process changed the data without invalidating this cache
+        watermark[0] = (None, 2)
+        response = view(self.factory.get('/stats'))
+        self.assertEqual(response.data, {'calls': 2})
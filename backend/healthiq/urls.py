@@ -2,6 +2,7 @@
 URL configuration for HealthIQ project.
 Regional Health Intelligence & Emergency Medical System
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.decorators import api_view, permission_classes
@@ -40,7 +41,10 @@ def api_root(request):
 
 # Import views directly for specific endpoints
 from patients.views import add_medical_record
-from analytics.views import admin_risk_overview
+if settings.ASYNC_VIEWS:
+    from analytics.async_views import admin_risk_overview
+else:
+    from analytics.views import admin_risk_overview
 
 urlpatterns = [
     # Root
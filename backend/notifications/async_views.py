@@ -0,0 +1,51 @@
+"""
+Async ports of the notification reads, served under ASGI (settings.ASYNC_VIEWS).
+
+Same endpoints and payloads as notifications.views; the unread badge and
+the notification list are the most frequently polled endpoints.
+"""
+
+from healthiq.async_api import AsyncResponse, async_api_view
+from healthiq.conditional import conditional_response, latest
+from healthiq.mongodb import get_async_collection, Collections
+from .broadcasts import afind_region_broadcasts, aget_user_audience, aget_user_region
+from .counters import aget_counter_watermarks, aget_unread_count
+from .views import merge_broadcasts, serialize_mongo_doc
+
+
+async def notifications_watermark(request):
+    """Version of the user's notification list, from its unread counters."""
+    region = await aget_user_region(request.user)
+    watermarks = await aget_counter_watermarks(request.user.id, region)
+    return latest(*watermarks.values()), (request.user.id, region, sorted(watermarks.items()))
+
+
+@async_api_view(['GET'])
+@conditional_response(notifications_watermark)
+async def get_notifications(request):
+    """Get notifications for the current user."""
+    user_notifications = await (
+        get_async_collection(Collections.NOTIFICATIONS)
+        .find({'user_id': request.user.id})
+        .sort('created_at', -1)
+        .limit(50)
+        .to_list()
+    )
+    
+    # Merge in broadcasts addressed to the user's region
+    region, joined_id = await aget_user_audience(request.user)
+    if region:
+        user_notifications = merge_broadcasts(
+            user_notifications, await afind_region_broadcasts(region, request.user.id, joined_id=joined_id)
+        )
+    
+    return AsyncResponse([serialize_mongo_doc(n) for n in user_notifications])
+
+
+@async_api_view(['GET'])
+async def unread_count(request):
+    """Get count of unread notifications."""
+    region, joined_id = await aget_user_audience(request.user)
+    count = await aget_unread_count(request.user.id, region, joined_id)
+    
+    return AsyncResponse({'count': count})
@@ -0,0 +1,256 @@
+"""
+Regional broadcast notifications.
+
+A broadcast is stored once per region in the notifications collection
+(audience='region') instead of being copied to every user in the region.
+Read state is kept per user in notification_receipts, and the views merge
+broadcasts with personal notifications at query time. Broadcasts sent
+before a user registered (older than their profile document) count as
+read for that user.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from django.conf import settings
+from django.core.cache import cache
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from healthiq.mongodb import get_async_collection, get_collection, Collections
+from .counters import increment_broadcasts_read, increment_region_broadcasts
+
+
+AUDIENCE_REGION = 'region'
+
+# Days a broadcast counts as an active alert on the admin overview
+ACTIVE_BROADCAST_DAYS = 7
+
+
+def broadcast_query(region: str) -> Dict:
+    """Filter matching every broadcast addressed to a region."""
+    return {'audience': AUDIENCE_REGION, 'region': region}
+
+
+def active_broadcasts_query() -> Dict:
+    """Filter matching the broadcasts of the last ACTIVE_BROADCAST_DAYS days."""
+    since = datetime.utcnow() - timedelta(days=ACTIVE_BROADCAST_DAYS)
+    return {'audience': AUDIENCE_REGION, 'created_at': {'$gte': since}}
+
+
+def _sent_before(broadcast: Dict, joined_id: Optional[ObjectId]) -> bool:
+    """Whether a broadcast was sent before the profile joined_id was created."""
+    return joined_id is not None and broadcast['_id'] < joined_id
+
+
+def create_region_broadcast(region: str, notification: Dict) -> ObjectId:
+    """Store one notification for every user in a region."""
+    notifications = get_collection(Collections.NOTIFICATIONS)
+    doc = {
+        **notification,
+        'audience': AUDIENCE_REGION,
+        'region': region,
+        'created_at': notification.get('created_at') or datetime.utcnow()
+    }
+    inserted_id = notifications.insert_one(doc).inserted_id
+    increment_region_broadcasts(region)
+    return inserted_id
+
+
+# Profile collection holding the region of each role that receives broadcasts.
+# Risk alerts were only ever sent to a region's patients.
+PROFILE_COLLECTIONS = {
+    'patient': Collections.PATIENTS,
+}
+
+
+def _audience_key(user_id) -> str:
+    return f'notifications:audience:{user_id}'
+
+
+def _audience(profile: Optional[Dict]) -> Tuple[Optional[str], Optional[ObjectId]]:
+    if not profile or not profile.get('region'):
+        return None, None
+    return profile['region'], profile['_id']
+
+
+def get_user_audience(user) -> Tuple[Optional[str], Optional[ObjectId]]:
+    """
+    Region whose broadcasts a user receives (patients only).
+    
+    Cached for NOTIFICATION_AUDIENCE_TTL seconds, so the polled unread badge
+    costs only its counters read; invalidate_user_audience drops it when the
+    profile's region changes.
+    
+    Returns:
+        (region, profile _id). Broadcasts older than the profile were sent
+        before the user registered. (None, None) without a region.
+    """
+    if user.role not in PROFILE_COLLECTIONS:
+        return None, None
+    
+    audience = cache.get(_audience_key(user.id))
+    if audience is None:
+        audience = _audience(get_collection(PROFILE_COLLECTIONS[user.role]).find_one(
+            {'user_id': user.id}, {'region': 1}
+        ))
+        cache.set(_audience_key(user.id), audience, timeout=settings.NOTIFICATION_AUDIENCE_TTL)
+    return audience
+
+
+async def aget_user_audience(user) -> Tuple[Optional[str], Optional[ObjectId]]:
+    """Async get_user_audience."""
+    if user.role not in PROFILE_COLLECTIONS:
+        return None, None
+    
+    audience = await cache.aget(_audience_key(user.id))
+    if audience is None:
+        audience = _audience(await get_async_collection(PROFILE_COLLECTIONS[user.role]).find_one(
+            {'user_id': user.id}, {'region': 1}
+        ))
+        await cache.aset(_audience_key(user.id), audience, timeout=settings.NOTIFICATION_AUDIENCE_TTL)
+    return audience
+
+
+def invalidate_user_audience(user_id):
+    """Drop the cached region of a user after their profile's region changed."""
+    cache.delete(_audience_key(user_id))
+
+
+def get_user_region(user) -> Optional[str]:
+    """Region whose broadcasts a user receives (patients only)."""
+    return get_user_audience(user)[0]
+
+
+async def aget_user_region(user) -> Optional[str]:
+    """Async get_user_region."""
+    return (await aget_user_audience(user))[0]
+
+
+def find_region_broadcasts(
+    region: str,
+    user_id: int,
+    extra_query: Dict = None,
+    limit: int = 50,
+    joined_id: Optional[ObjectId] = None
+) -> List[Dict]:
+    """Latest broadcasts of a region, with is_read resolved for the user (joined_id: see get_user_audience)."""
+    notifications = get_collection(Collections.NOTIFICATIONS)
+    receipts = get_collection(Collections.NOTIFICATION_RECEIPTS)
+    
+    broadcasts = list(
+        notifications.find({**broadcast_query(region), **(extra_query or {})})
+        .sort('created_at', -1)
+        .limit(limit)
+    )
+    if not broadcasts:
+        return []
+    
+    read_ids = {
+        r['notification_id'] for r in receipts.find(
+            _receipts_query(broadcasts, user_id), {'notification_id': 1, '_id': 0}
+        )
+    }
+    return _resolve_read_state(broadcasts, user_id, read_ids, joined_id)
+
+
+async def afind_region_broadcasts(
+    region: str,
+    user_id: int,
+    extra_query: Dict = None,
+    limit: int = 50,
+    joined_id: Optional[ObjectId] = None
+) -> List[Dict]:
+    """Async find_region_broadcasts."""
+    notifications = get_async_collection(Collections.NOTIFICATIONS)
+    receipts = get_async_collection(Collections.NOTIFICATION_RECEIPTS)
+    
+    broadcasts = await notifications.find(
+        {**broadcast_query(region), **(extra_query or {})}
+    ).sort('created_at', -1).limit(limit).to_list()
+    if not broadcasts:
+        return []
+    
+    read_ids = {
+        r['notification_id'] async for r in receipts.find(
+            _receipts_query(broadcasts, user_id), {'notification_id': 1, '_id': 0}
+        )
+    }
+    return _resolve_read_state(broadcasts, user_id, read_ids, joined_id)
+
+
+def _receipts_query(broadcasts: List[Dict], user_id: int) -> Dict:
+    """Filter matching the user's receipts for the given broadcasts."""
+    return {'user_id': user_id, 'notification_id': {'$in': [b['_id'] for b in broadcasts]}}
+
+
+def _resolve_read_state(broadcasts: List[Dict], user_id: int, read_ids, joined_id: Optional[ObjectId] = None) -> List[Dict]:
+    """Address broadcasts to the user, with is_read from their receipts."""
+    for broadcast in broadcasts:
+        broadcast['user_id'] = user_id
+        broadcast['is_read'] = broadcast['_id'] in read_ids or _sent_before(broadcast, joined_id)
+    return broadcasts
+
+
+def mark_broadcast_read(
+    notification_id: ObjectId,
+    user_id: int,
+    region: str,
+    joined_id: Optional[ObjectId] = None
+) -> Optional[Dict]:
+    """
+    Record that the user read a broadcast of their region (idempotent).
+    
+    Returns:
+        The broadcast, or None if it is not addressed to the region
+    """
+    notifications = get_collection(Collections.NOTIFICATIONS)
+    receipts = get_collection(Collections.NOTIFICATION_RECEIPTS)
+    
+    broadcast = notifications.find_one({'_id': notification_id, **broadcast_query(region)})
+    if not broadcast:
+        return None
+    
+    # Broadcasts sent before the user registered already count as read
+    if not _sent_before(broadcast, joined_id):
+        try:
+            receipts.insert_one({
+                'user_id': user_id,
+                'notification_id': notification_id,
+                'region': region,
+                'read_at': datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            pass
+        else:
+            increment_broadcasts_read(user_id, region)
+    
+    broadcast['user_id'] = user_id
+    broadcast['is_read'] = True
+    return broadcast
+
+
+def mark_all_broadcasts_read(region: str, user_id: int, joined_id: Optional[ObjectId] = None) -> int:
+    """Record receipts for every unread broadcast of a region. Returns how many."""
+    notifications = get_collection(Collections.NOTIFICATIONS)
+    receipts = get_collection(Collections.NOTIFICATION_RECEIPTS)
+    
+    read_ids = receipts.distinct('notification_id', {'user_id': user_id, 'region': region})
+    ids = {'$nin': read_ids}
+    if joined_id is not None:
+        ids['$gte'] = joined_id
+    unread = notifications.find({**broadcast_query(region), '_id': ids}, {'_id': 1})
+    
+    now = datetime.utcnow()
+    new_receipts = [
+        {'user_id': user_id, 'notification_id': b['_id'], 'region': region, 'read_at': now}
+        for b in unread
+    ]
+    if not new_receipts:
+        return 0
+    
+    try:
+        marked = len(receipts.insert_many(new_receipts, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        # Receipts written concurrently by another request already count as read
+        marked = e.details.get('nInserted', 0)
+    increment_broadcasts_read(user_id, region, marked)
+    return marked
@@ -0,0 +1,299 @@
+"""
+Maintained unread-notification counters.
+
+One small document per user and per region in notification_counters:
+    {'_id': 'user:<id>', 'unread': n, 'broadcasts_read': {<region>: n},
+     'broadcasts_before_join': {<region>: n}, 'updated_at': ...}
+    {'_id': 'region:<region>', 'broadcasts': n, 'updated_at': ...}
+
+broadcasts_before_join holds the broadcasts a region had sent before the
+user registered and that the user has no receipt for. They count as read
+(see notifications.broadcasts), so they are subtracted from the unread
+badge. The number is computed once per user and region, on first poll.
+
+The counters are adjusted on every insert and read, so the unread badge
+is one keyed read of the user's and their region's counters (the region
+itself is cached, see get_user_audience) instead of a count over
+notifications. Drift (from crashes or writes that bypass these helpers)
+is repaired by the reconcile_notification_counters command.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional
+from asgiref.sync import sync_to_async
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from healthiq.mongodb import get_async_collection, get_collection, Collections
+
+
+# Counter corrections per bulk_write of reconcile_all
+RECONCILE_BATCH_SIZE = 1000
+
+
+def user_key(user_id) -> str:
+    return f'user:{user_id}'
+
+
+def region_key(region: str) -> str:
+    return f'region:{region}'
+
+
+def increment_unread(user_ids: Iterable):
+    """Add one unread notification per occurrence of each user id."""
+    counts = Counter(user_ids)
+    if not counts:
+        return
+    
+    now = datetime.utcnow()
+    get_collection(Collections.NOTIFICATION_COUNTERS).bulk_write([
+        UpdateOne(
+            {'_id': user_key(user_id)},
+            {'$inc': {'unread': n}, '$set': {'updated_at': now}},
+            upsert=True
+        )
+        for user_id, n in counts.items()
+    ], ordered=False)
+
+
+def decrement_unread(user_id, n: int = 1):
+    """Remove n unread notifications of a user."""
+    if n <= 0:
+        return
+    get_collection(Collections.NOTIFICATION_COUNTERS).update_one(
+        {'_id': user_key(user_id)},
+        {'$inc': {'unread': -n}, '$set': {'updated_at': datetime.utcnow()}}
+    )
+
+
+def increment_region_broadcasts(region: str):
+    """Count a new broadcast addressed to a region."""
+    get_collection(Collections.NOTIFICATION_COUNTERS).update_one(
+        {'_id': region_key(region)},
+        {'$inc': {'broadcasts': 1}, '$set': {'updated_at': datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def increment_broadcasts_read(user_id, region: str, n: int = 1):
+    """Count broadcasts of a region the user has read."""
+    if n <= 0:
+        return
+    get_collection(Collections.NOTIFICATION_COUNTERS).update_one(
+        {'_id': user_key(user_id)},
+        {'$inc': {f'broadcasts_read.{region}': n}, '$set': {'updated_at': datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def _counter_keys(user_id, region: str = None) -> list:
+    """Counter ids read for a user: theirs and their region's."""
+    return [user_key(user_id)] + ([region_key(region)] if region else [])
+
+
+def _unread_from_counters(user_counter: dict, docs: dict, region: str = None) -> int:
+    count = max(0, user_counter.get('unread', 0))
+    if region:
+        broadcasts = docs.get(region_key(region), {}).get('broadcasts', 0)
+        read = user_counter.get('broadcasts_read', {}).get(region, 0)
+        before_join = user_counter.get('broadcasts_before_join', {}).get(region, 0)
+        count += max(0, broadcasts - read - before_join)
+    return count
+
+
+def _needs_before_join(user_counter: dict, region: Optional[str], joined_id: Optional[ObjectId]) -> bool:
+    return bool(region) and joined_id is not None and region not in user_counter.get('broadcasts_before_join', {})
+
+
+def count_broadcasts_before_join(user_counter: dict, user_id, region: str, joined_id: ObjectId) -> dict:
+    """Store how many broadcasts the region sent before the user registered that they have not read."""
+    before = {'$lt': joined_id}
+    n = get_collection(Collections.NOTIFICATIONS).count_documents(
+        {'audience': 'region', 'region': region, '_id': before}
+    ) - get_collection(Collections.NOTIFICATION_RECEIPTS).count_documents(
+        {'user_id': user_id, 'region': region, 'notification_id': before}
+    )
+    n = max(0, n)
+    
+    get_collection(Collections.NOTIFICATION_COUNTERS).update_one(
+        {'_id': user_key(user_id)},
+        {'$set': {f'broadcasts_before_join.{region}': n, 'updated_at': datetime.utcnow()}},
+        upsert=True
+    )
+    return {**user_counter, 'broadcasts_before_join': {**user_counter.get('broadcasts_before_join', {}), region: n}}
+
+
+def get_unread_count(user_id, region: str = None, joined_id: Optional[ObjectId] = None) -> int:
+    """
+    Unread personal notifications plus unread broadcasts of the user's region.
+    
+    Args:
+        user_id: The user
+        region: The user's region, if they receive broadcasts
+        joined_id: The user's profile _id (see notifications.broadcasts.get_user_audience)
+    """
+    counters = get_collection(Collections.NOTIFICATION_COUNTERS)
+    docs = {doc['_id']: doc for doc in counters.find({'_id': {'$in': _counter_keys(user_id, region)}})}
+    
+    user_counter = docs.get(user_key(user_id))
+    if user_counter is None:
+        # First poll by this user since counters were introduced
+        user_counter = reconcile_user(user_id)
+    if _needs_before_join(user_counter, region, joined_id):
+        user_counter = count_broadcasts_before_join(user_counter, user_id, region, joined_id)
+    return _unread_from_counters(user_counter, docs, region)
+
+
+async def aget_unread_count(user_id, region: str = None, joined_id: Optional[ObjectId] = None) -> int:
+    """Async get_unread_count; a first-poll reconcile runs on a worker thread."""
+    counters = get_async_collection(Collections.NOTIFICATION_COUNTERS)
+    docs = {doc['_id']: doc async for doc in counters.find({'_id': {'$in': _counter_keys(user_id, region)}})}
+    
+    user_counter = docs.get(user_key(user_id))
+    if user_counter is None:
+        user_counter = await sync_to_async(reconcile_user, thread_sensitive=False)(user_id)
+    if _needs_before_join(user_counter, region, joined_id):
+        user_counter = await sync_to_async(count_broadcasts_before_join, thread_sensitive=False)(
+            user_counter, user_id, region, joined_id
+        )
+    return _unread_from_counters(user_counter, docs, region)
+
+
+def get_counter_watermarks(user_id, region: str = None) -> dict:
+    """
+    updated_at of the user's counter and of the region's broadcast counter.
+    
+    Every write that changes what the user's notification list shows
+    touches one of these, so together they version that list.
+    """
+    return {
+        doc['_id']: doc.get('updated_at')
+        for doc in get_collection(Collections.NOTIFICATION_COUNTERS).find(
+            {'_id': {'$in': _counter_keys(user_id, region)}}, {'updated_at': 1}
+        )
+    }
+
+
+async def aget_counter_watermarks(user_id, region: str = None) -> dict:
+    """Async get_counter_watermarks."""
+    return {
+        doc['_id']: doc.get('updated_at')
+        async for doc in get_async_collection(Collections.NOTIFICATION_COUNTERS).find(
+            {'_id': {'$in': _counter_keys(user_id, region)}}, {'updated_at': 1}
+        )
+    }
+
+
+def reconcile_user(user_id) -> dict:
+    """
+    Create a user's missing counter from the source collections.
+    
+    A counter created meanwhile (by a concurrent increment) is kept and
+    returned as is; reconcile_all corrects it if it drifted.
+    """
+    notifications = get_collection(Collections.NOTIFICATIONS)
+    receipts = get_collection(Collections.NOTIFICATION_RECEIPTS)
+    
+    unread = notifications.count_documents({'user_id': user_id, 'is_read': False})
+    broadcasts_read = {
+        doc['_id']: doc['count'] for doc in receipts.aggregate([
+            {'$match': {'user_id': user_id}},
+            {'$group': {'_id': '$region', 'count': {'$sum': 1}}}
+        ])
+    }
+    
+    counter = {'unread': unread, 'broadcasts_read': broadcasts_read, 'updated_at': datetime.utcnow()}
+    return get_collection(Collections.NOTIFICATION_COUNTERS).find_one_and_update(
+        {'_id': user_key(user_id)},
+        {'$setOnInsert': counter},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _counter_fields(key: str, doc: dict) -> dict:
+    """A counter's counts by field path, e.g. {'unread': 2, 'broadcasts_read.Chennai_South': 1}."""
+    if key.startswith('region:'):
+        return {'broadcasts': doc.get('broadcasts', 0)}
+    fields = {'unread': doc.get('unread', 0)}
+    for region, n in (doc.get('broadcasts_read') or {}).items():
+        fields[f'broadcasts_read.{region}'] = n
+    return fields
+
+
+def _source_counts() -> dict:
+    """What every counter should hold, by counter id and field path, from the source collections."""
+    notifications = get_collection(Collections.NOTIFICATIONS)
+    receipts = get_collection(Collections.NOTIFICATION_RECEIPTS)
+    counts = {}
+    
+    for doc in notifications.aggregate([
+        {'$match': {'is_read': False, 'user_id': {'$exists': True}}},
+        {'$group': {'_id': '$user_id', 'count': {'$sum': 1}}}
+    ]):
+        counts.setdefault(user_key(doc['_id']), {'unread': 0})['unread'] = doc['count']
+    
+    for doc in receipts.aggregate([
+        {'$group': {'_id': {'user_id': '$user_id', 'region': '$region'}, 'count': {'$sum': 1}}}
+    ]):
+        fields = counts.setdefault(user_key(doc['_id']['user_id']), {'unread': 0})
+        fields[f'broadcasts_read.{doc["_id"]["region"]}'] = doc['count']
+    
+    for doc in notifications.aggregate([
+        {'$match': {'audience': 'region'}},
+        {'$group': {'_id': '$region', 'count': {'$sum': 1}}}
+    ]):
+        counts[region_key(doc['_id'])] = {'broadcasts': doc['count']}
+    
+    return counts
+
+
+def reconcile_all() -> int:
+    """
+    Correct every counter that drifted from the source collections.
+    
+    Counters are read before the sources are counted, and each is corrected
+    with an $inc of the difference only if it is unchanged since it was read
+    (same updated_at). Increments from live writes are therefore never
+    overwritten; a counter that moved meanwhile is left for the next run.
+    Counters with nothing left to count are brought back to zero the same way.
+    
+    Returns:
+        Number of counters corrected or created
+    """
+    counters = get_collection(Collections.NOTIFICATION_COUNTERS)
+    observed = {
+        doc['_id']: doc for doc in counters.find(
+            {}, {'unread': 1, 'broadcasts_read': 1, 'broadcasts': 1, 'updated_at': 1}
+        )
+    }
+    expected = _source_counts()
+    
+    now = datetime.utcnow()
+    operations = []
+    for key in observed.keys() | expected.keys():
+        counts = expected.get(key, {})
+        if key not in observed:
+            # Created with the full counts, unless a live write creates it first
+            operations.append(UpdateOne(
+                {'_id': key}, {'$setOnInsert': {**counts, 'updated_at': now}}, upsert=True
+            ))
+            continue
+        
+        current = _counter_fields(key, observed[key])
+        drift = {
+            field: counts.get(field, 0) - current.get(field, 0)
+            for field in current.keys() | counts.keys()
+        }
+        drift = {field: n for field, n in drift.items() if n}
+        if drift:
+            operations.append(UpdateOne(
+                {'_id': key, 'updated_at': observed[key].get('updated_at')},
+                {'$inc': drift, '$set': {'updated_at': now}}
+            ))
+    
+    corrected = 0
+    for start in range(0, len(operations), RECONCILE_BATCH_SIZE):
+        result = counters.bulk_write(operations[start:start + RECONCILE_BATCH_SIZE], ordered=False)
+        corrected += result.modified_count + result.upserted_count
+    return corrected
@@ -0,0 +1,318 @@
+"""
+Background dispatch of request-path notifications.
+
+Views hand their notifications to dispatch_notifications or
+dispatch_to_role, which store a single entry in notification_outbox and
+queue its id for an in-process worker thread. The worker claims queued
+entries, expands them to one notification per recipient and writes them
+with batched insert_many flushes, then deletes the entries. A request
+therefore costs one outbox write however many users it notifies.
+
+Backpressure: the queue holds at most NOTIFICATION_QUEUE_SIZE entries.
+When it stays full for NOTIFICATION_QUEUE_TIMEOUT seconds the caller
+delivers its own entry, so a lagging worker slows producers down instead
+of growing memory.
+
+Durability: an entry stays in the outbox until its notifications are
+written. Entries left behind by a crash are replayed by the worker, which
+sweeps the outbox when it starts and every
+NOTIFICATION_OUTBOX_SWEEP_INTERVAL seconds, and by the
+flush_notification_outbox command. Each gunicorn worker starts its
+dispatch worker once the app is loaded (see gunicorn.conf.py). Claims are
+conditional, so concurrent sweeps never deliver an entry twice, and
+notification ids are derived from the entry id, so a replay never writes
+a notification twice. An entry still undelivered after
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS claims is marked failed and no longer
+swept; it stays in the outbox for inspection, and setting its status back
+to pending (with attempts 0) queues it for the next sweep.
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+from bson import ObjectId
+from django.conf import settings
+from healthiq.mongodb import get_collection, Collections
+from .services import create_notifications
+
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PENDING = 'pending'
+OUTBOX_SENDING = 'sending'
+OUTBOX_FAILED = 'failed'
+
+# Outbox entries claimed per round by flush_notification_outbox
+RECOVERY_BATCH_SIZE = 100
+
+_queue = None
+_worker = None
+_lock = threading.Lock()
+
+
+def _notification_id(outbox_id: ObjectId, key) -> ObjectId:
+    """Stable notification id: the entry's timestamp followed by a hash of key."""
+    digest = hashlib.sha1(f'{outbox_id}:{key}'.encode()).digest()
+    return ObjectId(outbox_id.binary[:4] + digest[:8])
+
+
+def expand_entry(entry: Dict) -> Iterator[Dict]:
+    """Notifications of an outbox entry, one per recipient."""
+    if 'notifications' in entry:
+        for i, notification in enumerate(entry['notifications']):
+            yield {'_id': _notification_id(entry['_id'], i), **notification}
+        return
+    
+    user_ids = entry.get('user_ids')
+    if user_ids is None:
+        from accounts.models import User
+        user_ids = User.objects.filter(role=entry['role']).order_by('id').values_list('id', flat=True).iterator()
+    for user_id in user_ids:
+        yield {
+            '_id': _notification_id(entry['_id'], f'user:{user_id}'),
+            'user_id': user_id,
+            **entry['template']
+        }
+
+
+def claim_entries(query: Dict) -> List[Dict]:
+    """Mark the outbox entries matching query as being sent and return them."""
+    outbox = get_collection(Collections.NOTIFICATION_OUTBOX)
+    claim = ObjectId()
+    outbox.update_many(query, {
+        '$set': {'status': OUTBOX_SENDING, 'claim': claim, 'claimed_at': datetime.utcnow()},
+        '$inc': {'attempts': 1}
+    })
+    return list(outbox.find({'claim': claim}))
+
+
+def deliver_entries(entries: Iterable[Dict]) -> int:
+    """
+    Write the notifications of claimed entries and drop the entries.
+    
+    Returns:
+        Number of notifications written
+    """
+    entries = list(entries)
+    notifications = (n for entry in entries for n in expand_entry(entry))
+    
+    written = 0
+    while True:
+        batch = list(islice(notifications, settings.NOTIFICATION_FLUSH_SIZE))
+        if not batch:
+            break
+        written += create_notifications(batch)
+    
+    if entries:
+        get_collection(Collections.NOTIFICATION_OUTBOX).delete_many(
+            {'_id': {'$in': [entry['_id'] for entry in entries]}}
+        )
+    return written
+
+
+def _sweep_outbox():
+    """Deliver abandoned outbox entries, logging instead of raising."""
+    try:
+        written = recover_outbox(settings.NOTIFICATION_OUTBOX_GRACE, settings.NOTIFICATION_OUTBOX_STALE)
+    except Exception:
+        logger.exception('Notification outbox sweep failed')
+        return
+    if written:
+        logger.info('Delivered %d notifications left in the outbox', written)
+
+
+def _run_worker(work_queue: queue.Queue):
+    """
+    Deliver queued entries, gathering up to one flush interval of them per round.
+    
+    Between rounds, sweeps the outbox every NOTIFICATION_OUTBOX_SWEEP_INTERVAL
+    seconds, starting with a sweep as soon as it runs.
+    """
+    sweep_interval = settings.NOTIFICATION_OUTBOX_SWEEP_INTERVAL
+    next_sweep = time.monotonic()
+    stopping = False
+    while not stopping:
+        if sweep_interval > 0 and time.monotonic() >= next_sweep:
+            _sweep_outbox()
+            next_sweep = time.monotonic() + sweep_interval
+        wait = max(0, next_sweep - time.monotonic()) if sweep_interval > 0 else None
+        try:
+            ids = [work_queue.get(timeout=wait)]
+        except queue.Empty:
+            continue
+        deadline = time.monotonic() + settings.NOTIFICATION_FLUSH_INTERVAL
+        while len(ids) < settings.NOTIFICATION_FLUSH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                ids.append(work_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        
+        if None in ids:
+            stopping = True
+            ids = [i for i in ids if i is not None]
+        if not ids:
+            continue
+        
+        try:
+            deliver_entries(claim_entries({'_id': {'$in': ids}, 'status': OUTBOX_PENDING}))
+        except Exception:
+            # The entries stay in the outbox for flush_notification_outbox
+            logger.exception('Notification dispatch failed for %d outbox entries', len(ids))
+
+
+def _get_queue() -> queue.Queue:
+    """The process's dispatch queue, starting its worker on first use."""
+    global _queue, _worker
+    with _lock:
+        if _worker is None:
+            _queue = queue.Queue(maxsize=settings.NOTIFICATION_QUEUE_SIZE)
+            _worker = threading.Thread(
+                target=_run_worker, args=(_queue,), name='notification-dispatch', daemon=True
+            )
+            _worker.start()
+    return _queue
+
+
+def start():
+    """Start the process's worker now rather than on the first dispatch, so it sweeps the outbox."""
+    _get_queue()
+
+
+def shutdown(timeout: float = 5.0):
+    """Let the worker deliver what is queued, waiting at most timeout seconds."""
+    global _queue, _worker
+    with _lock:
+        work_queue, worker = _queue, _worker
+        _queue = _worker = None
+    if worker is not None:
+        try:
+            work_queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        worker.join(timeout)
+
+
+def _reset_after_fork():
+    """The worker thread does not survive a fork; the child starts its own."""
+    global _queue, _worker
+    _queue = None
+    _worker = None
+
+
+atexit.register(shutdown)
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _enqueue(entry: Dict) -> ObjectId:
+    """Store an entry in the outbox and hand it to the worker."""
+    entry.update({'status': OUTBOX_PENDING, 'attempts': 0, 'created_at': datetime.utcnow()})
+    entry['_id'] = get_collection(Collections.NOTIFICATION_OUTBOX).insert_one(entry).inserted_id
+    
+    if settings.NOTIFICATION_DISPATCH == 'background':
+        try:
+            _get_queue().put(entry['_id'], timeout=settings.NOTIFICATION_QUEUE_TIMEOUT)
+            return entry['_id']
+        except queue.Full:
+            # Backpressure: the worker is behind, deliver on the caller's thread
+            pass
+    
+    deliver_entries(claim_entries({'_id': entry['_id'], 'status': OUTBOX_PENDING}))
+    return entry['_id']
+
+
+def dispatch_notifications(notification_list: List[Dict]) -> Optional[ObjectId]:
+    """
+    Deliver personal notifications (each with its user_id) in the background.
+    
+    Returns:
+        The outbox entry id, or None if there was nothing to send
+    """
+    if not notification_list:
+        return None
+    return _enqueue({'notifications': notification_list})
+
+
+def dispatch_to_users(user_ids: List[int], template: Dict) -> Optional[ObjectId]:
+    """
+    Deliver the same notification to each of the given users in the background.
+    
+    Returns:
+        The outbox entry id, or None if there was nobody to notify
+    """
+    if not user_ids:
+        return None
+    return _enqueue({'user_ids': list(user_ids), 'template': template})
+
+
+def dispatch_to_role(role: str, template: Dict) -> ObjectId:
+    """
+    Deliver a notification to every user with the given role in the background.
+    
+    The recipients are resolved by the worker, so the caller's cost does
+    not grow with the number of users.
+    
+    Returns:
+        The outbox entry id
+    """
+    return _enqueue({'role': role, 'template': template})
+
+
+def recover_outbox(grace_seconds: int, stale_seconds: int) -> int:
+    """
+    Deliver outbox entries abandoned by a stopped or crashed process.
+    
+    Entries are tried in batches, and one by one when their batch fails,
+    so an entry that cannot be delivered does not hold back the others.
+    Claimed entries that reached NOTIFICATION_OUTBOX_MAX_ATTEMPTS are
+    marked failed instead of being tried again.
+    
+    Args:
+        grace_seconds: Age after which a pending entry is considered lost
+        stale_seconds: Age of a claim after which its sender is considered dead
+    
+    Returns:
+        Number of notifications written
+    """
+    outbox = get_collection(Collections.NOTIFICATION_OUTBOX)
+    now = datetime.utcnow()
+    max_attempts = settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS
+    stale = {'status': OUTBOX_SENDING, 'claimed_at': {'$lt': now - timedelta(seconds=stale_seconds)}}
+    
+    failed = outbox.update_many(
+        {**stale, 'attempts': {'$gte': max_attempts}},
+        {'$set': {'status': OUTBOX_FAILED, 'failed_at': now}}
+    ).modified_count
+    if failed:
+        logger.error('Gave up on %d notification outbox entries after %d attempts', failed, max_attempts)
+    
+    abandoned = {'$or': [
+        {'status': OUTBOX_PENDING, 'created_at': {'$lt': now - timedelta(seconds=grace_seconds)}},
+        stale,
+    ], 'attempts': {'$lt': max_attempts}}
+    
+    written = 0
+    while True:
+        ids = [e['_id'] for e in outbox.find(abandoned, {'_id': 1}).limit(RECOVERY_BATCH_SIZE)]
+        if not ids:
+            break
+        # Claimed entries are no longer abandoned, so failures are not picked up again this sweep
+        entries = claim_entries({'$and': [abandoned, {'_id': {'$in': ids}}]})
+        try:
+            written += deliver_entries(entries)
+        except Exception:
+            for entry in entries:
+                try:
+                    written += deliver_entries([entry])
+                except Exception:
+                    logger.exception('Notification outbox entry %s failed (attempt %d)', entry['_id'], entry['attempts'])
+    return written
@@ -0,0 +1,35 @@
+"""
+Management command to deliver notifications left in the outbox by a crash.
+
+Run on deploy. Running processes also sweep the outbox themselves every
+NOTIFICATION_OUTBOX_SWEEP_INTERVAL seconds.
+
+Usage: python manage.py flush_notification_outbox [--grace SECONDS] [--stale SECONDS]
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from notifications.dispatch import recover_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver notification outbox entries abandoned by stopped or crashed processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=settings.NOTIFICATION_OUTBOX_GRACE,
+            help='Seconds after which a queued entry is considered lost (default NOTIFICATION_OUTBOX_GRACE)'
+        )
+        parser.add_argument(
+            '--stale', type=int, default=settings.NOTIFICATION_OUTBOX_STALE,
+            help='Seconds after which an entry being sent is considered abandoned (default NOTIFICATION_OUTBOX_STALE)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Flushing notification outbox...')
+        
+        written = recover_outbox(options['grace'], options['stale'])
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Outbox flushed. Wrote {written} notifications.'
+        ))
@@ -0,0 +1,23 @@
+"""
+Management command to rebuild the unread-notification counters from source data.
+
+Run periodically (e.g. hourly from cron) to repair any counter drift.
+
+Usage: python manage.py reconcile_notification_counters
+"""
+
+from django.core.management.base import BaseCommand
+from notifications.counters import reconcile_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute unread notification counters from notifications and receipts'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconciling notification counters...')
+        
+        written = reconcile_all()
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciliation complete. Wrote {written} counters.'
+        ))
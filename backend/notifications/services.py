@@ -0,0 +1,53 @@
+"""
+Notification writes.
+
+Every personal notification is inserted through these helpers so the
+unread counters stay in step with the notifications collection.
+"""
+
+from typing import Dict, List
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from healthiq.mongodb import get_collection, Collections
+from .counters import increment_unread
+
+
+# Server error code of a unique index violation
+DUPLICATE_KEY = 11000
+
+
+def create_notification(notification: Dict) -> ObjectId:
+    """Insert one personal notification and count it as unread."""
+    notifications = get_collection(Collections.NOTIFICATIONS)
+    inserted_id = notifications.insert_one(notification).inserted_id
+    if not notification.get('is_read'):
+        increment_unread([notification['user_id']])
+    return inserted_id
+
+
+def create_notifications(notification_list: List[Dict]) -> int:
+    """
+    Insert many personal notifications in one unordered batch.
+    
+    Notifications whose _id already exists (a replayed outbox batch) are
+    skipped and not counted again.
+    
+    Returns:
+        Number of notifications inserted
+    """
+    if not notification_list:
+        return 0
+    
+    notifications = get_collection(Collections.NOTIFICATIONS)
+    skipped = set()
+    try:
+        notifications.insert_many(notification_list, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(error.get('code') != DUPLICATE_KEY for error in errors):
+            raise
+        skipped = {error['index'] for error in errors}
+    
+    inserted = [n for i, n in enumerate(notification_list) if i not in skipped]
+    increment_unread(n['user_id'] for n in inserted if not n.get('is_read'))
+    return len(inserted)
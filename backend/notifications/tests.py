@@ -1,3 +1,96 @@
-from django.test import TestCase
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from django.test import SimpleTestCase
+from healthiq.mongodb import Collections
+from . import counters
 
-# Create your tests here.
+
+class ReconcileAllTests(SimpleTestCase):
+    """reconcile_all corrects drifted counters without overwriting live increments."""
+    
+    def setUp(self):
+        self.read_at = datetime(2026, 2, 12, 9, 0)
+        self.collections = {
+            name: MagicMock() for name in (
+                Collections.NOTIFICATION_COUNTERS, Collections.NOTIFICATIONS, Collections.NOTIFICATION_RECEIPTS
+            )
+        }
+        self.counters = self.collections[Collections.NOTIFICATION_COUNTERS]
+        self.counters.bulk_write.return_value = MagicMock(modified_count=0, upserted_count=0)
+        patcher = patch.object(counters, 'get_collection', side_effect=self.collections.__getitem__)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def reconcile(self, observed, unread=(), receipts=(), broadcasts=()):
+        """Run reconcile_all on the given counters and source counts; return its operations."""
+        self.counters.find.return_value = [{**doc, 'updated_at': self.read_at} for doc in observed]
+        # Unread per user, then broadcasts per region
+        self.collections[Collections.NOTIFICATIONS].aggregate.side_effect = [
+            [{'_id': user_id, 'count': n} for user_id, n in unread],
+            [{'_id': region, 'count': n} for region, n in broadcasts],
+        ]
+        self.collections[Collections.NOTIFICATION_RECEIPTS].aggregate.return_value = [
+            {'_id': {'user_id': user_id, 'region': region}, 'count': n} for user_id, region, n in receipts
+        ]
+        counters.reconcile_all()
+        return [op for call in self.counters.bulk_write.call_args_list for op in call.args[0]]
+    
+    def assert_correction(self, operation, key, inc):
+        self.assertEqual(operation._filter, {'_id': key, 'updated_at': self.read_at})
+        self.assertEqual(operation._doc['$inc'], inc)
+        self.assertFalse(operation._upsert)
+    
+    def test_counters_in_step_are_left_alone(self):
+        operations = self.reconcile(
+            [{'_id': 'user:1', 'unread': 2, 'broadcasts_read': {'Coimbatore': 1}}, {'_id': 'region:Coimbatore', 'broadcasts': 3}],
+            unread=[(1, 2)], receipts=[(1, 'Coimbatore', 1)], broadcasts=[('Coimbatore', 3)]
+        )
+        self.assertEqual(operations, [])
+        self.counters.bulk_write.assert_not_called()
+    
+    def test_drift_is_corrected_with_a_guarded_increment(self):
+        operations = self.reconcile(
+            [{'_id': 'user:1', 'unread': 5, 'broadcasts_read': {'Coimbatore': 1}}],
+            unread=[(1, 2)], receipts=[(1, 'Coimbatore', 3)]
+        )
+        self.assertEqual(len(operations), 1)
+        self.assert_correction(operations[0], 'user:1', {'unread': -3, 'broadcasts_read.Coimbatore': 2})
+    
+    def test_counter_without_sources_is_zeroed(self):
+        operations = self.reconcile([{'_id': 'region:Coimbatore', 'broadcasts': 4}])
+        self.assert_correction(operations[0], 'region:Coimbatore', {'broadcasts': -4})
+    
+    def test_missing_counter_is_created_only_if_still_missing(self):
+        operations = self.reconcile([], unread=[(7, 1)], broadcasts=[('Coimbatore', 2)])
+        by_key = {op._filter['_id']: op for op in operations}
+        self.assertEqual(set(by_key), {'user:7', 'region:Coimbatore'})
+        for key, counts in (('user:7', {'unread': 1}), ('region:Coimbatore', {'broadcasts': 2})):
+            operation = by_key[key]
+            self.assertTrue(operation._upsert)
+            self.assertEqual(set(operation._doc), {'$setOnInsert'})
+            self.assertEqual({k: v for k, v in operation._doc['$setOnInsert'].items() if k != 'updated_at'}, counts)
+    
+    def test_corrections_are_written_in_batches(self):
+        observed = [{'_id': f'user:{i}', 'unread': 1} for i in range(5)]
+        with patch.object(counters, 'RECONCILE_BATCH_SIZE', 2):
+            self.reconcile(observed)
+        self.assertEqual([len(call.args[0]) for call in self.counters.bulk_write.call_args_list], [2, 2, 1])
+
+
+class UnreadCountTests(SimpleTestCase):
+    """The unread badge combines personal and region counters."""
+    
+    def test_unread_from_counters(self):
+        user_counter = {
+            'unread': 2,
+            'broadcasts_read': {'Coimbatore': 1},
+            'broadcasts_before_join': {'Coimbatore': 3}
+        }
+        docs = {'region:Coimbatore': {'broadcasts': 10}}
+        self.assertEqual(counters._unread_from_counters(user_counter, docs, 'Coimbatore'), 2 + 10 - 1 - 3)
+        self.assertEqual(counters._unread_from_counters(user_counter, docs), 2)
+    
+    def test_negative_counts_are_clamped(self):
+        user_counter = {'unread': -1, 'broadcasts_read': {'Coimbatore': 5}}
+        docs = {'region:Coimbatore': {'broadcasts': 2}}
+        self.assertEqual(counters._unread_from_counters(user_counter, docs, 'Coimbatore'), 0)
@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Served by their async ports under ASGI (see healthiq.async_api)
+reads = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('', views.get_notifications, name='get_notifications'),
+    path('', reads.get_notifications, name='get_notifications'),
     path('mark-read', views.mark_as_read, name='mark_read'),
     path('mark-all-read', views.mark_all_read, name='mark_all_read'),
-    path('unread-count', views.unread_count, name='unread_count'),
+    path('unread-count', reads.unread_count, name='unread_count'),
 ]
@@ -4,22 +4,50 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from datetime import datetime
 from bson import ObjectId
-from healthiq.mongodb import get_collection, Collections
+from bson.errors import InvalidId
+from healthiq.conditional import conditional_response, latest
+from healthiq.mongodb import get_collection, set_and_fetch, Collections
+from healthiq import serialization
+from .broadcasts import (
+    find_region_broadcasts,
+    get_user_audience,
+    get_user_region,
+    mark_all_broadcasts_read,
+    mark_broadcast_read
+)
+from .counters import decrement_unread, get_counter_watermarks, get_unread_count
 
 
 def serialize_mongo_doc(doc):
-    """Convert MongoDB document to serializable format."""
+    """Convert MongoDB document to serializable format, with a display time."""
+    doc = serialization.serialize_mongo_doc(doc)
     if doc is None:
         return None
-    doc['id'] = str(doc.pop('_id'))
     # Convert datetime to string
     if 'created_at' in doc and isinstance(doc['created_at'], datetime):
         doc['time'] = doc['created_at'].strftime('%Y-%m-%d %H:%M')
     return doc
 
 
+def merge_broadcasts(user_notifications, broadcasts, limit=50):
+    """Personal notifications and region broadcasts, newest first."""
+    return sorted(
+        user_notifications + broadcasts,
+        key=lambda n: n.get('created_at') or datetime.min,
+        reverse=True
+    )[:limit]
+
+
+def notifications_watermark(request):
+    """Version of the user's notification list, from its unread counters."""
+    region = get_user_region(request.user)
+    watermarks = get_counter_watermarks(request.user.id, region)
+    return latest(*watermarks.values()), (request.user.id, region, sorted(watermarks.items()))
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_response(notifications_watermark)
 def get_notifications(request):
     """Get notifications for the current user."""
     notifications = get_collection(Collections.NOTIFICATIONS)
@@ -30,6 +58,13 @@ def get_notifications(request):
         .limit(50)
     )
     
+    # Merge in broadcasts addressed to the user's region
+    region, joined_id = get_user_audience(request.user)
+    if region:
+        user_notifications = merge_broadcasts(
+            user_notifications, find_region_broadcasts(region, request.user.id, joined_id=joined_id)
+        )
+    
     return Response([serialize_mongo_doc(n) for n in user_notifications])
 
 
@@ -45,17 +80,24 @@ def mark_as_read(request):
     notifications = get_collection(Collections.NOTIFICATIONS)
     
     try:
-        result = notifications.update_one(
+        previous, notification = set_and_fetch(
+            notifications,
             {'_id': ObjectId(notification_id), 'user_id': request.user.id},
-            {'$set': {'is_read': True}}
+            {'is_read': True}
         )
-    except:
+    except (InvalidId, TypeError):
         return Response({'message': 'Invalid notification ID'}, status=status.HTTP_400_BAD_REQUEST)
     
-    if result.modified_count == 0:
-        return Response({'message': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not previous:
+        # Not a personal notification, try a broadcast to the user's region
+        region, joined_id = get_user_audience(request.user)
+        broadcast = mark_broadcast_read(ObjectId(notification_id), request.user.id, region, joined_id) if region else None
+        if not broadcast:
+            return Response({'message': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serialize_mongo_doc(broadcast))
     
-    notification = notifications.find_one({'_id': ObjectId(notification_id)})
+    if not previous.get('is_read'):
+        decrement_unread(request.user.id)
     return Response(serialize_mongo_doc(notification))
 
 
@@ -69,19 +111,21 @@ def mark_all_read(request):
         {'user_id': request.user.id, 'is_read': False},
         {'$set': {'is_read': True}}
     )
+    marked = result.modified_count
+    decrement_unread(request.user.id, marked)
+    
+    region, joined_id = get_user_audience(request.user)
+    if region:
+        marked += mark_all_broadcasts_read(region, request.user.id, joined_id)
     
-    return Response({'message': f'Marked {result.modified_count} notifications as read'})
+    return Response({'message': f'Marked {marked} notifications as read'})
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def unread_count(request):
     """Get count of unread notifications."""
-    notifications = get_collection(Collections.NOTIFICATIONS)
-    
-    count = notifications.count_documents({
-        'user_id': request.user.id,
-        'is_read': False
-    })
+    region, joined_id = get_user_audience(request.user)
+    count = get_unread_count(request.user.id, region, joined_id)
     
     return Response({'count': count})
@@ -0,0 +1,31 @@
+"""
+Async port of the patient dashboard, served under ASGI (settings.ASYNC_VIEWS).
+"""
+
+import asyncio
+from rest_framework import status
+from healthiq.async_api import AsyncResponse, async_api_view
+from healthiq.mongodb import get_async_collection, Collections
+from analytics.snapshots import aget_region_snapshots
+from .views import build_patient_dashboard, risk_alerts_query
+
+
+@async_api_view(['GET'])
+async def patient_dashboard(request):
+    """Get patient dashboard data."""
+    if request.user.role != 'patient':
+        return AsyncResponse({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    patient = await get_async_collection(Collections.PATIENTS).find_one({'user_id': request.user.id})
+    region = patient.get('region', 'Chennai_South') if patient else 'Chennai_South'
+    
+    snapshots, alerts = await asyncio.gather(
+        aget_region_snapshots([region]),
+        get_async_collection(Collections.NOTIFICATIONS)
+        .find(risk_alerts_query(request.user.id, region))
+        .sort('created_at', -1)
+        .limit(5)
+        .to_list()
+    )
+    
+    return AsyncResponse(build_patient_dashboard(region, snapshots[region], alerts))
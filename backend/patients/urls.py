@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Served by its async port under ASGI (see healthiq.async_api)
+reads = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path('profile', views.patient_profile, name='patient_profile'),
     path('history', views.patient_history, name='patient_history'),
-    path('dashboard', views.patient_dashboard, name='patient_dashboard'),
+    path('dashboard', reads.patient_dashboard, name='patient_dashboard'),
 ]
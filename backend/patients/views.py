@@ -4,7 +4,14 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from datetime import datetime
 from bson import ObjectId
-from healthiq.mongodb import get_collection, Collections
+from healthiq.concurrency import run_concurrently
+from healthiq.mongodb import get_collection, set_and_fetch, Collections
+from healthiq.pagination import paginated_response
+from healthiq.serialization import serialize_mongo_doc
+from analytics.snapshots import get_region_snapshots
+from notifications.broadcasts import broadcast_query, invalidate_user_audience
+from doctors.routing import get_region_doctors
+from notifications.dispatch import dispatch_to_role, dispatch_to_users
 from .serializers import (
     PatientProfileSerializer,
     MedicalRecordSerializer,
@@ -13,14 +20,6 @@ from .serializers import (
 )
 
 
-def serialize_mongo_doc(doc):
-    """Convert MongoDB document to serializable format."""
-    if doc is None:
-        return None
-    doc['id'] = str(doc.pop('_id'))
-    return doc
-
-
 @api_view(['GET', 'PUT'])
 @permission_classes([IsAuthenticated])
 def patient_profile(request):
@@ -41,11 +40,15 @@ def patient_profile(request):
         serializer = PatientProfileSerializer(data=request.data, partial=True)
         if serializer.is_valid():
             update_data = {k: v for k, v in serializer.validated_data.items() if v}
-            patients.update_one(
-                {'user_id': request.user.id},
-                {'$set': update_data}
-            )
-            patient = patients.find_one({'user_id': request.user.id})
+            previous, patient = set_and_fetch(patients, {'user_id': request.user.id}, update_data)
+            
+            # Keep the name copied onto appointments and records in step
+            if previous and 'name' in update_data and previous.get('name') != update_data['name']:
+                name_update = {'$set': {'patient_name': update_data['name']}}
+                get_collection(Collections.APPOINTMENTS).update_many({'patient_id': request.user.id}, name_update)
+                get_collection(Collections.MEDICAL_RECORDS).update_many({'patient_id': request.user.id}, name_update)
+            if previous and 'region' in update_data and previous.get('region') != update_data['region']:
+                invalidate_user_audience(request.user.id)
             return Response(serialize_mongo_doc(patient))
         return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -58,9 +61,10 @@ def patient_history(request):
         return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     
     records = get_collection(Collections.MEDICAL_RECORDS)
-    patient_records = list(records.find({'patient_id': request.user.id}).sort('created_at', -1))
-    
-    return Response([serialize_mongo_doc(r) for r in patient_records])
+    return paginated_response(
+        request, records, {'patient_id': request.user.id}, serialize_mongo_doc,
+        sort_field='created_at', allow_stream=('patient',)
+    )
 
 
 @api_view(['POST'])
@@ -95,71 +99,45 @@ def add_medical_record(request):
         result = records.insert_one(record)
         record['_id'] = result.inserted_id
         
-        # Create notification for doctors about new pending record
-        notifications = get_collection(Collections.NOTIFICATIONS)
-        # Notify all doctors (in production, would filter by region)
-        from accounts.models import User
-        doctors = User.objects.filter(role='doctor')
-        for doctor in doctors:
-            notifications.insert_one({
-                'user_id': doctor.id,
-                'type': 'record',
-                'title': 'New medical record pending review',
-                'message': f'A new medical record from {patient_name} requires approval.',
-                'is_read': False,
-                'created_at': datetime.utcnow(),
-                'level': 'low'
-            })
+        # Notify the doctors of the patient's region, or every doctor if it has none
+        notification = {
+            'type': 'record',
+            'title': 'New medical record pending review',
+            'message': f'A new medical record from {patient_name} requires approval.',
+            'is_read': False,
+            'created_at': datetime.utcnow(),
+            'level': 'low'
+        }
+        region_doctors = get_region_doctors(patient_region)
+        if region_doctors:
+            dispatch_to_users(region_doctors, notification)
+        else:
+            dispatch_to_role('doctor', notification)
         
         return Response(serialize_mongo_doc(record), status=status.HTTP_201_CREATED)
     
     return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def patient_dashboard(request):
-    """Get patient dashboard data."""
-    if request.user.role != 'patient':
-        return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
-    
-    patients = get_collection(Collections.PATIENTS)
-    regional_stats = get_collection(Collections.REGIONAL_STATS)
-    weather = get_collection(Collections.WEATHER_DATA)
-    water = get_collection(Collections.WATER_QUALITY)
-    notifications = get_collection(Collections.NOTIFICATIONS)
-    
-    patient = patients.find_one({'user_id': request.user.id})
-    region = patient.get('region', 'Chennai_South') if patient else 'Chennai_South'
-    
-    # Get latest regional stats
-    latest_stat = regional_stats.find_one(
-        {'region': region, 'disease': 'ALL'},
-        sort=[('updated_at', -1)]
-    )
-    
-    # Get weather data
-    weather_data = weather.find_one({'region': region}, sort=[('date', -1)])
-    
-    # Get water quality
-    water_data = water.find_one({'region': region}, sort=[('date', -1)])
-    
-    # Get risk trend (last 7 days)
-    from datetime import timedelta
-    trend_stats = list(regional_stats.find(
-        {'region': region, 'disease': 'ALL'}
-    ).sort('updated_at', -1).limit(7))
+def risk_alerts_query(user_id, region):
+    """Risk notifications of a patient, personal or broadcast to their region."""
+    return {
+        'type': 'risk',
+        '$or': [{'user_id': user_id}, broadcast_query(region)]
+    }
+
+
+def build_patient_dashboard(region, snapshot, alerts):
+    """Patient dashboard payload from the region's snapshot and recent alerts."""
+    latest_stat = snapshot['stat']
+    weather_data = snapshot['weather']
+    water_data = snapshot['water']
     
     risk_trend = [
         {'date': s.get('date', ''), 'risk_score': s.get('risk_score', 0)}
-        for s in reversed(trend_stats)
+        for s in reversed(snapshot['trend'])
     ]
     
-    # Get alerts (recent notifications marked as risk)
-    alerts = list(notifications.find(
-        {'user_id': request.user.id, 'type': 'risk'}
-    ).sort('created_at', -1).limit(5))
-    
     # Default values if no data
     risk_score = latest_stat.get('risk_score', 50) if latest_stat else 50
     
@@ -172,7 +150,7 @@ def patient_dashboard(request):
             return 'medium'
         return 'low'
     
-    return Response({
+    return {
         'risk_score': risk_score,
         'risk_level': get_risk_level(risk_score),
         'rainfall': weather_data.get('rainfall', 0) if weather_data else 0,
@@ -182,4 +160,29 @@ def patient_dashboard(request):
         'trends': risk_trend,
         'alerts': [serialize_mongo_doc(a) for a in alerts],
         'region': region
-    })
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def patient_dashboard(request):
+    """Get patient dashboard data."""
+    if request.user.role != 'patient':
+        return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    patients = get_collection(Collections.PATIENTS)
+    notifications = get_collection(Collections.NOTIFICATIONS)
+    
+    patient = patients.find_one({'user_id': request.user.id})
+    region = patient.get('region', 'Chennai_South') if patient else 'Chennai_South'
+    
+    results = run_concurrently(
+        # Latest stats, weather, water quality and the 7-day trend of the region
+        snapshot=lambda: get_region_snapshots([region])[region],
+        # Recent risk alerts, personal or broadcast to the region
+        alerts=lambda: list(
+            notifications.find(risk_alerts_query(request.user.id, region)).sort('created_at', -1).limit(5)
+        )
+    )
+    
+    return Response(build_patient_dashboard(region, results['snapshot'], results['alerts']))